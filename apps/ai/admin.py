@@ -1,8 +1,28 @@
 """
 Configuration admin pour l'IA
-(Pas d'admin nécessaire pour l'instant)
 """
 from django.contrib import admin
+from .models import LLMCacheEntry, LLMCacheStat, KeywordTerm
 
-# Pas de modèles à enregistrer pour l'instant
 
+@admin.register(LLMCacheEntry)
+class LLMCacheEntryAdmin(admin.ModelAdmin):
+    list_display = [
+        'fingerprint', 'function', 'model', 'size', 'hits',
+        'last_used_at', 'expires_at'
+    ]
+    list_filter = ['function', 'model']
+    search_fields = ['fingerprint', 'response']
+    readonly_fields = ['created_at', 'last_used_at']
+
+
+@admin.register(LLMCacheStat)
+class LLMCacheStatAdmin(admin.ModelAdmin):
+    list_display = ['function', 'hits', 'misses', 'hit_rate']
+    readonly_fields = ['hits', 'misses']
+
+
+@admin.register(KeywordTerm)
+class KeywordTermAdmin(admin.ModelAdmin):
+    list_display = ['term', 'df']
+    search_fields = ['term']
@@ -0,0 +1,200 @@
+"""
+Backend Mistral simulé, hors ligne et déterministe
+
+Génère des réponses valides pour chaque type de prompt du service
+(résumés, analyse des blancs simple ou groupée, mots-clés) avec une
+latence et un taux d'erreur configurables. Utilisé :
+- en processus, comme transport httpx du client (MISTRAL_BACKEND=fake)
+- derrière un serveur HTTP local (commande fake_mistral_server)
+
+Même prompt + même graine = même réponse, même latence, mêmes erreurs.
+"""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+import httpx
+
+_ALERT_RE = re.compile(r'^ALERTE: (\d+)$', re.MULTILINE)
+_WORD_RE = re.compile(r"[^\W\d_]{6,}", re.UNICODE)
+
+
+def _rng(seed, *parts):
+    digest = hashlib.sha256('\0'.join([str(seed), *map(str, parts)]).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def _words(prompt, rng, count):
+    words = list(dict.fromkeys(w.lower() for w in _WORD_RE.findall(prompt.split('\n\n', 1)[-1])))
+    if not words:
+        words = ['radio', 'occitanie', 'actualité', 'musique', 'météo', 'culture']
+    return [rng.choice(words) for _ in range(count)]
+
+
+def _blank_verdict(rng):
+    natural = rng.random() < 0.6
+    return [
+        f"NATURAL: {'OUI' if natural else 'NON'}",
+        f"CONFIDENCE: {rng.uniform(0.5, 0.99):.2f}",
+        f"EXPLICATION: {'Transition musicale probable.' if natural else 'Coupure probable du signal.'}",
+    ]
+
+
+def generate_response(prompt, seed=0):
+    """
+    Réponse simulée, conforme au format attendu par le parseur du prompt
+
+    Args:
+        prompt: Prompt envoyé
+        seed: Graine (MISTRAL_FAKE_SEED)
+
+    Returns:
+        str: Réponse générée
+    """
+    rng = _rng(seed, prompt)
+
+    alert_ids = _ALERT_RE.findall(prompt)
+    if alert_ids:
+        blocks = []
+        for alert_id in alert_ids:
+            blocks.append('\n'.join([f"ALERTE: {alert_id}", *_blank_verdict(rng)]))
+        return '\n\n'.join(blocks)
+
+    if 'NATURAL: [OUI ou NON]' in prompt:
+        return '\n'.join(_blank_verdict(rng))
+
+    if prompt.rstrip().endswith('Mots-clés :'):
+        match = re.search(r'Extrait les (\d+) mots-clés', prompt)
+        count = int(match.group(1)) if match else 10
+        return ', '.join(dict.fromkeys(_words(prompt, rng, count)))
+
+    words = _words(prompt, rng, 6)
+    return (
+        f"Cet enregistrement aborde {words[0]} et {words[1]}. "
+        f"Il est question de {words[2]}, de {words[3]} et de {words[4]}. "
+        f"La séquence se termine sur {words[5]}."
+    )
+
+
+class FakeMistralBackend:
+    """
+    Simulation de l'endpoint /v1/chat/completions
+
+    Les erreurs (429 / 503) sont tirées par (prompt, numéro de tentative) :
+    un retry du même prompt peut réussir, de façon reproductible. Les
+    tentatives ne sont suivies que pour les `max_tracked` derniers prompts
+    (les retries suivent de près la première tentative) : la mémoire du
+    serveur reste bornée.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, seed=0, max_tracked=10000):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.max_tracked = max_tracked
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0}
+
+    def handle(self, body):
+        """
+        Traite une requête JSON
+
+        Returns:
+            tuple: (délai en secondes, code HTTP, en-têtes, corps JSON)
+        """
+        try:
+            payload = json.loads(body)
+            prompt = payload['messages'][-1]['content']
+            model = payload.get('model', 'fake')
+        except (ValueError, KeyError, IndexError, TypeError):
+            return 0.0, 400, {}, {'message': 'Requête invalide'}
+
+        key = hashlib.sha256(prompt.encode('utf-8')).digest()
+        with self._lock:
+            attempt = self._attempts.pop(key, 0)
+            self._attempts[key] = attempt + 1
+            while len(self._attempts) > self.max_tracked:
+                self._attempts.popitem(last=False)
+            self.stats['requests'] += 1
+
+        rng = _rng(self.seed, prompt, attempt)
+        delay = max(0.0, self.latency + self.jitter * (rng.random() * 2 - 1))
+
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.stats['errors'] += 1
+            if rng.random() < 0.5:
+                return delay, 429, {'Retry-After': '0'}, {'message': 'Rate limit exceeded'}
+            return delay, 503, {}, {'message': 'Service unavailable'}
+
+        content = generate_response(prompt, self.seed)
+        return delay, 200, {}, {
+            'id': f"fake-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}",
+            'object': 'chat.completion',
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': len(prompt) // 4,
+                'completion_tokens': len(content) // 4,
+                'total_tokens': (len(prompt) + len(content)) // 4,
+            },
+        }
+
+
+class FakeMistralTransport(httpx.AsyncBaseTransport):
+    """
+    Transport httpx en processus : le client réel (concurrence, débit,
+    retries) est exercé sans réseau
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        delay, status_code, headers, data = self.backend.handle(body)
+        await asyncio.sleep(delay)
+        return httpx.Response(status_code, headers=headers, json=data, request=request)
+
+
+def make_server(host, port, backend):
+    """
+    Serveur HTTP local de substitution (MISTRAL_API_URL=http://host:port)
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.rstrip('/') != '/v1/chat/completions':
+                delay, status_code, headers, data = 0.0, 404, {}, {'message': 'Not found'}
+            else:
+                delay, status_code, headers, data = backend.handle(body)
+            time.sleep(delay)
+
+            out = json.dumps(data).encode('utf-8')
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
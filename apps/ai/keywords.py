@@ -0,0 +1,333 @@
+"""
+Extraction locale de mots-clés (sans appel API)
+
+Tokenisation française, mots vides, score TF-IDF avec une table de
+fréquences documentaires maintenue sur toute l'archive : les mots-clés
+sont comparables d'un enregistrement à l'autre.
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+import hashlib
+import logging
+import math
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Version de l'extracteur (tokenisation, mots vides, score)
+KEYWORD_ENGINE_VERSION = 1
+
+FRENCH_STOP_WORDS = frozenset("""
+a à afin ai aie aient aies ait alors as au aucun aucune aujourd aujourd'hui auprès auquel aura aurai
+auraient aurais aurait auras aurez auriez aurions aurons auront aussi autre autres aux
+auxquelles auxquels avaient avais avait avant avec avez aviez avions avoir avons ayant
+ayez ayons bah beaucoup bien bon bref c ça ca car ce ceci cela celle celles celui cependant
+certain certaine certaines certains ces cet cette ceux chacun chacune chaque chez ci comme
+comment contre d dans de debout dedans dehors déjà deja depuis derrière des dès desquelles
+desquels dessous dessus deux devant devrait dire dit dois doit donc dont du duquel durant
+e elle elles en encore enfin entre es est et été etre être étaient étais était étant etc
+été êtes étiez étions eu eue eues euh eûmes eurent eus eusse eussent eusses eussiez
+eussions eut eût eûtes eux fait faire faut fois font furent fus fusse fussent fusses
+fussiez fussions fut fût fûtes genre gens hein hors ici il ils j je jusqu jusque l la là
+laquelle le lequel les lesquelles lesquels leur leurs lors lorsque lui m ma mais
+maintenant me même mêmes merci mes moi moins mon n ne ni non nos notre nous o on ont ou
+où oui par parce pas peu peut peuvent peux plus plusieurs plutôt pour pourquoi pourrait
+pouvait puis qu quand que quel quelle quelles quels qui quoi s sa sans se sera seront ses
+si sien sienne siennes siens soi soient sois soit sommes son sont sous suis sur t ta tant
+te tes toi ton tous tout toute toutes très tres tu un une unes uns va vais vas vers voici
+voilà voila vont vos votre vous vu y
+alors ben bon voilà quoi donc enfin ouais okay ok bonjour bonsoir salut
+avoir être faire aller dire voir savoir pouvoir vouloir venir falloir devoir prendre
+chose choses truc trucs peu petit petite grand grande vrai vraiment juste toujours jamais
+aussi ainsi assez autant autour comme après avant pendant fois heure heures minute minutes
+""".split())
+
+_ELISION_RE = re.compile(r"^(?:l|d|j|m|n|s|t|c|qu|jusqu|lorsqu|puisqu)['’]", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*", re.UNICODE)
+
+MIN_TOKEN_LENGTH = 3
+
+
+def tokenize(text):
+    """
+    Découpe un texte français en tokens normalisés (minuscules, sans élision)
+
+    Returns:
+        list: Tokens (None à la place des mots vides, pour couper les bigrammes)
+    """
+    text = unicodedata.normalize('NFC', text.lower())
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        token = _ELISION_RE.sub('', match.group(0)).strip("-'’")
+        if len(token) < MIN_TOKEN_LENGTH or token in FRENCH_STOP_WORDS:
+            tokens.append(None)
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def extract_terms(text):
+    """
+    Termes candidats d'un texte : unigrammes et bigrammes sans mot vide
+
+    Returns:
+        Counter: {terme: fréquence}
+    """
+    tokens = tokenize(text)
+    terms = Counter(t for t in tokens if t)
+    for first, second in zip(tokens, tokens[1:]):
+        if first and second:
+            terms[f"{first} {second}"] += 1
+    return terms
+
+
+def tags_producer(engine, max_keywords=10):
+    """
+    Provenance des tags d'un enregistrement (stockée dans ai_metadata)
+
+    Args:
+        engine: 'local' (TF-IDF) ou 'mistral'
+
+    Returns:
+        dict: {'engine', 'version', 'max_keywords'}
+    """
+    if engine == 'local':
+        version = str(KEYWORD_ENGINE_VERSION)
+    else:
+        version = getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest')
+    return {'engine': engine, 'version': version, 'max_keywords': max_keywords}
+
+
+def transcript_hash(text):
+    return hashlib.sha256(
+        f"{KEYWORD_ENGINE_VERSION}\0{text}".encode('utf-8')
+    ).hexdigest()
+
+
+def _apply_df_deltas(deltas):
+    """
+    Applique des variations de fréquence documentaire {terme: delta}
+    """
+    from .models import KeywordTerm
+
+    deltas = {t: d for t, d in deltas.items() if d and len(t) <= 128}
+    if not deltas:
+        return
+
+    terms = list(deltas)
+    for i in range(0, len(terms), 2000):
+        batch = terms[i:i + 2000]
+        existing = {
+            kt.term: kt
+            for kt in KeywordTerm.objects.select_for_update().filter(term__in=batch)
+        }
+        to_update = []
+        to_create = []
+        for term in batch:
+            if term in existing:
+                kt = existing[term]
+                kt.df = max(0, kt.df + deltas[term])
+                to_update.append(kt)
+            elif deltas[term] > 0:
+                to_create.append(KeywordTerm(term=term, df=deltas[term]))
+        if to_update:
+            KeywordTerm.objects.bulk_update(to_update, ['df'], batch_size=1000)
+        if to_create:
+            KeywordTerm.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+
+
+def index_recordings(recordings):
+    """
+    Ajoute / met à jour des enregistrements dans l'index documentaire
+
+    Seules les transcriptions nouvelles ou modifiées sont recomptées ;
+    les variations de fréquence sont agrégées pour tout le lot.
+
+    Args:
+        recordings: Itérable de Recording (avec transcript)
+
+    Returns:
+        dict: {recording.id: Counter des termes} pour les enregistrements traités
+    """
+    from .models import KeywordDocument
+
+    recordings = [r for r in recordings if r.transcript]
+    if not recordings:
+        return {}
+
+    documents = {
+        doc.recording_id: doc
+        for doc in KeywordDocument.objects.filter(recording__in=recordings)
+    }
+
+    deltas = Counter()
+    term_counts = {}
+    to_create = []
+    to_update = []
+
+    for recording in recordings:
+        terms = extract_terms(recording.transcript)
+        term_counts[recording.id] = terms
+        digest = transcript_hash(recording.transcript)
+
+        doc = documents.get(recording.id)
+        if doc and doc.transcript_hash == digest:
+            continue
+
+        new_terms = set(terms)
+        old_terms = set(doc.terms) if doc else set()
+        for term in new_terms - old_terms:
+            deltas[term] += 1
+        for term in old_terms - new_terms:
+            deltas[term] -= 1
+
+        if doc:
+            doc.transcript_hash = digest
+            doc.terms = sorted(new_terms)
+            to_update.append(doc)
+        else:
+            to_create.append(KeywordDocument(
+                recording=recording,
+                transcript_hash=digest,
+                terms=sorted(new_terms)
+            ))
+
+    with transaction.atomic():
+        _apply_df_deltas(deltas)
+        if to_create:
+            KeywordDocument.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            KeywordDocument.objects.bulk_update(
+                to_update, ['transcript_hash', 'terms'], batch_size=500
+            )
+
+    return term_counts
+
+
+def rebuild_index():
+    """
+    Recalcule toutes les fréquences documentaires à partir des documents indexés
+    (corrige la dérive après suppression d'enregistrements)
+    """
+    from .models import KeywordDocument, KeywordTerm
+
+    df = Counter()
+    for terms in KeywordDocument.objects.values_list('terms', flat=True).iterator():
+        df.update(terms)
+
+    with transaction.atomic():
+        KeywordTerm.objects.all().delete()
+        KeywordTerm.objects.bulk_create(
+            [KeywordTerm(term=t, df=n) for t, n in df.items() if len(t) <= 128],
+            batch_size=2000
+        )
+
+    return len(df)
+
+
+def score_terms(terms, max_keywords=10):
+    """
+    Classe les termes d'un document par TF-IDF sur l'index de l'archive
+
+    Args:
+        terms: Counter {terme: fréquence} (voir extract_terms)
+        max_keywords: Nombre maximum de mots-clés
+
+    Returns:
+        list: Mots-clés, du plus au moins pertinent
+    """
+    from .models import KeywordDocument, KeywordTerm
+
+    if not terms:
+        return []
+
+    n_docs = KeywordDocument.objects.count()
+    df = {}
+    candidates = list(terms)
+    for i in range(0, len(candidates), 2000):
+        df.update(
+            KeywordTerm.objects.filter(term__in=candidates[i:i + 2000])
+            .values_list('term', 'df')
+        )
+
+    return _rank(terms, df, n_docs, max_keywords)
+
+
+def _rank(terms, df, n_docs, max_keywords):
+    max_tf = max(terms.values())
+    scores = {}
+    for term, tf in terms.items():
+        idf = math.log((n_docs + 1) / (df.get(term, 0) + 1)) + 1
+        score = (0.5 + 0.5 * tf / max_tf) * idf
+        if ' ' in term:
+            # Un bigramme répété est plus informatif que ses mots isolés
+            score *= 1.5 if tf > 1 else 0.5
+        scores[term] = score
+
+    keywords = []
+    for term in sorted(scores, key=lambda t: -scores[t]):
+        # Éviter les doublons : un mot déjà couvert par un bigramme retenu (et inversement)
+        if any(term in kw.split(' ') or kw in term.split(' ') for kw in keywords):
+            continue
+        keywords.append(term)
+        if len(keywords) >= max_keywords:
+            break
+    return keywords
+
+
+def extract_keywords_local(text, max_keywords=10, recording=None):
+    """
+    Extrait les mots-clés d'un texte sans appel API
+
+    Args:
+        text: Texte à analyser
+        max_keywords: Nombre maximum de mots-clés
+        recording: Recording associé, indexé au passage (optionnel)
+
+    Returns:
+        list: Liste de mots-clés
+    """
+    if not text or len(text.strip()) < 20:
+        return []
+
+    if recording is not None:
+        terms = index_recordings([recording]).get(recording.id)
+    else:
+        terms = extract_terms(text)
+
+    return score_terms(terms, max_keywords)
+
+
+def tag_recordings(recordings, max_keywords=10):
+    """
+    Indexe puis tague un lot d'enregistrements (un aller-retour DB par lot)
+
+    Returns:
+        list: Enregistrements tagués (non sauvegardés)
+    """
+    from .models import KeywordDocument, KeywordTerm
+
+    term_counts = index_recordings(recordings)
+    if not term_counts:
+        return []
+
+    n_docs = KeywordDocument.objects.count()
+    all_terms = list(set().union(*term_counts.values()))
+    df = {}
+    for i in range(0, len(all_terms), 2000):
+        df.update(
+            KeywordTerm.objects.filter(term__in=all_terms[i:i + 2000])
+            .values_list('term', 'df')
+        )
+
+    producer = tags_producer('local', max_keywords)
+    tagged = []
+    for recording in recordings:
+        terms = term_counts.get(recording.id)
+        if terms:
+            recording.tags = _rank(terms, df, n_docs, max_keywords)
+            recording.ai_metadata = {**(recording.ai_metadata or {}), 'tags_producer': producer}
+            tagged.append(recording)
+    return tagged
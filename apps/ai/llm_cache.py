@@ -0,0 +1,189 @@
+"""
+Cache persistant des réponses Mistral
+
+Les réponses sont indexées par une empreinte SHA-256 du backend (réel
+ou simulé, URL de l'API), du modèle et du prompt : un prompt identique
+(retraitement d'un enregistrement, résumé d'une transcription
+inchangée) ne rappelle pas l'API, et une réponse du backend simulé
+(MISTRAL_BACKEND=fake, serveur fake_mistral_server) n'est jamais servie
+comme une réponse de production.
+Les messages d'erreur ne sont jamais mis en cache.
+"""
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from datetime import timedelta
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def is_cache_enabled():
+    return getattr(settings, 'MISTRAL_CACHE_ENABLED', True)
+
+
+def backend_identity():
+    """Backend qui produit les réponses : 'fake' ou 'api:<URL>'"""
+    backend = getattr(settings, 'MISTRAL_BACKEND', 'api')
+    if backend == 'fake':
+        return 'fake'
+    return f"{backend}:{getattr(settings, 'MISTRAL_API_URL', 'https://api.mistral.ai').rstrip('/')}"
+
+
+def prompt_fingerprint(model, prompt):
+    """
+    Empreinte d'un appel : SHA-256 de (backend, modèle, prompt)
+    """
+    return hashlib.sha256(f"{backend_identity()}\0{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+
+def _is_cacheable(response):
+    return (
+        isinstance(response, str)
+        and response.strip() != ''
+        and not response.startswith('[Erreur')
+    )
+
+
+def _record_stats(function, hits, misses):
+    from .models import LLMCacheStat
+
+    stat, _ = LLMCacheStat.objects.get_or_create(function=function)
+    LLMCacheStat.objects.filter(pk=stat.pk).update(
+        hits=F('hits') + hits,
+        misses=F('misses') + misses
+    )
+
+
+def cache_get_many(model, prompts, function='call_mistral'):
+    """
+    Cherche les réponses en cache pour une liste de prompts
+
+    Args:
+        model: Nom du modèle
+        prompts: Liste de prompts
+        function: Fonction appelante (pour les statistiques de hit-rate)
+
+    Returns:
+        dict: {index du prompt: réponse en cache}
+    """
+    from .models import LLMCacheEntry
+
+    fingerprints = [prompt_fingerprint(model, p) for p in prompts]
+    now = timezone.now()
+
+    entries = dict(
+        LLMCacheEntry.objects.filter(
+            fingerprint__in=set(fingerprints),
+            expires_at__gt=now
+        ).values_list('fingerprint', 'response')
+    )
+
+    found = {i: entries[fp] for i, fp in enumerate(fingerprints) if fp in entries}
+
+    if entries:
+        LLMCacheEntry.objects.filter(fingerprint__in=entries.keys()).update(
+            hits=F('hits') + 1,
+            last_used_at=now
+        )
+
+    _record_stats(function, len(found), len(prompts) - len(found))
+
+    return found
+
+
+def cache_set_many(model, items, function='call_mistral'):
+    """
+    Met en cache des réponses (une entrée expirée mais pas encore
+    évincée est remplacée)
+
+    Args:
+        model: Nom du modèle
+        items: Liste de tuples (prompt, réponse)
+        function: Fonction appelante
+    """
+    from .models import LLMCacheEntry
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=getattr(settings, 'MISTRAL_CACHE_TTL', 30 * 24 * 3600))
+
+    entries = {}
+    for prompt, response in items:
+        if not _is_cacheable(response):
+            continue
+        fp = prompt_fingerprint(model, prompt)
+        entries[fp] = LLMCacheEntry(
+            fingerprint=fp,
+            model=model,
+            function=function,
+            response=response,
+            size=len(prompt.encode('utf-8')) + len(response.encode('utf-8')),
+            last_used_at=now,
+            expires_at=expires_at
+        )
+
+    if entries:
+        LLMCacheEntry.objects.bulk_create(
+            entries.values(),
+            update_conflicts=True,
+            unique_fields=['fingerprint'],
+            update_fields=['model', 'function', 'response', 'size', 'last_used_at', 'expires_at']
+        )
+
+
+def evict_cache():
+    """
+    Supprime les entrées expirées puis les moins récemment utilisées
+    tant que la taille totale dépasse MISTRAL_CACHE_MAX_BYTES
+
+    Returns:
+        dict: {'expired': int, 'evicted': int, 'size': int}
+    """
+    from .models import LLMCacheEntry
+
+    expired, _ = LLMCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    max_bytes = getattr(settings, 'MISTRAL_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+    total = LLMCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+
+    evicted = 0
+    if total > max_bytes:
+        to_free = total - max_bytes
+        ids = []
+        for pk, size in LLMCacheEntry.objects.order_by('last_used_at').values_list('pk', 'size').iterator():
+            if to_free <= 0:
+                break
+            ids.append(pk)
+            to_free -= size
+            total -= size
+        for i in range(0, len(ids), 1000):
+            LLMCacheEntry.objects.filter(pk__in=ids[i:i + 1000]).delete()
+        evicted = len(ids)
+
+    if expired or evicted:
+        logger.info(f"Cache LLM: {expired} entrée(s) expirée(s), {evicted} évincée(s)")
+
+    return {'expired': expired, 'evicted': evicted, 'size': total}
+
+
+def get_cache_stats():
+    """
+    Statistiques du cache : taille et hit-rate par fonction
+    """
+    from .models import LLMCacheEntry, LLMCacheStat
+
+    return {
+        'enabled': is_cache_enabled(),
+        'entries': LLMCacheEntry.objects.count(),
+        'size': LLMCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0,
+        'max_size': getattr(settings, 'MISTRAL_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        'functions': {
+            stat.function: {
+                'hits': stat.hits,
+                'misses': stat.misses,
+                'hit_rate': round(stat.hit_rate, 4),
+            }
+            for stat in LLMCacheStat.objects.all()
+        },
+    }
@@ -0,0 +1,122 @@
+"""
+Banc d'essai de la chaîne LLM (résumé, analyse des blancs, mots-clés)
+
+À utiliser avec MISTRAL_BACKEND=fake ou un serveur fake_mistral_server
+pour mesurer le débit, la latence et le comportement du client
+(concurrence, retries) sans appel à l'API réelle.
+
+Usage:
+    MISTRAL_BACKEND=fake python manage.py bench_llm --recordings 200 --workers 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+import random
+import time
+
+from apps.ai import mistral_service
+from apps.ai.mistral_client import MistralAPIError, get_async_client
+
+VOCABULARY = (
+    "Toulouse Montpellier rugby concert festival mairie budget élection école "
+    "culture occitan langue musique météo orage circulation autoroute agriculture "
+    "vendanges économie emploi santé hôpital université recherche patrimoine "
+    "cathédrale théâtre cinéma exposition marché producteurs tourisme montagne"
+).split()
+
+
+def synthetic_transcript(rng, words):
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        length = rng.randint(8, 20)
+        sentence = ' '.join(rng.choice(VOCABULARY + ['la', 'le', 'et', 'de', 'un']) for _ in range(length))
+        sentences.append(sentence.capitalize() + '.')
+    return ' '.join(sentences)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit de la chaîne LLM de process_recording (backend simulé recommandé)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recordings', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Traitements simultanés (workers Celery simulés)')
+        parser.add_argument('--words', type=int, default=6000, help='Mots par transcription (~1h = 9000)')
+        parser.add_argument('--alerts', type=int, default=5, help='Alertes de blanc par enregistrement')
+        parser.add_argument('--use-cache', action='store_true', help='Utiliser le cache LLM persistant')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Sans --use-cache, le cache n'est désactivé que le temps du banc
+        overrides = {} if options['use_cache'] else {'MISTRAL_CACHE_ENABLED': False}
+        with override_settings(**overrides):
+            self._bench(options)
+
+    def _bench(self, options):
+        self.stdout.write(
+            f"Backend: {getattr(settings, 'MISTRAL_BACKEND', 'api')} "
+            f"({getattr(settings, 'MISTRAL_API_URL', '')}), "
+            f"concurrence client {getattr(settings, 'MISTRAL_MAX_CONCURRENCY', 4)}, "
+            f"débit {getattr(settings, 'MISTRAL_RATE_LIMIT', 1.0)} req/s"
+        )
+
+        rng = random.Random(options['seed'])
+        jobs = [
+            (i, synthetic_transcript(random.Random(rng.random()), options['words']))
+            for i in range(options['recordings'])
+        ]
+
+        latencies = []
+        failures = []
+
+        def run(job):
+            index, transcript = job
+            started = time.monotonic()
+            try:
+                mistral_service.summarize_long_text(transcript)
+                contexts = [
+                    {
+                        'id': index * 1000 + n,
+                        'duration': 6.0 + n,
+                        'before': transcript[n * 200:n * 200 + 120],
+                        'after': transcript[n * 200 + 120:n * 200 + 240],
+                    }
+                    for n in range(options['alerts'])
+                ]
+                batches = mistral_service._batch_blank_contexts(contexts)
+                mistral_service.call_mistral_many(
+                    [mistral_service._batch_blank_prompt(b) for b in batches],
+                    function='analyze_blank_contexts'
+                )
+                mistral_service.extract_keywords(transcript)
+            except MistralAPIError as e:
+                failures.append(str(e))
+            latencies.append(time.monotonic() - started)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for done, _ in enumerate(pool.map(run, jobs), start=1):
+                if done % max(1, len(jobs) // 10) == 0:
+                    self.stdout.write(f"{done}/{len(jobs)} enregistrement(s)")
+        elapsed = time.monotonic() - started
+
+        stats = get_async_client().stats
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs)} enregistrement(s) en {elapsed:.1f}s "
+            f"-> {len(jobs) / elapsed * 3600:.0f} enregistrements/heure"
+        ))
+        self.stdout.write(
+            f"Latence par enregistrement: p50 {percentile(latencies, 0.5):.2f}s, "
+            f"p95 {percentile(latencies, 0.95):.2f}s, max {max(latencies, default=0):.2f}s"
+        )
+        self.stdout.write(
+            f"Requêtes: {stats['requests']}, retries: {stats['retries']}, "
+            f"erreurs définitives: {stats['errors']}, échecs: {len(failures)}"
+        )
@@ -0,0 +1,61 @@
+"""
+Serveur HTTP local simulant l'API Mistral (tests de charge, benchmarks)
+
+Usage:
+    python manage.py fake_mistral_server --port 8089 --latency 0.3 --error-rate 0.05
+    MISTRAL_API_URL=http://localhost:8089 python manage.py bench_llm
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.ai.fake_llm import FakeMistralBackend, make_server
+
+
+class Command(BaseCommand):
+    help = "Démarre un serveur local compatible /v1/chat/completions aux réponses déterministes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument(
+            '--latency', type=float,
+            default=getattr(settings, 'MISTRAL_FAKE_LATENCY', 0.5),
+            help='Latence moyenne par requête (secondes)'
+        )
+        parser.add_argument(
+            '--jitter', type=float,
+            default=getattr(settings, 'MISTRAL_FAKE_LATENCY_JITTER', 0.2),
+            help='Variation maximale de la latence (secondes)'
+        )
+        parser.add_argument(
+            '--error-rate', type=float,
+            default=getattr(settings, 'MISTRAL_FAKE_ERROR_RATE', 0.0),
+            help='Proportion de réponses 429/503 (0-1)'
+        )
+        parser.add_argument(
+            '--seed', type=int,
+            default=getattr(settings, 'MISTRAL_FAKE_SEED', 0)
+        )
+
+    def handle(self, *args, **options):
+        backend = FakeMistralBackend(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+        server = make_server(options['host'], options['port'], backend)
+
+        self.stdout.write(
+            f"Serveur Mistral simulé sur http://{options['host']}:{options['port']} "
+            f"(latence {options['latency']}s, erreurs {options['error_rate']:.0%})"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"{backend.stats['requests']} requête(s), {backend.stats['errors']} erreur(s) simulée(s)"
+            )
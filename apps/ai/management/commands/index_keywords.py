@@ -0,0 +1,70 @@
+"""
+Indexation locale des mots-clés de l'archive (TF-IDF, sans appel API)
+
+Usage:
+    python manage.py index_keywords
+    python manage.py index_keywords --tag --batch-size 1000
+    python manage.py index_keywords --rebuild
+"""
+from django.core.management.base import BaseCommand
+import time
+
+from apps.ai.keywords import index_recordings, rebuild_index, tag_recordings
+from apps.archive.models import Recording
+
+
+class Command(BaseCommand):
+    help = "Met à jour l'index TF-IDF des transcriptions et tague les enregistrements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Nombre d\'enregistrements par lot (défaut: 500)'
+        )
+        parser.add_argument(
+            '--tag', action='store_true',
+            help='Remplacer les tags par les mots-clés locaux'
+        )
+        parser.add_argument(
+            '--max-keywords', type=int, default=10,
+            help='Nombre de mots-clés par enregistrement (défaut: 10)'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recalculer les fréquences documentaires depuis les documents indexés'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_index()
+            self.stdout.write(self.style.SUCCESS(f"Index reconstruit ({count} termes)"))
+            return
+
+        batch_size = options['batch_size']
+        queryset = Recording.objects.exclude(transcript='').only(
+            'id', 'transcript', 'tags', 'ai_metadata'
+        ).order_by('id')
+        total = queryset.count()
+
+        started = time.monotonic()
+        done = 0
+        last_id = 0
+
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            if options['tag']:
+                tagged = tag_recordings(batch, options['max_keywords'])
+                Recording.objects.bulk_update(tagged, ['tags', 'ai_metadata'], batch_size=500)
+            else:
+                index_recordings(batch)
+
+            done += len(batch)
+            elapsed = time.monotonic() - started
+            rate = done / elapsed * 60 if elapsed else 0
+            self.stdout.write(f"{done}/{total} enregistrement(s) ({rate:.0f}/min)")
+
+        self.stdout.write(self.style.SUCCESS(f"{done} enregistrement(s) indexé(s)"))
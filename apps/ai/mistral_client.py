@@ -0,0 +1,285 @@
+"""
+Client HTTP asynchrone pour l'API Mistral
+
+- Connexions HTTP réutilisées (un httpx.AsyncClient par processus)
+- Limite de concurrence configurable (MISTRAL_MAX_CONCURRENCY)
+- Limiteur de débit "token bucket" aligné sur le quota de l'API (MISTRAL_RATE_LIMIT)
+- Retries avec backoff exponentiel et jitter (MISTRAL_MAX_RETRIES)
+
+L'URL de l'API (MISTRAL_API_URL) est configurable pour pouvoir
+pointer le client vers un serveur local de substitution ;
+MISTRAL_BACKEND=fake remplace le réseau par un backend simulé
+(voir fake_llm.py).
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MistralAPIError(Exception):
+    """
+    Erreur lors d'un appel à l'API Mistral (après épuisement des retries)
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    Limiteur de débit : `rate` jetons par seconde, au plus `capacity` en réserve
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """Attend qu'un jeton soit disponible puis le consomme"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AsyncMistralClient:
+    """
+    Client asynchrone pour l'endpoint /v1/chat/completions
+    """
+    RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_key,
+        base_url='https://api.mistral.ai',
+        timeout=60.0,
+        max_concurrency=4,
+        rate_limit=1.0,
+        rate_burst=1,
+        max_retries=4,
+        backoff_base=1.0,
+        backoff_max=30.0,
+        transport=None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.transport = transport
+
+        # Créés paresseusement dans la boucle d'événements qui les utilise
+        self._http = None
+        self._semaphore = None
+        self._bucket = None
+
+        # Compteurs (exposés dans get_model_info)
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0}
+
+    def _ensure_resources(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                },
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_limit, self.rate_burst)
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Backoff exponentiel avec "full jitter", borné par backoff_max"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def complete(self, prompt, model):
+        """
+        Envoie un prompt et retourne le texte généré
+
+        Raises:
+            MistralAPIError: Si l'appel échoue après tous les retries
+        """
+        self._ensure_resources()
+        payload = {
+            'model': model,
+            'messages': [{'role': 'user', 'content': prompt}],
+        }
+
+        async with self._semaphore:
+            last_error = None
+            status_code = None
+
+            for attempt in range(self.max_retries + 1):
+                await self._bucket.acquire()
+                retry_after = None
+                self.stats['requests'] += 1
+
+                try:
+                    response = await self._http.post('/v1/chat/completions', json=payload)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    last_error = f"{type(e).__name__}: {e}"
+                    status_code = None
+                else:
+                    if response.status_code == 200:
+                        data = response.json()
+                        choices = data.get('choices') or []
+                        if choices:
+                            return (choices[0].get('message', {}).get('content') or '').strip()
+                        return ''
+
+                    status_code = response.status_code
+                    last_error = f"HTTP {status_code}: {response.text[:200]}"
+
+                    if status_code not in self.RETRY_STATUSES:
+                        self.stats['errors'] += 1
+                        raise MistralAPIError(last_error, status_code)
+
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', ''))
+                    except ValueError:
+                        retry_after = None
+
+                if attempt < self.max_retries:
+                    self.stats['retries'] += 1
+                    delay = self._backoff_delay(attempt, retry_after)
+                    logger.warning(
+                        f"Appel Mistral échoué ({last_error}), "
+                        f"nouvel essai {attempt + 1}/{self.max_retries} dans {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+
+            self.stats['errors'] += 1
+            raise MistralAPIError(last_error, status_code)
+
+    async def complete_many(self, prompts, model):
+        """
+        Envoie plusieurs prompts en parallèle (dans la limite de concurrence)
+
+        Returns:
+            list: Texte généré ou MistralAPIError pour chaque prompt, dans l'ordre
+        """
+        results = await asyncio.gather(
+            *(self.complete(prompt, model) for prompt in prompts),
+            return_exceptions=True
+        )
+        return [
+            r if isinstance(r, (str, MistralAPIError)) else MistralAPIError(str(r))
+            for r in results
+        ]
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+class _LoopThread:
+    """
+    Boucle d'événements dédiée (thread démon) partagée par le processus,
+    pour que le code synchrone (vues Django, tâches Celery) réutilise
+    les mêmes connexions HTTP d'un appel à l'autre
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_loop_thread = None
+_client = None
+_lock = threading.Lock()
+
+
+def get_async_client():
+    """
+    Retourne le client asynchrone (singleton par processus)
+    """
+    global _client, _loop_thread
+
+    with _lock:
+        # Après un fork (workers Celery), ne pas réutiliser la boucle du parent
+        if _loop_thread is None or _loop_thread.pid != os.getpid():
+            _loop_thread = _LoopThread()
+            _client = None
+
+        if _client is None:
+            backend = getattr(settings, 'MISTRAL_BACKEND', 'api')
+            api_key = getattr(settings, 'MISTRAL_API_KEY', '') or os.getenv('MISTRAL_API_KEY', '')
+            transport = None
+
+            if backend == 'fake':
+                from .fake_llm import FakeMistralBackend, FakeMistralTransport
+                transport = FakeMistralTransport(FakeMistralBackend(
+                    latency=getattr(settings, 'MISTRAL_FAKE_LATENCY', 0.5),
+                    jitter=getattr(settings, 'MISTRAL_FAKE_LATENCY_JITTER', 0.2),
+                    error_rate=getattr(settings, 'MISTRAL_FAKE_ERROR_RATE', 0.0),
+                    seed=getattr(settings, 'MISTRAL_FAKE_SEED', 0),
+                ))
+                api_key = api_key or 'fake'
+                logger.warning("Backend Mistral simulé (MISTRAL_BACKEND=fake)")
+            elif not api_key:
+                logger.error("MISTRAL_API_KEY non configurée dans .env")
+                raise ValueError("MISTRAL_API_KEY manquante")
+
+            _client = AsyncMistralClient(
+                api_key=api_key,
+                base_url=getattr(settings, 'MISTRAL_API_URL', 'https://api.mistral.ai'),
+                timeout=getattr(settings, 'MISTRAL_TIMEOUT', 60.0),
+                max_concurrency=getattr(settings, 'MISTRAL_MAX_CONCURRENCY', 4),
+                rate_limit=getattr(settings, 'MISTRAL_RATE_LIMIT', 1.0),
+                rate_burst=getattr(settings, 'MISTRAL_RATE_BURST', 1),
+                max_retries=getattr(settings, 'MISTRAL_MAX_RETRIES', 4),
+                transport=transport,
+            )
+            logger.info("Client Mistral initialisé")
+
+    return _client
+
+
+def run_sync(coro):
+    """
+    Exécute une coroutine du client depuis du code synchrone
+    """
+    get_async_client()
+    return _loop_thread.run(coro)
@@ -2,72 +2,324 @@
 Service de résumé et analyse avec Mistral AI API
 Documentation: https://docs.mistral.ai/api
 """
-from mistralai import Mistral
 from django.conf import settings
+import hashlib
 import logging
 import os
+import re
 
-logger = logging.getLogger(__name__)
+from apps.recorder.monitoring import timed
+
+from .mistral_client import MistralAPIError, get_async_client, run_sync
+from . import llm_cache
 
-# Client Mistral (initialisé une seule fois)
-_mistral_client = None
+logger = logging.getLogger(__name__)
 
 
 def get_mistral_client():
     """
-    Retourne le client Mistral (singleton)
+    Retourne le client Mistral asynchrone (singleton)
+    """
+    return get_async_client()
+
+
+def call_mistral_many(prompts, model=None, return_exceptions=False, function='call_mistral'):
+    """
+    Envoie plusieurs prompts à l'API Mistral en parallèle
+    
+    La concurrence, le débit et les retries sont gérés par le client
+    (MISTRAL_MAX_CONCURRENCY, MISTRAL_RATE_LIMIT, MISTRAL_MAX_RETRIES).
+    Les réponses déjà obtenues pour un prompt identique sont lues dans
+    le cache persistant (MISTRAL_CACHE_ENABLED).
+    
+    Args:
+        prompts: Liste de prompts
+        model: Nom du modèle (par défaut: mistral-small-latest)
+        return_exceptions: Retourner les erreurs à la place des réponses
+                           au lieu de lever la première
+        function: Fonction appelante (statistiques du cache)
+    
+    Returns:
+        list: Réponses générées, dans l'ordre des prompts
+    
+    Raises:
+        MistralAPIError: Si un appel échoue (sauf si return_exceptions)
     """
-    global _mistral_client
+    if model is None:
+        model = getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest')
     
-    if _mistral_client is None:
-        api_key = os.getenv('MISTRAL_API_KEY', '')
-        if not api_key:
-            logger.error("MISTRAL_API_KEY non configurée dans .env")
-            raise ValueError("MISTRAL_API_KEY manquante")
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    
+    results = [None] * len(prompts)
+    use_cache = llm_cache.is_cache_enabled()
+    
+    if use_cache:
+        for i, response in llm_cache.cache_get_many(model, prompts, function).items():
+            results[i] = response
+    
+    # Prompts identiques dans le même lot : un seul appel
+    pending = {}
+    for i, result in enumerate(results):
+        if result is None:
+            pending.setdefault(prompts[i], []).append(i)
+    
+    if pending:
+        client = get_mistral_client()
+        logger.info(f"Appel API Mistral avec modèle {model} ({len(pending)} prompt(s))")
         
-        _mistral_client = Mistral(api_key=api_key)
-        logger.info("Client Mistral initialisé")
+        unique_prompts = list(pending)
+        with timed('llm'):
+            responses = run_sync(client.complete_many(unique_prompts, model))
+        for prompt, response in zip(unique_prompts, responses):
+            for i in pending[prompt]:
+                results[i] = response
+        
+        if use_cache:
+            llm_cache.cache_set_many(
+                model,
+                [
+                    (prompt, response) for prompt, response in zip(unique_prompts, responses)
+                    if not isinstance(response, MistralAPIError)
+                ],
+                function
+            )
+    
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, MistralAPIError):
+                logger.error(f"Erreur lors de l'appel API Mistral: {str(result)}")
+                raise result
     
-    return _mistral_client
+    return results
 
 
-def call_mistral(prompt, model=None):
+def call_mistral(prompt, model=None, function='call_mistral'):
     """
     Appelle l'API Mistral pour générer du texte
     
     Args:
         prompt: Le prompt à envoyer
         model: Nom du modèle (par défaut: mistral-small-latest)
+        function: Fonction appelante (statistiques du cache)
     
     Returns:
         str: La réponse générée
+    
+    Raises:
+        MistralAPIError: Si l'appel échoue après tous les retries
+    """
+    return call_mistral_many([prompt], model, function=function)[0]
+
+
+# Approximation du nombre de tokens (français : ~4 caractères par token)
+CHARS_PER_TOKEN = 4
+
+# Version des prompts de découpage : invalide les résumés de morceaux persistés
+CHUNK_PROMPT_VERSION = 1
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_transcript(text, max_tokens=None):
+    """
+    Découpe une transcription en morceaux d'au plus `max_tokens` tokens
+    
+    Le découpage suit les fins de phrases et est glouton depuis le début :
+    ajouter du texte à la fin ne modifie que le dernier morceau.
+    
+    Args:
+        text: Texte à découper
+        max_tokens: Budget par morceau (défaut: MISTRAL_CHUNK_TOKENS)
+    
+    Returns:
+        list: Morceaux de texte
+    """
+    if max_tokens is None:
+        max_tokens = getattr(settings, 'MISTRAL_CHUNK_TOKENS', 2000)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    
+    # Phrases, puis mots pour les phrases trop longues
+    pieces = []
+    for sentence in re.split(r'(?<=[.!?…])\s+', text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        current = ''
+        for word in words:
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+    
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    
+    return chunks
+
+
+def _chunk_key(chunk, model):
+    return hashlib.sha256(
+        f"{CHUNK_PROMPT_VERSION}\0{model}\0{chunk}".encode('utf-8')
+    ).hexdigest()[:32]
+
+
+def _summary_prompt(text, max_sentences):
+    return f"""Tu es un assistant pour Radio Occitania. Résume ce texte en maximum {max_sentences} phrases claires et concises. Le résumé doit être utile pour un animateur radio qui veut savoir rapidement de quoi parle cet enregistrement.
+
+Texte à résumer :
+{text}
+
+Résumé :"""
+
+
+def _chunk_summary_prompt(chunk):
+    return f"""Tu es un assistant pour Radio Occitania. Voici un extrait de la transcription d'un enregistrement radio. Résume cet extrait en 3 à 5 phrases factuelles (sujets abordés, intervenants, annonces), sans introduction.
+
+Extrait :
+{chunk}
+
+Résumé de l'extrait :"""
+
+
+def _reduce_prompt(summaries, max_sentences):
+    parts = '\n\n'.join(f"[Partie {i + 1}]\n{s}" for i, s in enumerate(summaries))
+    return f"""Tu es un assistant pour Radio Occitania. Voici les résumés successifs des parties d'un même enregistrement radio, dans l'ordre chronologique. Rédige un résumé global de l'enregistrement en maximum {max_sentences} phrases claires et concises. Le résumé doit être utile pour un animateur radio qui veut savoir rapidement de quoi parle cet enregistrement.
+
+{parts}
+
+Résumé global :"""
+
+
+def summarize_chunks(chunks, previous_chunks=None, model=None):
+    """
+    Résume les morceaux d'une transcription en parallèle (étape "map")
+    
+    Les morceaux déjà résumés lors d'un traitement précédent (même texte,
+    même modèle) sont réutilisés sans appel à l'API.
+    
+    Args:
+        chunks: Morceaux de texte (voir split_transcript)
+        previous_chunks: Résumés persistés [{'key', 'summary'}] (optionnel)
+        model: Nom du modèle (optionnel)
+    
+    Returns:
+        list: [{'key': str, 'summary': str}] dans l'ordre des morceaux
     """
     if model is None:
         model = getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest')
     
-    try:
-        client = get_mistral_client()
-        
-        logger.info(f"Appel API Mistral avec modèle {model}")
-        
-        response = client.chat.complete(
+    known = {c['key']: c['summary'] for c in (previous_chunks or []) if c.get('summary')}
+    records = [{'key': _chunk_key(chunk, model), 'summary': None} for chunk in chunks]
+    
+    pending = []
+    for record, chunk in zip(records, chunks):
+        if record['key'] in known:
+            record['summary'] = known[record['key']]
+        else:
+            pending.append((record, chunk))
+    
+    if pending:
+        logger.info(
+            f"Résumé de {len(pending)} morceau(x) sur {len(chunks)} "
+            f"({len(chunks) - len(pending)} réutilisé(s))"
+        )
+        responses = call_mistral_many(
+            [_chunk_summary_prompt(chunk) for _, chunk in pending],
             model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+            function='summarize_chunk'
         )
+        for (record, _), summary in zip(pending, responses):
+            record['summary'] = summary
+    
+    return records
+
+
+def _reduce_summaries(summaries, max_sentences, model):
+    """
+    Réduit des résumés partiels en un résumé final (étape "reduce"),
+    par niveaux successifs si leur total dépasse le budget
+    """
+    max_tokens = getattr(settings, 'MISTRAL_REDUCE_TOKENS', 6000)
+    
+    while estimate_tokens('\n\n'.join(summaries)) > max_tokens and len(summaries) > 1:
+        groups = []
+        current = []
+        for summary in summaries:
+            if current and estimate_tokens('\n\n'.join(current + [summary])) > max_tokens:
+                groups.append(current)
+                current = []
+            current.append(summary)
+        groups.append(current)
         
-        if response.choices and len(response.choices) > 0:
-            return response.choices[0].message.content.strip()
-        
-        return ""
+        if len(groups) == len(summaries):
+            # Chaque résumé dépasse seul le budget : regrouper par paires
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
         
-    except Exception as e:
-        logger.error(f"Erreur lors de l'appel API Mistral: {str(e)}")
-        return f"[Erreur API Mistral: {str(e)}]"
+        summaries = call_mistral_many(
+            [_reduce_prompt(group, 5) for group in groups],
+            model=model,
+            function='summarize_reduce'
+        )
+    
+    return call_mistral(
+        _reduce_prompt(summaries, max_sentences),
+        model=model,
+        function='summarize_reduce'
+    )
+
+
+def summarize_long_text(text, max_sentences=5, previous_chunks=None, model=None):
+    """
+    Résumé hiérarchique (map-reduce) d'une transcription complète
+    
+    Args:
+        text: Texte à résumer
+        max_sentences: Nombre max de phrases dans le résumé
+        previous_chunks: Résumés de morceaux persistés (ai_metadata['summary_chunks'])
+        model: Nom du modèle (optionnel)
+    
+    Returns:
+        tuple: (résumé, résumés des morceaux à persister)
+    
+    Raises:
+        MistralAPIError: Si l'API est indisponible (rien ne doit être enregistré)
+    """
+    if not text or len(text.strip()) < 50:
+        return "Texte trop court pour générer un résumé.", []
+    
+    if model is None:
+        model = getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest')
+    
+    chunks = split_transcript(text)
+    
+    if len(chunks) == 1:
+        summary = call_mistral(
+            _summary_prompt(chunks[0], max_sentences),
+            model=model,
+            function='summarize_text'
+        )
+        return (summary or "Résumé non disponible"), []
+    
+    records = summarize_chunks(chunks, previous_chunks, model)
+    summary = _reduce_summaries([r['summary'] for r in records], max_sentences, model)
+    
+    return (summary or "Résumé non disponible"), records
 
 
 def summarize_text(text, max_sentences=5):
@@ -80,23 +332,79 @@ def summarize_text(text, max_sentences=5):
     
     Returns:
         str: Résumé généré
+    
+    Raises:
+        MistralAPIError: Si l'API est indisponible (rien ne doit être enregistré)
     """
-    if not text or len(text.strip()) < 50:
-        return "Texte trop court pour générer un résumé."
+    return summarize_long_text(text, max_sentences)[0]
+
+
+def _blank_prompt(blank_duration, text_before, text_after):
+    return f"""Tu es un expert en analyse audio pour une radio. Un blanc de {blank_duration:.1f} secondes a été détecté.
+
+Contexte AVANT le blanc (5 secondes) :
+"{text_before}"
+
+Contexte APRÈS le blanc (5 secondes) :
+"{text_after}"
+
+Détermine si ce blanc est NATUREL (transition musicale, pause intentionnelle) ou SUSPECT (coupure technique, problème).
+
+Réponds UNIQUEMENT au format suivant (sans rien ajouter) :
+NATURAL: [OUI ou NON]
+CONFIDENCE: [0.0 à 1.0]
+EXPLICATION: [Une phrase courte expliquant ton analyse]"""
+
+
+def _clean_line(line):
+    """Ligne de réponse sans mise en forme Markdown (**ALERTE: 12**, ### ALERTE: 12, - NATURAL: OUI)"""
+    return line.replace('*', '').strip().lstrip('#-').strip()
+
+
+def _parse_blank_response(response):
+    """
+    Parse une réponse NATURAL / CONFIDENCE / EXPLICATION
+    """
+    is_natural = False
+    confidence = 0.5
+    explanation = response
+    
+    for line in response.split('\n'):
+        line = _clean_line(line)
+        if line.startswith('NATURAL:'):
+            is_natural = 'OUI' in line.upper()
+        elif line.startswith('CONFIDENCE:'):
+            try:
+                confidence = float(line.split(':')[1].strip())
+            except (ValueError, IndexError):
+                pass
+        elif line.startswith('EXPLICATION:'):
+            explanation = line.split(':', 1)[1].strip()
     
-    prompt = f"""Tu es un assistant pour Radio Occitania. Résume ce texte en maximum {max_sentences} phrases claires et concises. Le résumé doit être utile pour un animateur radio qui veut savoir rapidement de quoi parle cet enregistrement.
+    return {
+        'is_natural': is_natural,
+        'confidence': confidence,
+        'explanation': explanation
+    }
 
-Texte à résumer :
-{text[:5000]}
 
-Résumé :"""
+def _blank_context_texts(recording, start_time, end_time):
+    """
+    Transcrit le contexte (5s avant et après) d'un blanc
+    """
+    from apps.ai.whisper_service import transcribe_segment
     
-    try:
-        summary = call_mistral(prompt)
-        return summary if summary else "Résumé non disponible"
-    except Exception as e:
-        logger.error(f"Erreur lors du résumé: {str(e)}")
-        return f"[Erreur lors du résumé: {str(e)}]"
+    text_before = transcribe_segment(
+        recording.filepath,
+        max(0, start_time - 5),
+        start_time
+    )
+    text_after = transcribe_segment(
+        recording.filepath,
+        end_time,
+        end_time + 5
+    )
+    return text_before, text_after
 
 
 def analyze_blank_context(recording, start_time, end_time):
@@ -115,115 +423,237 @@ def analyze_blank_context(recording, start_time, end_time):
             'explanation': str
         }
     """
-    # Extraire le contexte (5s avant et après)
-    context_before_start = max(0, start_time - 5)
-    context_after_end = end_time + 5
+    text_before, text_after = _blank_context_texts(recording, start_time, end_time)
+    prompt = _blank_prompt(end_time - start_time, text_before, text_after)
     
-    # Obtenir la transcription du contexte
-    from apps.ai.whisper_service import transcribe_segment
+    try:
+        return _parse_blank_response(call_mistral(prompt, function='analyze_blank_context'))
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'analyse du blanc: {str(e)}")
+        return {
+            'is_natural': False,
+            'confidence': 0.0,
+            'explanation': f"Erreur d'analyse: {str(e)}"
+        }
+
+
+def _batch_blank_prompt(contexts):
+    """
+    Construit un prompt unique pour plusieurs blancs d'un même enregistrement
+    """
+    blocks = []
+    for ctx in contexts:
+        blocks.append('\n'.join([
+            f"ALERTE: {ctx['id']}",
+            f"Durée du blanc : {ctx['duration']:.1f} secondes",
+            f'Contexte AVANT (5 secondes) : "{ctx["before"]}"',
+            f'Contexte APRÈS (5 secondes) : "{ctx["after"]}"',
+        ]))
+    blocks = '\n\n'.join(blocks)
     
-    text_before = transcribe_segment(
-        recording.filepath,
-        context_before_start,
-        start_time
-    )
+    return f"""Tu es un expert en analyse audio pour une radio. {len(contexts)} blanc(s) ont été détectés dans un même enregistrement.
+
+{blocks}
+
+Pour CHAQUE blanc, détermine s'il est NATUREL (transition musicale, pause intentionnelle) ou SUSPECT (coupure technique, problème).
+
+Réponds UNIQUEMENT avec un bloc par blanc, dans ce format exact (sans rien ajouter) :
+ALERTE: [numéro de l'alerte]
+NATURAL: [OUI ou NON]
+CONFIDENCE: [0.0 à 1.0]
+EXPLICATION: [Une phrase courte expliquant ton analyse]"""
+
+
+def _parse_batch_blank_response(response):
+    """
+    Parse une réponse multi-blocs ALERTE / NATURAL / CONFIDENCE / EXPLICATION
     
-    text_after = transcribe_segment(
-        recording.filepath,
-        end_time,
-        context_after_end
-    )
+    Un bloc sans ligne NATURAL n'est pas un verdict : l'alerte est
+    absente du résultat.
+    
+    Returns:
+        dict: {id alerte: verdict}
+    """
+    verdicts = {}
+    current_id = None
+    current_lines = []
+    
+    def flush():
+        if current_id is not None and any(l.startswith('NATURAL:') for l in current_lines):
+            verdicts[current_id] = _parse_blank_response('\n'.join(current_lines))
     
-    blank_duration = end_time - start_time
+    for line in response.split('\n'):
+        stripped = _clean_line(line)
+        if stripped.upper().startswith('ALERTE:'):
+            flush()
+            current_lines = []
+            try:
+                current_id = int(stripped.split(':', 1)[1].strip().strip('[]#'))
+            except ValueError:
+                current_id = None
+        else:
+            current_lines.append(stripped)
+    flush()
     
-    prompt = f"""Tu es un expert en analyse audio pour une radio. Un blanc de {blank_duration:.1f} secondes a été détecté.
+    return verdicts
 
-Contexte AVANT le blanc (5 secondes) :
-"{text_before}"
 
-Contexte APRÈS le blanc (5 secondes) :
-"{text_after}"
+def _batch_blank_contexts(contexts):
+    """
+    Découpe les contextes en lots plafonnés (nombre d'alertes et taille du prompt)
+    """
+    max_alerts = getattr(settings, 'MISTRAL_BLANK_BATCH_SIZE', 20)
+    max_chars = getattr(settings, 'MISTRAL_BLANK_BATCH_CHARS', 8000)
+    
+    batches = []
+    current = []
+    current_chars = 0
+    for ctx in contexts:
+        size = len(ctx['before']) + len(ctx['after']) + 200
+        if current and (len(current) >= max_alerts or current_chars + size > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(ctx)
+        current_chars += size
+    if current:
+        batches.append(current)
+    
+    return batches
 
-Détermine si ce blanc est NATUREL (transition musicale, pause intentionnelle) ou SUSPECT (coupure technique, problème).
 
-Réponds UNIQUEMENT au format suivant (sans rien ajouter) :
-NATURAL: [OUI ou NON]
-CONFIDENCE: [0.0 à 1.0]
-EXPLICATION: [Une phrase courte expliquant ton analyse]"""
+def analyze_blank_contexts(recording, alerts):
+    """
+    Analyse tous les blancs d'un enregistrement en un minimum d'appels Mistral
+    
+    Les contextes sont regroupés dans des prompts structurés plafonnés
+    (MISTRAL_BLANK_BATCH_SIZE alertes, MISTRAL_BLANK_BATCH_CHARS caractères),
+    envoyés en parallèle, puis les verdicts sont extraits par alerte.
+    
+    Une alerte sans verdict (lot en erreur, bloc absent ou illisible) est
+    absente du résultat : elle n'est pas jugée suspecte par défaut et
+    reste à analyser.
+    
+    Args:
+        recording: Instance de Recording
+        alerts: Liste de BlankAlert
+    
+    Returns:
+        dict: {alert.id: {'is_natural', 'confidence', 'explanation'}}
+    """
+    contexts = []
+    for alert in alerts:
+        text_before, text_after = _blank_context_texts(
+            recording, alert.start_time, alert.end_time
+        )
+        contexts.append({
+            'id': alert.id,
+            'duration': alert.end_time - alert.start_time,
+            'before': text_before,
+            'after': text_after,
+        })
+    
+    batches = _batch_blank_contexts(contexts)
+    logger.info(
+        f"Analyse de {len(contexts)} blanc(s) en {len(batches)} appel(s) Mistral"
+    )
     
     try:
-        response = call_mistral(prompt)
-        
-        # Parser la réponse
-        is_natural = False
-        confidence = 0.5
-        explanation = response
-        
-        lines = response.split('\n')
-        for line in lines:
-            if line.startswith('NATURAL:'):
-                is_natural = 'OUI' in line.upper()
-            elif line.startswith('CONFIDENCE:'):
-                try:
-                    confidence = float(line.split(':')[1].strip())
-                except:
-                    pass
-            elif line.startswith('EXPLICATION:'):
-                explanation = line.split(':', 1)[1].strip()
-        
-        return {
-            'is_natural': is_natural,
-            'confidence': confidence,
-            'explanation': explanation
-        }
-        
+        responses = call_mistral_many(
+            [_batch_blank_prompt(batch) for batch in batches],
+            return_exceptions=True,
+            function='analyze_blank_contexts'
+        )
     except Exception as e:
-        logger.error(f"Erreur lors de l'analyse du blanc: {str(e)}")
-        return {
-            'is_natural': False,
-            'confidence': 0.0,
-            'explanation': f"Erreur d'analyse: {str(e)}"
-        }
+        responses = [e] * len(batches)
+    
+    analyses = {}
+    for batch, response in zip(batches, responses):
+        if isinstance(response, Exception):
+            logger.error(f"Erreur lors de l'analyse des blancs: {str(response)}")
+            continue
+        
+        verdicts = _parse_batch_blank_response(response)
+        missing = [ctx['id'] for ctx in batch if ctx['id'] not in verdicts]
+        if missing:
+            logger.warning(f"Verdict absent de la réponse pour les alertes {missing}")
+        for ctx in batch:
+            if ctx['id'] in verdicts:
+                analyses[ctx['id']] = verdicts[ctx['id']]
+    
+    return analyses
+
+
+def _keywords_prompt(text, max_keywords):
+    return f"""Extrait les {max_keywords} mots-clés les plus importants de ce texte. Réponds UNIQUEMENT avec les mots-clés séparés par des virgules, sans numérotation ni explication.
+
+Texte :
+{text}
+
+Mots-clés :"""
 
 
 def extract_keywords(text, max_keywords=10):
     """
     Extrait les mots-clés principaux d'un texte
     
+    Le texte complet est découpé comme pour le résumé (split_transcript) ;
+    les mots-clés de chaque morceau sont extraits en parallèle puis classés
+    par nombre de morceaux où ils apparaissent.
+    
     Args:
         text: Texte à analyser
         max_keywords: Nombre maximum de mots-clés
     
     Returns:
         list: Liste de mots-clés
+    
+    Raises:
+        MistralAPIError: Si l'API est indisponible
     """
     if not text or len(text.strip()) < 20:
         return []
     
-    prompt = f"""Extrait les {max_keywords} mots-clés les plus importants de ce texte. Réponds UNIQUEMENT avec les mots-clés séparés par des virgules, sans numérotation ni explication.
-
-Texte :
-{text[:2000]}
-
-Mots-clés :"""
+    chunks = split_transcript(text)
+    responses = call_mistral_many(
+        [_keywords_prompt(chunk, max_keywords) for chunk in chunks],
+        function='extract_keywords'
+    )
     
-    try:
-        response = call_mistral(prompt)
-        keywords = [kw.strip() for kw in response.split(',')]
-        return keywords[:max_keywords]
-    except Exception as e:
-        logger.error(f"Erreur lors de l'extraction des mots-clés: {str(e)}")
-        return []
+    # Fusion : fréquence entre morceaux, puis ordre d'apparition
+    counts = {}
+    labels = {}
+    for response in responses:
+        seen = set()
+        for kw in response.split(','):
+            kw = kw.strip().strip('.')
+            key = kw.lower()
+            if not kw or key in seen:
+                continue
+            seen.add(key)
+            labels.setdefault(key, kw)
+            counts[key] = counts.get(key, 0) + 1
+    
+    ranked = sorted(counts, key=lambda k: -counts[k])
+    return [labels[k] for k in ranked[:max_keywords]]
 
 
 def get_model_info():
     """
     Retourne les informations sur le modèle Mistral configuré
     """
+    api_url = getattr(settings, 'MISTRAL_API_URL', 'https://api.mistral.ai').rstrip('/')
     return {
         'model': getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest'),
         'provider': 'Mistral AI API',
-        'api_url': 'https://api.mistral.ai/v1/chat/completions',
-        'api_key_configured': bool(os.getenv('MISTRAL_API_KEY'))
+        'backend': getattr(settings, 'MISTRAL_BACKEND', 'api'),
+        'api_url': f'{api_url}/v1/chat/completions',
+        'api_key_configured': bool(
+            getattr(settings, 'MISTRAL_API_KEY', '') or os.getenv('MISTRAL_API_KEY')
+        ),
+        'max_concurrency': getattr(settings, 'MISTRAL_MAX_CONCURRENCY', 4),
+        'rate_limit': getattr(settings, 'MISTRAL_RATE_LIMIT', 1.0),
+        'max_retries': getattr(settings, 'MISTRAL_MAX_RETRIES', 4),
     }
 
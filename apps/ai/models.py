@@ -1,8 +1,147 @@
 """
 Modèles pour les services IA
-(Pas de modèles nécessaires pour l'instant, les résultats sont stockés dans Recording)
+(les résultats d'analyse sont stockés dans Recording)
 """
 from django.db import models
 
-# Placeholder pour futures extensions
 
+class LLMCacheEntry(models.Model):
+    """
+    Réponse Mistral mise en cache, indexée par l'empreinte (backend + modèle + prompt)
+    """
+    fingerprint = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Empreinte'
+    )
+    model = models.CharField(
+        max_length=128,
+        verbose_name='Modèle'
+    )
+    function = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Fonction appelante'
+    )
+    response = models.TextField(
+        verbose_name='Réponse'
+    )
+    size = models.IntegerField(
+        default=0,
+        verbose_name='Taille (octets)'
+    )
+    hits = models.IntegerField(
+        default=0,
+        verbose_name='Utilisations'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Créé le'
+    )
+    last_used_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Dernière utilisation'
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='Expire le'
+    )
+    
+    class Meta:
+        verbose_name = 'Réponse LLM en cache'
+        verbose_name_plural = 'Réponses LLM en cache'
+        ordering = ['-last_used_at']
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['last_used_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.function or self.model} ({self.fingerprint[:12]})"
+
+
+class LLMCacheStat(models.Model):
+    """
+    Compteurs de hits / misses du cache LLM par fonction appelante
+    """
+    function = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Fonction'
+    )
+    hits = models.BigIntegerField(
+        default=0,
+        verbose_name='Hits'
+    )
+    misses = models.BigIntegerField(
+        default=0,
+        verbose_name='Misses'
+    )
+    
+    class Meta:
+        verbose_name = 'Statistique du cache LLM'
+        verbose_name_plural = 'Statistiques du cache LLM'
+        ordering = ['function']
+    
+    def __str__(self):
+        return f"{self.function}: {self.hit_rate:.0%}"
+    
+    @property
+    def hit_rate(self):
+        """Taux de hits (0-1)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class KeywordTerm(models.Model):
+    """
+    Fréquence documentaire d'un terme sur l'ensemble de l'archive
+    (index TF-IDF local, mis à jour de façon incrémentale)
+    """
+    term = models.CharField(
+        max_length=128,
+        unique=True,
+        verbose_name='Terme'
+    )
+    df = models.IntegerField(
+        default=0,
+        verbose_name='Fréquence documentaire'
+    )
+    
+    class Meta:
+        verbose_name = 'Terme indexé'
+        verbose_name_plural = 'Termes indexés'
+        ordering = ['-df']
+    
+    def __str__(self):
+        return f"{self.term} ({self.df})"
+
+
+class KeywordDocument(models.Model):
+    """
+    Termes d'une transcription comptés dans l'index (pour les mises à jour)
+    """
+    recording = models.OneToOneField(
+        'archive.Recording',
+        on_delete=models.CASCADE,
+        related_name='keyword_document',
+        verbose_name='Enregistrement'
+    )
+    transcript_hash = models.CharField(
+        max_length=64,
+        verbose_name='Empreinte de la transcription'
+    )
+    terms = models.JSONField(
+        default=list,
+        verbose_name='Termes'
+    )
+    indexed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Indexé le'
+    )
+    
+    class Meta:
+        verbose_name = 'Document indexé'
+        verbose_name_plural = 'Documents indexés'
+    
+    def __str__(self):
+        return f"Index {self.recording_id} ({len(self.terms)} termes)"
@@ -0,0 +1,17 @@
+"""
+Tâches Celery pour l'IA
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def evict_llm_cache():
+    """
+    Purge le cache LLM (entrées expirées puis éviction LRU par taille)
+    """
+    from .llm_cache import evict_cache
+    
+    return evict_cache()
@@ -6,7 +6,8 @@ from .views import (
     transcribe,
     summarize,
     extract_keywords_view,
-    models_info
+    models_info,
+    llm_cache_stats
 )
 
 urlpatterns = [
@@ -14,5 +15,6 @@ urlpatterns = [
     path('summarize/', summarize, name='summarize'),
     path('extract-keywords/', extract_keywords_view, name='extract-keywords'),
     path('models-info/', models_info, name='models-info'),
+    path('cache-stats/', llm_cache_stats, name='llm-cache-stats'),
 ]
 
@@ -5,15 +5,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 
-from .whisper_service import transcribe_file, get_model_info as get_whisper_info
+from .whisper_service import (
+    transcribe_file_detailed,
+    resolve_profile,
+    get_model_info as get_whisper_info
+)
 from .mistral_service import (
-    summarize_text,
+    summarize_long_text,
     extract_keywords,
     get_model_info as get_mistral_info
 )
+from .keywords import extract_keywords_local, tags_producer
+from .llm_cache import get_cache_stats
 from apps.archive.models import Recording
 
+# Nombre maximum de mots-clés demandés (taille du prompt et de la réponse)
+MAX_KEYWORDS = 50
+
 
 @api_view(['POST'])
 def transcribe(request):
@@ -23,9 +33,12 @@ def transcribe(request):
     Body params:
     - recording_id: ID de l'enregistrement
     - language: Langue (optionnel, défaut: fr)
+    - profile: Profil de transcription fast/balanced/accurate
+      (optionnel, défaut: profil de la station ou profil par défaut)
     """
     recording_id = request.data.get('recording_id')
     language = request.data.get('language', 'fr')
+    profile = request.data.get('profile')
     
     if not recording_id:
         return Response(
@@ -42,15 +55,38 @@ def transcribe(request):
         )
     
     try:
-        text = transcribe_file(recording.filepath, language)
+        resolve_profile(profile, recording.station)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        result = transcribe_file_detailed(
+            recording.filepath,
+            language,
+            profile=profile,
+            station=recording.station
+        )
+        if result['error']:
+            return Response(
+                {'error': f"Erreur lors de la transcription: {result['error']}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        text = result['text']
+        stats = {k: v for k, v in result.items() if k not in ('text', 'error')}
+        
         recording.transcript = text
+        recording.ai_metadata = {**(recording.ai_metadata or {}), 'transcription': stats}
         recording.save()
         
         return Response({
             'success': True,
             'recording_id': recording.id,
             'transcript': text,
-            'length': len(text)
+            'length': len(text),
+            **stats
         })
     except Exception as e:
         return Response(
@@ -93,8 +129,14 @@ def summarize(request):
         )
     
     try:
-        summary = summarize_text(recording.transcript, max_sentences)
+        metadata = recording.ai_metadata or {}
+        summary, chunks = summarize_long_text(
+            recording.transcript,
+            max_sentences,
+            previous_chunks=metadata.get('summary_chunks')
+        )
         recording.summary = summary
+        recording.ai_metadata = {**metadata, 'summary_chunks': chunks}
         recording.save()
         
         return Response({
@@ -116,10 +158,29 @@ def extract_keywords_view(request):
     
     Body params:
     - recording_id: ID de l'enregistrement
-    - max_keywords: Nombre max de mots-clés (optionnel)
+    - max_keywords: Nombre max de mots-clés (optionnel, défaut 10, plafonné à MAX_KEYWORDS)
+    - engine: Moteur d'extraction "mistral" (API) ou "local" (TF-IDF sur l'archive)
+      (optionnel, défaut: KEYWORD_ENGINE)
     """
     recording_id = request.data.get('recording_id')
-    max_keywords = request.data.get('max_keywords', 10)
+    engine = request.data.get('engine', getattr(settings, 'KEYWORD_ENGINE', 'mistral'))
+    
+    try:
+        max_keywords = int(request.data.get('max_keywords', 10))
+    except (TypeError, ValueError):
+        max_keywords = 0
+    if max_keywords < 1:
+        return Response(
+            {'error': 'Le paramètre "max_keywords" doit être un entier positif'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_keywords = min(max_keywords, MAX_KEYWORDS)
+    
+    if engine not in ('mistral', 'local'):
+        return Response(
+            {'error': 'Le paramètre "engine" doit valoir "mistral" ou "local"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     if not recording_id:
         return Response(
@@ -142,15 +203,25 @@ def extract_keywords_view(request):
         )
     
     try:
-        keywords = extract_keywords(recording.transcript, max_keywords)
+        if engine == 'local':
+            keywords = extract_keywords_local(
+                recording.transcript, max_keywords, recording=recording
+            )
+        else:
+            keywords = extract_keywords(recording.transcript, max_keywords)
         
-        # Mettre à jour les tags
+        # Mettre à jour les tags (avec leur provenance)
         recording.tags = keywords
+        recording.ai_metadata = {
+            **(recording.ai_metadata or {}),
+            'tags_producer': tags_producer(engine, max_keywords)
+        }
         recording.save()
         
         return Response({
             'success': True,
             'recording_id': recording.id,
+            'engine': engine,
             'keywords': keywords
         })
     except Exception as e:
@@ -170,3 +241,10 @@ def models_info(request):
         'mistral': get_mistral_info()
     })
 
+
+@api_view(['GET'])
+def llm_cache_stats(request):
+    """
+    Retourne les statistiques du cache LLM (taille, hit-rate par fonction)
+    """
+    return Response(get_cache_stats())
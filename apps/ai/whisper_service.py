@@ -5,6 +5,9 @@ Supporte à la fois l'installation locale et les API externes
 from django.conf import settings
 import logging
 import os
+import time
+
+from apps.recorder.monitoring import StageInterrupted, checkpoint, timed
 
 logger = logging.getLogger(__name__)
 
@@ -17,27 +20,109 @@ except ImportError:
     WHISPER_AVAILABLE = False
     logger.warning("Whisper non installé localement, utilisation d'API externe recommandée")
 
-# Initialisation du modèle Whisper (lazy loading)
-_whisper_model = None
+# Modèles Whisper chargés (lazy loading, un par taille de modèle)
+_whisper_models = {}
+
+# Whisper ré-échantillonne toujours en 16 kHz mono
+WHISPER_SAMPLE_RATE = 16000
+
+# Profils de transcription : compromis vitesse / précision
+# - model : taille du modèle Whisper (None = settings.WHISPER_MODEL)
+# - beam_size / best_of : recherche en faisceau (None = décodage glouton)
+# - temperature : températures de repli si le décodage échoue
+# - condition_on_previous_text : conditionner sur le texte précédent
+# - chunk_duration : découpage en morceaux indépendants (secondes, None = pas de découpage)
+TRANSCRIPTION_PROFILES = {
+    'fast': {
+        'model': 'tiny',
+        'beam_size': None,
+        'best_of': None,
+        'temperature': (0.0,),
+        'condition_on_previous_text': False,
+        'chunk_duration': 300,
+    },
+    'balanced': {
+        'model': None,
+        'beam_size': None,
+        'best_of': 2,
+        'temperature': (0.0, 0.4, 0.8),
+        'condition_on_previous_text': False,
+        'chunk_duration': 900,
+    },
+    'accurate': {
+        'model': 'small',
+        'beam_size': 5,
+        'best_of': 5,
+        'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': True,
+        'chunk_duration': None,
+    },
+}
 
 
-def get_whisper_model():
+def get_transcription_profiles():
+    """
+    Retourne les profils de transcription disponibles
+    (profils intégrés surchargés par settings.WHISPER_PROFILES)
+    """
+    profiles = {name: dict(options) for name, options in TRANSCRIPTION_PROFILES.items()}
+    for name, options in getattr(settings, 'WHISPER_PROFILES', {}).items():
+        profiles.setdefault(name, {}).update(options)
+    return profiles
+
+
+def resolve_profile(profile=None, station=None):
+    """
+    Détermine le profil de transcription à utiliser
+    
+    Priorité : profil explicite > profil de la station > profil par défaut
+    
+    Args:
+        profile: Nom du profil demandé (optionnel)
+        station: Station de l'enregistrement (optionnel)
+    
+    Returns:
+        tuple: (nom du profil, options du profil)
+    
+    Raises:
+        ValueError: Si le profil est inconnu
     """
-    Charge le modèle Whisper (singleton) - uniquement si installé localement
+    profiles = get_transcription_profiles()
+    
+    if not profile and station:
+        profile = getattr(settings, 'WHISPER_STATION_PROFILES', {}).get(station)
+    if not profile:
+        profile = getattr(settings, 'WHISPER_DEFAULT_PROFILE', 'balanced')
+    
+    if profile not in profiles:
+        raise ValueError(
+            f"Profil de transcription inconnu: {profile} "
+            f"(disponibles: {', '.join(sorted(profiles))})"
+        )
+    
+    return profile, profiles[profile]
+
+
+def get_whisper_model(model_name=None):
     """
-    global _whisper_model
+    Charge un modèle Whisper (un singleton par taille) - uniquement si installé localement
     
+    Args:
+        model_name: Taille du modèle (par défaut: settings.WHISPER_MODEL)
+    """
     if not WHISPER_AVAILABLE:
         raise ImportError("Whisper n'est pas installé. Installez avec: pip install openai-whisper torch")
     
-    if _whisper_model is None:
+    if model_name is None:
         model_name = getattr(settings, 'WHISPER_MODEL', 'base')
+    
+    if model_name not in _whisper_models:
         device = getattr(settings, 'WHISPER_DEVICE', 'cpu')
         
         logger.info(f"Chargement du modèle Whisper '{model_name}' sur {device}")
         
         try:
-            _whisper_model = whisper.load_model(
+            _whisper_models[model_name] = whisper.load_model(
                 model_name,
                 device=device
             )
@@ -46,101 +131,236 @@ def get_whisper_model():
             logger.error(f"Erreur lors du chargement de Whisper: {str(e)}")
             raise
     
-    return _whisper_model
+    return _whisper_models[model_name]
 
 
-def transcribe_file(filepath, language='fr'):
+def _decode_options(options):
     """
-    Transcrit un fichier audio en texte
+    Convertit les options d'un profil en arguments pour model.transcribe()
+    """
+    decode_options = {
+        'temperature': tuple(options.get('temperature') or (0.0,)),
+        'condition_on_previous_text': options.get('condition_on_previous_text', True),
+    }
+    # beam_size n'est utilisé qu'à température nulle, best_of qu'en échantillonnage
+    if options.get('beam_size'):
+        decode_options['beam_size'] = options['beam_size']
+    if options.get('best_of'):
+        decode_options['best_of'] = options['best_of']
+    return decode_options
+
+
+def load_audio(filepath):
+    """
+    Audio 16 kHz mono d'un fichier : cache PCM partagé par les étapes
+    du traitement, ou décodage Whisper si le cache est désactivé
+    
+    Returns:
+        numpy.ndarray: Échantillons float32
+    """
+    from apps.recorder.pcm_cache import is_pcm_cache_enabled, load_pcm
+    
+    if is_pcm_cache_enabled():
+        try:
+            return load_pcm(filepath)
+        except StageInterrupted:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache PCM indisponible, décodage direct: {str(e)}")
+    return whisper.load_audio(filepath)
+
+
+def load_audio_segment(filepath, start_time, end_time):
+    """
+    Audio 16 kHz mono d'une portion de fichier, sans décoder ce qui précède
+    
+    Returns:
+        numpy.ndarray: Échantillons float32
+    """
+    import numpy as np
+    from apps.recorder.services import decode_segment
+    
+    start_time = max(0.0, start_time)
+    if end_time <= start_time:
+        return np.zeros(0, dtype=np.float32)
+    raw = decode_segment(filepath, start_time, end_time, sample_rate=WHISPER_SAMPLE_RATE)
+    return np.frombuffer(raw, dtype=np.float32).copy()
+
+
+def _transcribe_audio(audio, model, language, options):
+    """
+    Transcrit un tableau audio (découpé selon le profil)
+    
+    Returns:
+        str: Texte transcrit
+    """
+    chunk_duration = options.get('chunk_duration')
+    if chunk_duration and len(audio) > chunk_duration * WHISPER_SAMPLE_RATE:
+        chunk_size = int(chunk_duration * WHISPER_SAMPLE_RATE)
+        chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+    else:
+        chunks = [audio]
+    
+    texts = []
+    for chunk in chunks:
+        checkpoint()
+        with timed('asr'):
+            chunk_result = model.transcribe(
+                chunk,
+                language=language,
+                fp16=torch.cuda.is_available() if WHISPER_AVAILABLE else False,
+                verbose=False,
+                **_decode_options(options)
+            )
+        texts.append(chunk_result.get('text', '').strip())
+    
+    return ' '.join(t for t in texts if t)
+
+
+def transcribe_file_detailed(filepath, language='fr', profile=None, station=None):
+    """
+    Transcrit un fichier audio selon un profil et mesure le facteur temps réel
     
     Args:
         filepath: Chemin du fichier audio
         language: Langue de transcription (fr, en, etc.)
+        profile: Nom du profil (fast, balanced, accurate)
+        station: Station de l'enregistrement (pour le profil par station)
     
     Returns:
-        str: Texte transcrit
+        dict: {
+            'text': str,
+            'profile': str,
+            'model': str,
+            'audio_duration': float (secondes),
+            'processing_time': float (secondes),
+            'real_time_factor': float (temps de traitement / durée audio),
+            'error': str ou None (fichier introuvable, Whisper absent ou
+                     en échec : 'text' n'est alors pas une transcription)
+        }
+    
+    Raises:
+        ValueError: Si le profil est inconnu
     """
+    profile_name, options = resolve_profile(profile, station)
+    model_name = options.get('model') or getattr(settings, 'WHISPER_MODEL', 'base')
+    
+    result = {
+        'text': '',
+        'profile': profile_name,
+        'model': model_name,
+        'audio_duration': 0.0,
+        'processing_time': 0.0,
+        'real_time_factor': None,
+        'error': None,
+    }
+    
     if not os.path.exists(filepath):
         logger.error(f"Fichier introuvable: {filepath}")
-        return ""
+        result['error'] = f"Fichier introuvable: {filepath}"
+        return result
     
     if not WHISPER_AVAILABLE:
         logger.warning("Whisper non disponible - transcription désactivée")
-        return "[Transcription désactivée - Whisper non installé. Installez avec: pip install openai-whisper torch]"
+        result['text'] = "[Transcription désactivée - Whisper non installé. Installez avec: pip install openai-whisper torch]"
+        result['error'] = "Whisper non installé"
+        return result
     
     try:
-        model = get_whisper_model()
+        model = get_whisper_model(model_name)
         
-        logger.info(f"Transcription de {filepath} (langue: {language})")
-        
-        # Options de transcription
-        result = model.transcribe(
-            filepath,
-            language=language,
-            fp16=torch.cuda.is_available() if WHISPER_AVAILABLE else False,
-            verbose=False
+        logger.info(
+            f"Transcription de {filepath} (langue: {language}, profil: {profile_name})"
         )
         
-        text = result.get('text', '').strip()
+        started = time.monotonic()
+        
+        # Décodage unique du fichier, réutilisé pour tous les morceaux
+        audio = load_audio(filepath)
+        audio_duration = len(audio) / WHISPER_SAMPLE_RATE
         
-        logger.info(f"Transcription terminée ({len(text)} caractères)")
+        result['text'] = _transcribe_audio(audio, model, language, options)
         
-        return text
+        processing_time = time.monotonic() - started
         
+        result['audio_duration'] = round(audio_duration, 3)
+        result['processing_time'] = round(processing_time, 3)
+        if audio_duration > 0:
+            result['real_time_factor'] = round(processing_time / audio_duration, 4)
+        
+        logger.info(
+            f"Transcription terminée ({len(result['text'])} caractères, "
+            f"RTF {result['real_time_factor']})"
+        )
+        
+        return result
+        
+    except StageInterrupted:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la transcription: {str(e)}")
-        return f"[Erreur de transcription: {str(e)}]"
+        result['text'] = f"[Erreur de transcription: {str(e)}]"
+        result['error'] = str(e)
+        return result
+
+
+def transcribe_file(filepath, language='fr', profile=None, station=None):
+    """
+    Transcrit un fichier audio en texte
+    
+    Args:
+        filepath: Chemin du fichier audio
+        language: Langue de transcription (fr, en, etc.)
+        profile: Nom du profil de transcription (optionnel)
+        station: Station de l'enregistrement (optionnel)
+    
+    Returns:
+        str: Texte transcrit
+    """
+    return transcribe_file_detailed(filepath, language, profile, station)['text']
 
 
-def transcribe_segment(filepath, start_time, end_time, language='fr'):
+def transcribe_segment(filepath, start_time, end_time, language='fr', profile=None):
     """
     Transcrit un segment spécifique d'un fichier audio
     
+    Le segment est une tranche de l'audio décodé en cache (aucun
+    redécodage du fichier ni fichier temporaire par segment). Sans cache,
+    seul le segment est décodé (index de positionnement pour MP3 / FLAC).
+    
     Args:
         filepath: Chemin du fichier audio
         start_time: Début en secondes
         end_time: Fin en secondes
         language: Langue de transcription
+        profile: Profil de transcription (optionnel)
     
     Returns:
         str: Texte transcrit du segment
     """
-    # Note: Whisper ne supporte pas nativement les segments
-    # On pourrait extraire le segment avec FFmpeg d'abord
+    from apps.recorder.pcm_cache import is_pcm_cache_enabled
     
-    from apps.recorder.services import get_audio_metadata
-    import subprocess
-    import tempfile
+    if not WHISPER_AVAILABLE:
+        return transcribe_file(filepath, language, profile=profile)
     
     try:
-        # Extraire le segment avec FFmpeg
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-            tmp_path = tmp.name
-        
-        ffmpeg_path = settings.FFMPEG_PATH
-        duration = end_time - start_time
-        
-        cmd = [
-            ffmpeg_path,
-            '-i', filepath,
-            '-ss', str(start_time),
-            '-t', str(duration),
-            '-vn',
-            '-ar', '16000',  # Whisper préfère 16kHz
-            '-ac', '1',  # Mono pour Whisper
-            tmp_path
-        ]
-        
-        subprocess.run(cmd, check=True, capture_output=True)
-        
-        # Transcrire le segment
-        text = transcribe_file(tmp_path, language)
+        _, options = resolve_profile(profile)
+        model = get_whisper_model(options.get('model'))
         
-        # Nettoyer
-        os.remove(tmp_path)
+        if is_pcm_cache_enabled():
+            audio = load_audio(filepath)
+            start = max(0, int(start_time * WHISPER_SAMPLE_RATE))
+            end = max(start, int(end_time * WHISPER_SAMPLE_RATE))
+            segment = audio[start:end]
+        else:
+            segment = load_audio_segment(filepath, start_time, end_time)
+        if len(segment) == 0:
+            return ""
         
-        return text
+        return _transcribe_audio(segment, model, language, options)
         
+    except StageInterrupted:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la transcription du segment: {str(e)}")
         return ""
@@ -163,6 +383,9 @@ def get_model_info():
         'available': True,
         'model': model_name,
         'device': device,
-        'loaded': _whisper_model is not None
+        'loaded': bool(_whisper_models),
+        'loaded_models': sorted(_whisper_models),
+        'default_profile': getattr(settings, 'WHISPER_DEFAULT_PROFILE', 'balanced'),
+        'profiles': get_transcription_profiles(),
     }
 
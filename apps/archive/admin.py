@@ -2,29 +2,40 @@
 Configuration admin pour l'archive
 """
 from django.contrib import admin
-from .models import Recording, BlankAlert
+from .models import Recording, BlankAlert, ProcessingStage, ProcessingLease, StorageUsage, TimelineSegment
+
+
+class ProcessingStageInline(admin.TabularInline):
+    model = ProcessingStage
+    extra = 0
+    can_delete = False
+    readonly_fields = [
+        'name', 'status', 'queued_at', 'started_at', 'finished_at',
+        'duration', 'error', 'input_fingerprint', 'analyzer_version', 'params', 'output',
+        'queue_wait', 'audio_seconds', 'real_time_factor', 'timings'
+    ]
 
 
 @admin.register(Recording)
 class RecordingAdmin(admin.ModelAdmin):
     list_display = [
-        'title', 'filename', 'status', 'duration_formatted',
+        'title', 'filename', 'station', 'status', 'duration_formatted',
         'flagged_blank', 'created_at', 'expires_at', 'owner'
     ]
-    list_filter = ['status', 'format', 'flagged_blank', 'created_at']
+    list_filter = ['status', 'station', 'format', 'storage_tier', 'flagged_blank', 'created_at']
     search_fields = ['title', 'filename', 'transcript', 'summary']
     readonly_fields = [
         'created_at', 'updated_at', 'duration_formatted',
-        'is_expired', 'file_size'
+        'is_expired', 'file_size', 'storage_tier', 'checksum'
     ]
     fieldsets = (
         ('Informations générales', {
-            'fields': ('title', 'filename', 'filepath', 'status', 'owner')
+            'fields': ('title', 'filename', 'filepath', 'station', 'status', 'owner')
         }),
         ('Métadonnées audio', {
             'fields': (
                 'duration', 'duration_formatted', 'format', 'bitrate',
-                'sample_rate', 'channels', 'file_size'
+                'sample_rate', 'channels', 'file_size', 'storage_tier', 'checksum'
             )
         }),
         ('Détection de silence', {
@@ -35,12 +46,13 @@ class RecordingAdmin(admin.ModelAdmin):
         }),
         ('Gestion', {
             'fields': (
-                'created_at', 'updated_at', 'expires_at',
+                'started_at', 'created_at', 'updated_at', 'expires_at',
                 'is_expired', 'tags', 'notes'
             )
         }),
     )
     
+    inlines = [ProcessingStageInline]
     actions = ['mark_as_completed', 'extend_retention']
     
     def mark_as_completed(self, request, queryset):
@@ -89,3 +101,31 @@ class BlankAlertAdmin(admin.ModelAdmin):
         }),
     )
 
+
+@admin.register(ProcessingLease)
+class ProcessingLeaseAdmin(admin.ModelAdmin):
+    list_display = [
+        'recording', 'token', 'expires_at', 'rerun_requested',
+        'runs', 'duplicates_avoided'
+    ]
+    list_filter = ['rerun_requested']
+    readonly_fields = [
+        'recording', 'token', 'acquired_at', 'heartbeat_at', 'expires_at',
+        'rerun_requested', 'rerun_force', 'rerun_stages', 'runs', 'duplicates_avoided'
+    ]
+
+
+@admin.register(StorageUsage)
+class StorageUsageAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'key', 'recordings', 'bytes', 'updated_at']
+    list_filter = ['scope']
+    search_fields = ['key']
+    readonly_fields = ['scope', 'key', 'recordings', 'bytes', 'updated_at']
+
+
+@admin.register(TimelineSegment)
+class TimelineSegmentAdmin(admin.ModelAdmin):
+    list_display = ['station', 'starts_at', 'ends_at', 'recording', 'offset']
+    list_filter = ['station']
+    date_hierarchy = 'starts_at'
+    readonly_fields = ['station', 'recording', 'starts_at', 'ends_at', 'offset']
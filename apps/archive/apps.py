@@ -6,3 +6,7 @@ class ArchiveConfig(AppConfig):
     name = 'apps.archive'
     verbose_name = 'Archive des enregistrements'
 
+    def ready(self):
+        # Comptabilité du stockage (signaux des modèles)
+        from . import storage  # noqa: F401
+
@@ -0,0 +1,224 @@
+"""
+Extraits d'enregistrements ("de la minute 42 à 47")
+
+Les bornes sont données en secondes depuis le début du fichier ou en
+heure réelle (Recording.started_at). L'extrait est produit sans décoder
+ce qui précède (voir extract_audio_clip), mis en cache sur disque puis
+servi comme un fichier (Range, ETag, délégation au proxy) : une
+deuxième demande du même extrait ne coûte qu'une lecture.
+
+Les entrées sont indexées par l'identité du fichier source (chemin,
+taille, date de modification) : un changement de niveau de stockage ou
+une capture en cours produisent de nouvelles entrées. Les moins
+récemment utilisées sont évincées au-delà de CLIP_CACHE_MAX_BYTES ou
+après CLIP_CACHE_MAX_AGE secondes.
+"""
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pathlib import Path
+import fcntl
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def get_clip_cache_dir():
+    cache_dir = Path(getattr(settings, 'CLIP_CACHE_DIR', '') or Path(settings.MEDIA_ROOT) / '.clip_cache')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def _parse_instant(value, recording):
+    """Secondes depuis le début du fichier : nombre ou date ISO 8601"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    instant = parse_datetime(str(value))
+    if instant is None:
+        raise ValueError(f"Position invalide: {value} (secondes ou date ISO 8601)")
+    if timezone.is_naive(instant):
+        instant = timezone.make_aware(instant)
+    return (instant - recording.wall_clock_start).total_seconds()
+
+
+def resolve_clip_bounds(recording, start, end):
+    """
+    Bornes d'un extrait en secondes depuis le début du fichier
+
+    Args:
+        recording: Enregistrement
+        start: Secondes ou date ISO 8601 (heure réelle)
+        end: Secondes ou date ISO 8601 (heure réelle)
+
+    Returns:
+        tuple: (début, fin) en secondes
+
+    Raises:
+        ValueError: Si les bornes sont absentes, inversées, hors de
+                    l'enregistrement ou plus longues que CLIP_MAX_DURATION
+    """
+    if start in (None, '') or end in (None, ''):
+        raise ValueError("Les paramètres start et end sont requis")
+
+    start, end = _parse_instant(start, recording), _parse_instant(end, recording)
+    if start < 0 or end <= start:
+        raise ValueError(f"Bornes invalides: {start:.3f}s - {end:.3f}s")
+    if recording.duration and start >= recording.duration:
+        raise ValueError(f"Début au-delà de la fin de l'enregistrement ({recording.duration:.0f}s)")
+
+    max_duration = getattr(settings, 'CLIP_MAX_DURATION', 4 * 3600)
+    if end - start > max_duration:
+        raise ValueError(f"Extrait trop long (maximum {max_duration}s)")
+
+    if recording.duration:
+        end = min(end, recording.duration)
+    return start, end
+
+
+def clip_path(recording, start, end):
+    """Entrée de cache d'un extrait (selon l'identité du fichier source)"""
+    stat = os.stat(recording.filepath)
+    key = hashlib.sha256(
+        f"{os.path.abspath(recording.filepath)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        f"\0{start:.6f}\0{end:.6f}".encode('utf-8')
+    ).hexdigest()[:32]
+    suffix = Path(recording.filepath).suffix or f".{recording.format}"
+    return get_clip_cache_dir() / f"{key}{suffix}"
+
+
+def clip_filename(recording, start, end):
+    """Nom de téléchargement : <nom>_<début>-<fin>.<ext>"""
+    stem = Path(recording.filename or recording.filepath).stem
+    suffix = Path(recording.filepath).suffix
+    return f"{stem}_{round(start, 3):g}-{round(end, 3):g}{suffix}"
+
+
+def _touch(path):
+    """
+    Marque une entrée comme utilisée (date d'accès, base de l'éviction)
+
+    La date de modification n'est pas touchée : ETag et Last-Modified
+    restent stables d'une demande à l'autre.
+    """
+    try:
+        os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+    except FileNotFoundError:
+        pass
+
+
+def cached_file(out_path, produce, evict=None):
+    """
+    Entrée de cache, produite par `produce(tmp_path)` si absente
+
+    Deux demandes simultanées de la même entrée la produisent une seule
+    fois (verrou par entrée) ; une entrée visible est toujours complète.
+
+    Args:
+        out_path: Entrée de cache
+        produce: Écrit l'entrée dans le fichier temporaire reçu
+        evict: Purge du cache avant production (evict_clip_cache par
+               défaut, False : aucune, le cache est purgé périodiquement)
+
+    Returns:
+        Path: out_path
+    """
+    if out_path.exists():
+        _touch(out_path)
+        return out_path
+
+    lock_path = out_path.with_suffix('.lock')
+    with open(lock_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if out_path.exists():
+                _touch(out_path)
+            else:
+                if evict is not False:
+                    (evict or evict_clip_cache)()
+                tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+                try:
+                    produce(tmp_path)
+                    os.replace(tmp_path, out_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    lock_path.unlink(missing_ok=True)
+    return out_path
+
+
+def get_clip(recording, start, end):
+    """
+    Fichier d'un extrait, produit et mis en cache si nécessaire
+
+    Returns:
+        Path: Fichier de l'extrait
+
+    Raises:
+        FileNotFoundError: Si le fichier source n'existe pas
+        subprocess.CalledProcessError: Si l'extraction FFmpeg échoue
+    """
+    from apps.recorder.services import extract_audio_clip
+
+    def produce(tmp_path):
+        started = time.monotonic()
+        extract_audio_clip(recording.filepath, start, end, tmp_path, fmt=recording.format)
+        logger.info(
+            f"Extrait {recording.pk} {start:.3f}s-{end:.3f}s: "
+            f"{tmp_path.stat().st_size / (1024**2):.1f} MB en {time.monotonic() - started:.2f}s"
+        )
+
+    return cached_file(clip_path(recording, start, end), produce)
+
+
+def evict_lru(cache_dir, max_bytes, max_age, label):
+    """
+    Évince les entrées les moins récemment utilisées d'un cache (taille
+    totale au-delà de `max_bytes`, ou inutilisées depuis `max_age` secondes)
+
+    Returns:
+        dict: {'evicted': int, 'freed': int, 'size': int}
+    """
+    entries = []
+    for path in cache_dir.iterdir():
+        if path.name.startswith('.') or path.suffix == '.lock':
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    evicted = 0
+    freed = 0
+    for used, size, path in entries:
+        if total <= max_bytes and now - used <= max_age:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        freed += size
+        evicted += 1
+
+    if evicted:
+        logger.info(f"{label}: {evicted} entrée(s) évincée(s), {freed / (1024**2):.0f} MB libérés")
+
+    return {'evicted': evicted, 'freed': freed, 'size': total}
+
+
+def evict_clip_cache():
+    """Purge du cache des extraits (CLIP_CACHE_MAX_BYTES, CLIP_CACHE_MAX_AGE)"""
+    return evict_lru(
+        get_clip_cache_dir(),
+        getattr(settings, 'CLIP_CACHE_MAX_BYTES', 5 * 1024**3),
+        getattr(settings, 'CLIP_CACHE_MAX_AGE', 7 * 24 * 3600),
+        'Cache des extraits'
+    )
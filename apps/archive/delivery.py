@@ -0,0 +1,202 @@
+"""
+Envoi des fichiers audio de l'archive
+
+- Requêtes partielles (Range, réponse 206) : lecture avec avance rapide
+  dans le navigateur, reprise des téléchargements interrompus
+- Validation (ETag, Last-Modified) : réponses 304 / 412 sans relire le
+  fichier ; l'ETag est le SHA-256 du fichier s'il est connu (niveaux
+  warm / cold), sinon taille et date de modification
+- Délégation au proxy (DOWNLOAD_OFFLOAD) : 'x-accel' (nginx,
+  X-Accel-Redirect) ou 'x-sendfile' (Apache, lighttpd) ; le worker
+  gunicorn répond immédiatement et le proxy envoie le fichier (et gère
+  lui-même les Range)
+"""
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from pathlib import Path
+from urllib.parse import quote
+import mimetypes
+import os
+import re
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Taille des blocs lus pour les réponses servies par Django
+CHUNK_SIZE = 256 * 1024
+
+
+def get_offload():
+    """Mode de délégation : '', 'x-accel' ou 'x-sendfile'"""
+    return getattr(settings, 'DOWNLOAD_OFFLOAD', '')
+
+
+def file_etag(stat, checksum=''):
+    """ETag fort du fichier"""
+    if checksum:
+        return f'"{checksum}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Analyse un en-tête Range
+
+    Seules les plages uniques sont prises en charge (les plages multiples
+    sont ignorées : réponse complète, autorisée par la RFC 9110).
+
+    Returns:
+        tuple | None | bool: (début, fin incluse), None si l'en-tête est
+                             absent ou ignoré, False si la plage est hors
+                             du fichier
+    """
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffixe : les N derniers octets
+        length = int(last)
+        if not length or not size:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range : la plage n'est servie que si le fichier n'a pas changé"""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and int(last_modified) <= since
+
+
+def _offload_path(filepath):
+    """
+    Chemin transmis au proxy
+
+    x-sendfile : chemin absolu ; x-accel : URI interne sous
+    DOWNLOAD_ACCEL_PREFIX (MEDIA_ROOT) ou DOWNLOAD_ACCEL_COLD_PREFIX
+    (STORAGE_COLD_DIR). None si le fichier n'est sous aucun des deux.
+    """
+    path = Path(filepath).resolve()
+    if get_offload() == 'x-sendfile':
+        return str(path)
+
+    locations = [
+        (settings.MEDIA_ROOT, getattr(settings, 'DOWNLOAD_ACCEL_PREFIX', '/protected/recordings/')),
+        (getattr(settings, 'STORAGE_COLD_DIR', ''), getattr(settings, 'DOWNLOAD_ACCEL_COLD_PREFIX', '')),
+    ]
+    for root, prefix in locations:
+        if not root or not prefix:
+            continue
+        try:
+            relative = path.relative_to(Path(root).resolve())
+        except ValueError:
+            continue
+        return prefix.rstrip('/') + '/' + quote(relative.as_posix())
+    return None
+
+
+def iter_file_range(filepath, start, length, chunk_size=CHUNK_SIZE):
+    """Lit `length` octets à partir de `start`"""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(chunk_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_file(request, filepath, filename=None, checksum='', as_attachment=True, content_type=None):
+    """
+    Réponse HTTP pour un fichier audio (enregistrement, extrait)
+
+    Args:
+        request: Requête Django
+        filepath: Chemin du fichier
+        filename: Nom proposé au téléchargement (nom du fichier par défaut)
+        checksum: SHA-256 du fichier s'il est connu (ETag)
+        as_attachment: Content-Disposition attachment plutôt qu'inline
+        content_type: Type MIME (déduit du nom par défaut)
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 ou 416
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas
+    """
+    filepath = str(filepath)
+    stat = os.stat(filepath)
+    etag = file_etag(stat, checksum)
+    last_modified = int(stat.st_mtime)
+    filename = filename or os.path.basename(filepath)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': content_disposition_header(as_attachment, filename),
+    }
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        for name in ('ETag', 'Last-Modified', 'Accept-Ranges'):
+            conditional.headers[name] = headers[name]
+        return conditional
+
+    offload = get_offload()
+    target = _offload_path(filepath) if offload else None
+    if target is not None:
+        # Le proxy envoie le fichier et traite Range / If-Range
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect' if offload == 'x-accel' else 'X-Sendfile'] = target
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{size}'
+        del response['Content-Disposition']
+        return response
+
+    if not byte_range:
+        # Fichier complet : wsgi.file_wrapper (sendfile sous gunicorn)
+        return FileResponse(
+            open(filepath, 'rb'),
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+            headers=headers
+        )
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        iter_file_range(filepath, start, length),
+        status=206,
+        content_type=content_type,
+        headers=headers
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,141 @@
+"""
+Suppression des enregistrements expirés, par lots et en temps borné
+
+Chaque lot (EXPIRY_BATCH_SIZE enregistrements, parcourus par ID) :
+1. suppression des fichiers en parallèle (EXPIRY_UNLINK_WORKERS)
+2. suppression groupée des lignes (une requête par table liée : alertes,
+   étapes, bail) pour les enregistrements dont le fichier a disparu
+
+Les fichiers sont supprimés avant les lignes : une interruption ne
+laisse jamais de fichier orphelin, seulement des lignes dont le fichier
+manque, supprimées au passage suivant. Le passage s'arrête après
+EXPIRY_TIME_BUDGET secondes ; le reste est traité par le suivant.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.utils import timezone
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Enregistrements à ne pas supprimer (fichier encore utilisé)
+BUSY_STATUSES = ['recording', 'processing']
+
+
+def _unlink(filepath):
+    """
+    Supprime un fichier
+
+    Returns:
+        tuple: (octets libérés, erreur ou None) ; un fichier absent n'est
+               pas une erreur
+    """
+    from apps.recorder.seek_index import remove_seek_index
+
+    try:
+        size = os.stat(filepath).st_size
+        os.remove(filepath)
+        remove_seek_index(filepath)
+        return size, None
+    except FileNotFoundError:
+        return 0, None
+    except OSError as e:
+        return 0, str(e)
+
+
+def expired_recordings(now=None):
+    """Enregistrements expirés supprimables"""
+    from .models import Recording
+
+    return (
+        Recording.objects.filter(expires_at__lt=now or timezone.now())
+        .exclude(status__in=BUSY_STATUSES)
+    )
+
+
+def purge_expired(batch_size=None, time_budget=None, workers=None, now=None):
+    """
+    Supprime les enregistrements expirés (fichiers et lignes)
+
+    Args:
+        batch_size: Enregistrements par lot (EXPIRY_BATCH_SIZE)
+        time_budget: Durée maximale en secondes (EXPIRY_TIME_BUDGET, 0 = illimité)
+        workers: Suppressions de fichiers en parallèle (EXPIRY_UNLINK_WORKERS)
+        now: Date de référence
+
+    Returns:
+        dict: {
+            'deleted': int (enregistrements supprimés),
+            'files': int (fichiers supprimés),
+            'bytes_freed': int,
+            'errors': int (fichiers non supprimables, lignes conservées),
+            'batches': int,
+            'complete': bool (plus rien à supprimer),
+            'elapsed': float
+        }
+    """
+    from apps.recorder.contention import wait_for_capture_headroom
+    from .models import Recording
+    from .storage import deferred_accounting
+
+    batch_size = batch_size or getattr(settings, 'EXPIRY_BATCH_SIZE', 500)
+    if time_budget is None:
+        time_budget = getattr(settings, 'EXPIRY_TIME_BUDGET', 300)
+    workers = workers or getattr(settings, 'EXPIRY_UNLINK_WORKERS', 8)
+    now = now or timezone.now()
+
+    queryset = expired_recordings(now).order_by('id')
+    started = time.monotonic()
+    result = {
+        'deleted': 0, 'files': 0, 'bytes_freed': 0, 'errors': 0,
+        'batches': 0, 'complete': False, 'elapsed': 0.0,
+    }
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            remaining = time_budget - (time.monotonic() - started) if time_budget else None
+            if remaining is not None and remaining <= 0:
+                break
+
+            batch = list(
+                queryset.filter(id__gt=last_id).values_list('id', 'filepath')[:batch_size]
+            )
+            if not batch:
+                result['complete'] = True
+                break
+            last_id = batch[-1][0]
+
+            # Suppressions massives : laisser passer les captures en difficulté
+            wait_for_capture_headroom(max_wait=remaining)
+
+            deletable = []
+            for (recording_id, filepath), (freed, error) in zip(
+                batch, pool.map(_unlink, [filepath for _, filepath in batch])
+            ):
+                if error:
+                    logger.error(f"Suppression impossible de {filepath} ({recording_id}): {error}")
+                    result['errors'] += 1
+                    continue
+                if freed:
+                    result['files'] += 1
+                    result['bytes_freed'] += freed
+                deletable.append(recording_id)
+
+            if deletable:
+                # Comptabilité du stockage : une mise à jour par station / propriétaire
+                with deferred_accounting():
+                    deleted, _ = Recording.objects.filter(pk__in=deletable).delete()
+                result['deleted'] += len(deletable)
+                logger.debug(f"Lot d'expiration: {len(deletable)} enregistrement(s), {deleted} ligne(s)")
+            result['batches'] += 1
+
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    logger.info(
+        f"Expiration: {result['deleted']} enregistrement(s) supprimé(s), "
+        f"{result['bytes_freed'] / (1024**3):.2f} GB libérés, {result['errors']} erreur(s) "
+        f"en {result['elapsed']:.0f}s{'' if result['complete'] else ' (incomplet)'}"
+    )
+    return result
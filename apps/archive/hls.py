@@ -0,0 +1,148 @@
+"""
+Lecture des archives dans le navigateur (HLS)
+
+- Liste de lecture calculée à partir de la durée (aucun décodage) :
+  immédiate même pour 24 h d'enregistrement
+- Segments de HLS_SEGMENT_SECONDS secondes (AAC dans MPEG-TS) produits
+  à la première demande, sans décoder ce qui précède (positionnement
+  WAV / index), puis mis en cache sur disque (HLS_CACHE_DIR, LRU) et
+  servis comme des fichiers statiques (délégation au proxy) : une
+  deuxième écoute ne coûte aucun transcodage. La purge du cache est
+  périodique (tâche evict_hls_cache), jamais sur le chemin d'une écoute
+- Intervalle d'heure réelle : les morceaux de la chronologie se suivent
+  dans une même liste, séparés par #EXT-X-DISCONTINUITY
+
+Les bornes des segments sont en millisecondes dans le fichier ; pour un
+enregistrement elles sont des multiples de la durée de segment, donc
+partagées par toutes les écoutes.
+"""
+from django.conf import settings
+from pathlib import Path
+import hashlib
+import math
+import os
+
+HLS_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+HLS_SEGMENT_CONTENT_TYPE = 'video/mp2t'
+
+# Intervalle maximal d'une liste de chronologie (rien n'est produit
+# avant la lecture : seule la taille de la liste est bornée)
+HLS_MAX_RANGE = 24 * 3600
+
+# Version de l'encodage des segments (clé du cache)
+HLS_ENCODING_VERSION = 2
+
+
+def get_hls_cache_dir():
+    cache_dir = Path(getattr(settings, 'HLS_CACHE_DIR', '') or Path(settings.MEDIA_ROOT) / '.hls_cache')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def get_segment_ms():
+    return int(getattr(settings, 'HLS_SEGMENT_SECONDS', 6) * 1000)
+
+
+def evict_hls_cache():
+    """Purge du cache des segments (HLS_CACHE_MAX_BYTES, HLS_CACHE_MAX_AGE)"""
+    from .clips import evict_lru
+
+    return evict_lru(
+        get_hls_cache_dir(),
+        getattr(settings, 'HLS_CACHE_MAX_BYTES', 10 * 1024**3),
+        getattr(settings, 'HLS_CACHE_MAX_AGE', 7 * 24 * 3600),
+        'Cache HLS'
+    )
+
+
+def segment_bounds(start, end, segment_ms=None):
+    """
+    Bornes des segments d'une portion de fichier
+
+    Args:
+        start: Début en secondes
+        end: Fin en secondes
+
+    Returns:
+        list: [(début_ms, fin_ms)], alignés sur la durée de segment
+    """
+    segment_ms = segment_ms or get_segment_ms()
+    first_ms, last_ms = round(start * 1000), round(end * 1000)
+    bounds = []
+    cursor = first_ms
+    while cursor < last_ms:
+        boundary = min(last_ms, (cursor // segment_ms + 1) * segment_ms)
+        bounds.append((cursor, boundary))
+        cursor = boundary
+    return bounds
+
+
+def build_playlist(parts, segment_url):
+    """
+    Liste de lecture VOD
+
+    Args:
+        parts: [(recording, début_s, fin_s)] ; une discontinuité est
+               insérée entre deux morceaux
+        segment_url: segment_url(recording, début_ms, fin_ms) -> URL
+
+    Returns:
+        str: Liste de lecture M3U8
+    """
+    lines = []
+    longest = 0
+    for index, (recording, start, end) in enumerate(parts):
+        if index:
+            lines.append('#EXT-X-DISCONTINUITY')
+        for first_ms, last_ms in segment_bounds(start, end):
+            length = (last_ms - first_ms) / 1000
+            longest = max(longest, length)
+            lines.append(f'#EXTINF:{length:.3f},')
+            lines.append(segment_url(recording, first_ms, last_ms))
+
+    header = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{max(1, math.ceil(longest))}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+    ]
+    return '\n'.join(header + lines + ['#EXT-X-ENDLIST']) + '\n'
+
+
+def segment_path(recording, first_ms, last_ms):
+    """Entrée de cache d'un segment (selon l'identité du fichier source)"""
+    stat = os.stat(recording.filepath)
+    bitrate = getattr(settings, 'HLS_AUDIO_BITRATE', '128k')
+    key = hashlib.sha256(
+        f"{os.path.abspath(recording.filepath)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        f"\0{first_ms}\0{last_ms}\0{bitrate}\0{HLS_ENCODING_VERSION}".encode('utf-8')
+    ).hexdigest()[:32]
+    return get_hls_cache_dir() / f"{key}.ts"
+
+
+def get_segment(recording, first_ms, last_ms):
+    """
+    Fichier d'un segment, produit et mis en cache si nécessaire
+
+    Raises:
+        ValueError: Si les bornes sont hors de l'enregistrement
+        FileNotFoundError: Si le fichier source n'existe pas
+        subprocess.CalledProcessError: Si l'encodage FFmpeg échoue
+    """
+    from apps.recorder.services import encode_hls_segment
+    from .clips import cached_file
+
+    if first_ms < 0 or last_ms <= first_ms or last_ms - first_ms > get_segment_ms():
+        raise ValueError(f"Segment invalide: {first_ms}-{last_ms}")
+    if recording.duration and first_ms >= recording.duration * 1000:
+        raise ValueError(f"Segment au-delà de la fin de l'enregistrement: {first_ms}")
+
+    def produce(tmp_path):
+        encode_hls_segment(
+            recording.filepath, first_ms / 1000, last_ms / 1000, tmp_path,
+            fmt=recording.format,
+            bitrate=getattr(settings, 'HLS_AUDIO_BITRATE', '128k')
+        )
+
+    return cached_file(segment_path(recording, first_ms, last_ms), produce, evict=False)
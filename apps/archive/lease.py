@@ -0,0 +1,230 @@
+"""
+Bail de traitement par enregistrement
+
+process_recording est déclenché depuis plusieurs endroits (arrêt du job,
+vérification des jobs actifs, nettoyage, action manuelle). Le bail
+garantit qu'un seul traitement tourne par enregistrement : un
+déclenchement reçu pendant un traitement n'en lance pas un second, il
+demande une relance unique, exécutée à la fin du traitement en cours
+(les étapes à jour y sont réutilisées grâce aux points de reprise).
+
+Le bail couvre tout le DAG : il est prolongé pendant les étapes
+(PROCESSING_LEASE_TTL) et, tant que des étapes attendent en file
+(asr / llm chargées), pour PROCESSING_LEASE_QUEUE_TTL à la mise en file
+du chord et à la fin de chaque étape. Il expire s'il n'est plus
+entretenu (worker tué) : un traitement bloqué n'empêche pas
+indéfiniment les suivants. Une étape dont le bail a été repris par un
+autre traitement s'arrête à son prochain point de contrôle.
+"""
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import threading
+import uuid
+
+from apps.recorder.monitoring import StageInterrupted
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(StageInterrupted):
+    """Le bail a été repris par un autre traitement"""
+
+
+def get_lease_ttl():
+    return getattr(settings, 'PROCESSING_LEASE_TTL', 300)
+
+
+def get_queued_lease_ttl():
+    """Durée du bail pendant que des étapes attendent en file"""
+    return max(get_lease_ttl(), getattr(settings, 'PROCESSING_LEASE_QUEUE_TTL', 6 * 3600))
+
+
+def _merge_stages(current, requested):
+    from .pipeline import STAGES
+    wanted = set(current or []) | set(requested or STAGES)
+    return [s for s in STAGES if s in wanted]
+
+
+def acquire_lease(recording_id, force=False, stages=None):
+    """
+    Tente d'acquérir le bail de traitement d'un enregistrement
+
+    Si un traitement est déjà en cours, la demande est fusionnée dans
+    la relance à effectuer à la fin de celui-ci.
+
+    Args:
+        recording_id: ID de l'enregistrement
+        force: Paramètre force du déclenchement
+        stages: Étapes demandées (toutes si None)
+
+    Returns:
+        str: Jeton du bail, ou None si un traitement est déjà en cours
+    """
+    from .models import ProcessingLease
+
+    now = timezone.now()
+    with transaction.atomic():
+        ProcessingLease.objects.get_or_create(recording_id=recording_id)
+        lease = ProcessingLease.objects.select_for_update().get(recording_id=recording_id)
+
+        if lease.token and lease.expires_at and lease.expires_at > now:
+            lease.rerun_requested = True
+            lease.rerun_force = lease.rerun_force or force
+            lease.rerun_stages = _merge_stages(lease.rerun_stages, stages)
+            lease.duplicates_avoided += 1
+            lease.save(update_fields=[
+                'rerun_requested', 'rerun_force', 'rerun_stages', 'duplicates_avoided'
+            ])
+            logger.info(
+                f"Traitement de {recording_id} déjà en cours : "
+                f"déclenchement fusionné dans une relance"
+            )
+            return None
+
+        if lease.token:
+            # La relance demandée à l'ancien traitement reste due : elle
+            # sera lancée à la fin de celui-ci
+            logger.warning(f"Bail expiré repris pour l'enregistrement {recording_id}")
+        else:
+            lease.rerun_requested = False
+            lease.rerun_force = False
+            lease.rerun_stages = []
+
+        lease.token = uuid.uuid4().hex
+        lease.acquired_at = now
+        lease.heartbeat_at = now
+        lease.expires_at = now + timedelta(seconds=get_lease_ttl())
+        lease.runs += 1
+        lease.save()
+        return lease.token
+
+
+def heartbeat(recording_id, token, ttl=None):
+    """
+    Prolonge le bail (sans jamais raccourcir une échéance plus lointaine,
+    accordée aux étapes encore en file)
+
+    Args:
+        ttl: Durée en secondes (PROCESSING_LEASE_TTL par défaut)
+
+    Returns:
+        bool: False si le bail a été perdu (expiré puis repris)
+    """
+    from .models import ProcessingLease
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl or get_lease_ttl())
+    return bool(
+        ProcessingLease.objects.filter(recording_id=recording_id, token=token).update(
+            heartbeat_at=now,
+            expires_at=Greatest('expires_at', expires_at)
+        )
+    )
+
+
+class LeaseHeartbeat:
+    """
+    Prolonge le bail en tâche de fond pendant une étape longue
+
+    Si le bail est perdu, `lost` passe à True et check() (à enregistrer
+    comme point de contrôle) lève LeaseLost.
+
+    Usage:
+        with LeaseHeartbeat(recording_id, token) as lease, checkpoint_hooks(lease.check):
+            ...
+    """
+
+    def __init__(self, recording_id, token, interval=None):
+        self.recording_id = recording_id
+        self.token = token
+        self.interval = interval or max(1.0, get_lease_ttl() / 3)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                close_old_connections()
+                if not heartbeat(self.recording_id, self.token):
+                    logger.warning(f"Bail de traitement perdu pour {self.recording_id}")
+                    self.lost = True
+                    return
+        finally:
+            connection.close()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"Bail de traitement perdu pour {self.recording_id}")
+
+    def __enter__(self):
+        if self.token:
+            self.lost = not heartbeat(self.recording_id, self.token)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        return False
+
+
+def release_lease(recording_id, token):
+    """
+    Libère le bail en fin de traitement
+
+    Returns:
+        dict: Paramètres de la relance demandée pendant le traitement
+              ({'force', 'stages'}), ou None
+    """
+    from .models import ProcessingLease
+
+    with transaction.atomic():
+        lease = (
+            ProcessingLease.objects.select_for_update()
+            .filter(recording_id=recording_id, token=token)
+            .first()
+        )
+        if lease is None:
+            logger.warning(f"Bail de {recording_id} déjà repris par un autre traitement")
+            return None
+
+        rerun = None
+        if lease.rerun_requested:
+            rerun = {'force': lease.rerun_force, 'stages': lease.rerun_stages or None}
+
+        lease.token = ''
+        lease.expires_at = None
+        lease.rerun_requested = False
+        lease.rerun_force = False
+        lease.rerun_stages = []
+        lease.save(update_fields=[
+            'token', 'expires_at', 'rerun_requested', 'rerun_force', 'rerun_stages'
+        ])
+        return rerun
+
+
+def get_lease_stats():
+    """
+    Statistiques : traitements lancés, doublons évités, baux actifs
+    """
+    from .models import ProcessingLease
+
+    totals = ProcessingLease.objects.aggregate(
+        runs=Sum('runs'),
+        duplicates_avoided=Sum('duplicates_avoided')
+    )
+    return {
+        'runs': totals['runs'] or 0,
+        'duplicates_avoided': totals['duplicates_avoided'] or 0,
+        'active': ProcessingLease.objects.exclude(token='').filter(
+            expires_at__gt=timezone.now()
+        ).count(),
+    }
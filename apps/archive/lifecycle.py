@@ -0,0 +1,394 @@
+"""
+Cycle de vie du stockage des enregistrements
+
+Les captures restent dans leur format d'origine (WAV 44.1 kHz stéréo,
+~635 Mo/heure) pendant STORAGE_FLAC_AFTER_DAYS jours, puis :
+- hot -> warm : conversion sans perte en FLAC (~2x plus petit), vérifiée
+  par l'empreinte MD5 de l'audio décodé (identique à l'original)
+- -> cold : conversion en Opus (STORAGE_OPUS_BITRATE, ~20x plus petit)
+  sur le volume froid STORAGE_COLD_DIR après STORAGE_OPUS_AFTER_DAYS
+  jours (désactivé par défaut), vérifiée par un décodage complet et la
+  durée
+
+Le nouveau fichier est écrit à côté de sa destination puis renommé ;
+filepath / format / file_size / storage_tier sont mis à jour dans une
+transaction, et l'ancien fichier n'est supprimé qu'après. Un seul
+changement de niveau à la fois par enregistrement (réservation
+tier_move_token, reprise après STORAGE_MOVE_TIMEOUT secondes si le
+worker a disparu). Les lecteurs
+(téléchargement, Whisper, FFmpeg) passent toujours par filepath : le
+changement de niveau leur est transparent.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from pathlib import Path
+import hashlib
+import logging
+import os
+import subprocess
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TIER_FORMATS = {
+    'warm': 'flac',
+    'cold': 'opus',
+}
+
+# Formats d'origine convertibles vers chaque niveau
+TIER_SOURCES = {
+    'warm': ['wav'],
+    'cold': ['wav', 'flac'],
+}
+
+# Enregistrements à ne pas toucher
+BUSY_STATUSES = ['recording', 'processing']
+
+
+def get_policy():
+    """
+    Returns:
+        dict: Âges de passage (jours, 0 = désactivé) et options d'encodage
+    """
+    return {
+        'flac_after_days': getattr(settings, 'STORAGE_FLAC_AFTER_DAYS', 7),
+        'opus_after_days': getattr(settings, 'STORAGE_OPUS_AFTER_DAYS', 0),
+        'opus_bitrate': getattr(settings, 'STORAGE_OPUS_BITRATE', '64k'),
+        'cold_dir': getattr(settings, 'STORAGE_COLD_DIR', ''),
+    }
+
+
+def file_sha256(path):
+    """Empreinte SHA-256 d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def audio_md5(path):
+    """
+    Empreinte MD5 de l'audio décodé (échantillons en entiers 32 bits)
+
+    Identique pour un WAV et sa conversion FLAC si celle-ci est sans perte.
+    """
+    cmd = [
+        settings.FFMPEG_PATH,
+        '-nostdin', '-v', 'error',
+        '-i', str(path),
+        '-map', '0:a:0',
+        '-c:a', 'pcm_s32le',
+        '-f', 'md5', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return result.stdout.strip().split('=', 1)[-1]
+
+
+def target_path(recording, tier):
+    """
+    Chemin du fichier converti
+
+    - warm : à côté de l'original
+    - cold : même arborescence (relative à MEDIA_ROOT) sur STORAGE_COLD_DIR
+    """
+    source = Path(recording.filepath)
+    name = source.with_suffix(f".{TIER_FORMATS[tier]}").name
+    cold_dir = get_policy()['cold_dir']
+
+    if tier != 'cold' or not cold_dir:
+        return source.with_name(name)
+
+    try:
+        relative = source.parent.relative_to(Path(settings.MEDIA_ROOT))
+    except ValueError:
+        relative = Path()
+    return Path(cold_dir) / relative / name
+
+
+def _encode(source, tmp_path, tier):
+    cmd = [settings.FFMPEG_PATH, '-nostdin', '-y', '-v', 'error', '-i', str(source), '-vn']
+    if tier == 'warm':
+        cmd += ['-c:a', 'flac', '-compression_level', '8', '-f', 'flac']
+    else:
+        cmd += [
+            '-c:a', 'libopus',
+            '-b:a', get_policy()['opus_bitrate'],
+            '-vbr', 'on',
+            '-application', 'audio',
+            '-f', 'ogg'
+        ]
+    cmd.append(str(tmp_path))
+    subprocess.run(cmd, check=True, capture_output=True)
+
+    # Le fichier doit être sur disque avant de remplacer l'original
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _verify(source, tmp_path, tier):
+    """
+    Vérifie la conversion
+
+    Raises:
+        ValueError: Si le fichier converti ne correspond pas à l'original
+    """
+    from apps.recorder.services import get_audio_metadata
+
+    if tier == 'warm':
+        expected, actual = audio_md5(source), audio_md5(tmp_path)
+        if expected != actual:
+            raise ValueError(f"Audio FLAC différent de l'original (MD5 {actual} != {expected})")
+        return
+
+    # Conversion avec perte : décodage complet sans erreur et même durée
+    result = subprocess.run(
+        [settings.FFMPEG_PATH, '-nostdin', '-v', 'error', '-i', str(tmp_path), '-f', 'null', '-'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0 or result.stderr.strip():
+        raise ValueError(f"Fichier Opus illisible: {result.stderr.strip()[:500]}")
+
+    expected = get_audio_metadata(str(source)).get('duration') or 0
+    actual = get_audio_metadata(str(tmp_path)).get('duration') or 0
+    if abs(expected - actual) > max(1.0, expected * 0.001):
+        raise ValueError(f"Durée Opus différente de l'original ({actual:.1f}s au lieu de {expected:.1f}s)")
+
+
+def _is_busy(recording):
+    from .models import ProcessingLease
+
+    return (
+        recording.status in BUSY_STATUSES
+        or ProcessingLease.objects.filter(
+            recording_id=recording.pk, expires_at__gt=timezone.now()
+        ).exists()
+    )
+
+
+def _stale_moves_before(now):
+    return now - timedelta(seconds=getattr(settings, 'STORAGE_MOVE_TIMEOUT', 6 * 3600))
+
+
+def pending_moves(queryset, now=None):
+    """Enregistrements dont un changement de niveau est en file ou en cours"""
+    now = now or timezone.now()
+    return queryset.exclude(tier_move_token='').filter(tier_move_at__gte=_stale_moves_before(now))
+
+
+def exclude_pending_moves(queryset, now=None):
+    """Retire les enregistrements dont un changement de niveau est en file ou en cours"""
+    now = now or timezone.now()
+    return queryset.exclude(~Q(tier_move_token=''), tier_move_at__gte=_stale_moves_before(now))
+
+
+def claim_move(recording_id):
+    """
+    Réserve le changement de niveau d'un enregistrement
+
+    Returns:
+        str: Jeton de la réservation, ou None si un changement de niveau
+             est déjà en file ou en cours
+    """
+    from .models import Recording
+
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimed = Recording.objects.filter(pk=recording_id).filter(
+        Q(tier_move_token='') | Q(tier_move_at__lt=_stale_moves_before(now))
+    ).update(tier_move_token=token, tier_move_at=now)
+    return token if claimed else None
+
+
+def schedule_moves(plans):
+    """
+    Met en file les changements de niveau, réservés à la mise en file :
+    un enregistrement déjà en file ou en cours de conversion est ignoré
+
+    Args:
+        plans: [(recording_id, tier)]
+
+    Returns:
+        list: [(recording_id, tier)] effectivement mis en file
+    """
+    from .tasks import move_recording_to_tier
+
+    scheduled = []
+    for recording_id, tier in plans:
+        token = claim_move(recording_id)
+        if token is None:
+            continue
+        move_recording_to_tier.delay(recording_id, tier, token)
+        scheduled.append((recording_id, tier))
+    return scheduled
+
+
+def release_move(recording_id, token):
+    """Libère la réservation (sans effet si elle a été reprise)"""
+    from .models import Recording
+
+    Recording.objects.filter(pk=recording_id, tier_move_token=token).update(
+        tier_move_token='', tier_move_at=None
+    )
+
+
+def move_to_tier(recording_id, tier, token=None):
+    """
+    Convertit un enregistrement vers un niveau de stockage
+
+    Args:
+        recording_id: ID de l'enregistrement
+        tier: 'warm' (FLAC) ou 'cold' (Opus)
+        token: Réservation obtenue à la mise en file (claim_move) ; sans
+               jeton, la réservation est prise ici
+
+    Returns:
+        dict: {'status': 'moved' | 'skipped' | 'failed', ...}
+    """
+    from .models import Recording
+
+    if token is None:
+        token = claim_move(recording_id)
+        if token is None:
+            return {'status': 'skipped', 'reason': 'changement de niveau déjà en cours'}
+    elif not Recording.objects.filter(pk=recording_id, tier_move_token=token).update(
+        tier_move_at=timezone.now()
+    ):
+        return {'status': 'skipped', 'reason': 'réservation reprise'}
+
+    try:
+        return _move_to_tier(recording_id, tier, token)
+    finally:
+        release_move(recording_id, token)
+
+
+def _move_to_tier(recording_id, tier, token):
+    from apps.recorder.contention import wait_for_capture_headroom
+    from apps.recorder.pcm_cache import release_pcm
+    from apps.recorder.seek_index import build_seek_index, remove_seek_index
+    from .models import Recording
+    from .pipeline import restamp_fingerprints
+
+    recording = Recording.objects.filter(pk=recording_id).first()
+    if recording is None:
+        return {'status': 'skipped', 'reason': 'introuvable'}
+    if recording.format not in TIER_SOURCES[tier]:
+        return {'status': 'skipped', 'reason': f"format {recording.format}"}
+    if _is_busy(recording):
+        return {'status': 'skipped', 'reason': 'en cours de traitement'}
+
+    source = Path(recording.filepath)
+    if not source.exists():
+        return {'status': 'skipped', 'reason': 'fichier absent'}
+
+    target = target_path(recording, tier)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{token[:8]}.tmp")
+
+    # Conversion lourde : passer après les captures en direct
+    wait_for_capture_headroom()
+
+    try:
+        _encode(source, tmp_path, tier)
+        _verify(source, tmp_path, tier)
+        checksum = file_sha256(tmp_path)
+        os.replace(tmp_path, target)
+    except Exception as e:
+        logger.error(f"Conversion {tier} échouée pour {recording_id}: {str(e)}")
+        tmp_path.unlink(missing_ok=True)
+        return {'status': 'failed', 'error': str(e)}
+
+    try:
+        build_seek_index(str(target), TIER_FORMATS[tier])
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Index de positionnement impossible pour {target}: {str(e)}")
+
+    with transaction.atomic():
+        current = Recording.objects.select_for_update().get(pk=recording_id)
+        if current.filepath != str(source) or current.tier_move_token != token or _is_busy(current):
+            # Modifié pendant la conversion : l'original reste la référence
+            moved = False
+        else:
+            current.filepath = str(target)
+            current.filename = str(Path(current.filename).with_suffix(target.suffix))
+            current.format = TIER_FORMATS[tier]
+            current.file_size = target.stat().st_size
+            current.storage_tier = tier
+            current.checksum = checksum
+            current.save(update_fields=[
+                'filepath', 'filename', 'format', 'file_size',
+                'storage_tier', 'checksum', 'updated_at'
+            ])
+            # Même audio : les étapes à jour le restent
+            restamp_fingerprints(current, str(source))
+            moved = True
+
+    if not moved:
+        # Jamais le fichier de référence (déplacé entre-temps vers la même cible)
+        if current.filepath != str(target):
+            target.unlink(missing_ok=True)
+            remove_seek_index(str(target))
+        return {'status': 'skipped', 'reason': 'modifié pendant la conversion'}
+
+    release_pcm(str(source))
+    source.unlink(missing_ok=True)
+    remove_seek_index(str(source))
+
+    logger.info(
+        f"Enregistrement {recording_id} passé en {tier}: {source.name} -> {target} "
+        f"({recording.file_size or 0} -> {current.file_size} octets)"
+    )
+    return {
+        'status': 'moved',
+        'tier': tier,
+        'filepath': str(target),
+        'size_before': recording.file_size,
+        'size_after': current.file_size,
+    }
+
+
+def plan_transitions(now=None, limit=None):
+    """
+    Enregistrements à faire changer de niveau selon leur âge
+
+    Les enregistrements qui expirent dans moins d'un jour sont ignorés
+    (la conversion serait aussitôt supprimée), comme ceux dont un
+    changement de niveau est déjà en file.
+
+    Returns:
+        list: [(recording_id, tier)], les plus anciens d'abord
+    """
+    from .models import Recording
+
+    now = now or timezone.now()
+    policy = get_policy()
+    base = exclude_pending_moves(
+        Recording.objects.exclude(status__in=BUSY_STATUSES)
+        .exclude(expires_at__lt=now + timedelta(days=1))
+        .order_by('created_at'),
+        now
+    )
+
+    plans = []
+    if policy['opus_after_days']:
+        cold = base.filter(
+            storage_tier__in=['hot', 'warm'],
+            format__in=TIER_SOURCES['cold'],
+            created_at__lt=now - timedelta(days=policy['opus_after_days'])
+        ).values_list('id', flat=True)
+        plans += [(recording_id, 'cold') for recording_id in cold[:limit]]
+
+    if policy['flac_after_days'] and (limit is None or len(plans) < limit):
+        planned = {recording_id for recording_id, _ in plans}
+        warm = base.filter(
+            storage_tier='hot',
+            format__in=TIER_SOURCES['warm'],
+            created_at__lt=now - timedelta(days=policy['flac_after_days'])
+        ).exclude(pk__in=planned).values_list('id', flat=True)
+        remaining = None if limit is None else limit - len(plans)
+        plans += [(recording_id, 'warm') for recording_id in warm[:remaining]]
+
+    return plans
@@ -0,0 +1,55 @@
+"""
+Reconstruction de la chronologie des stations
+
+Recrée les TimelineSegment des enregistrements existants (archive
+antérieure à la chronologie, heure de début corrigée à la main).
+
+Usage:
+    python manage.py rebuild_timeline
+    python manage.py rebuild_timeline --station occitania-toulouse
+    python manage.py rebuild_timeline --after-id 12345
+"""
+from django.core.management.base import BaseCommand
+
+from apps.archive.models import Recording
+from apps.archive.timeline import sync_recording
+
+
+class Command(BaseCommand):
+    help = "Recrée les segments de la chronologie à partir des enregistrements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--station', default='',
+            help='Limiter à une station'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Enregistrements traités par lot (défaut: 500)'
+        )
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Reprendre le parcours après cet ID d\'enregistrement'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recording.objects.exclude(status='recording').order_by('id')
+        if options['station']:
+            queryset = queryset.filter(station=options['station'])
+
+        last_id = options['after_id']
+        recordings = 0
+        segments = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for recording in batch:
+                segments += sync_recording(recording)
+            recordings += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"{recordings} enregistrement(s), {segments} segment(s) (dernier ID {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Chronologie reconstruite: {segments} segment(s) pour {recordings} enregistrement(s)"
+        ))
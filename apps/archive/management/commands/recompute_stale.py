@@ -0,0 +1,208 @@
+"""
+Recalcul incrémental de l'archive après un changement d'analyseur
+
+Compare la provenance de chaque champ dérivé (version et paramètres de
+l'étape qui l'a produit) à la configuration actuelle, puis relance
+uniquement les étapes obsolètes, avec un débit limité.
+
+La commande est reprenable : un enregistrement recalculé n'est plus
+obsolète, et --after-id reprend le parcours là où il s'est arrêté.
+Un recalcul de tags en échec (API Mistral indisponible...) est signalé
+et n'arrête pas le parcours : ses tags restent obsolètes et seront
+repris au prochain passage.
+
+Usage:
+    python manage.py recompute_stale --dry-run
+    python manage.py recompute_stale --stages transcription,summary --rate 30
+    python manage.py recompute_stale --after-id 12345
+"""
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from apps.archive.models import Recording
+from apps.archive.pipeline import select_stages
+from apps.archive.recompute import FIELD_STAGES, REASONS, plan_batch
+from apps.archive.throttle import EnqueueThrottle
+
+
+class Command(BaseCommand):
+    help = "Relance les étapes dont l'analyseur ou les paramètres ont changé"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stages', default='',
+            help='Étapes à considérer, séparées par des virgules (défaut: toutes)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Afficher le plan sans rien relancer'
+        )
+        parser.add_argument(
+            '--skip-missing', action='store_true',
+            help='Ignorer les étapes jamais terminées (seulement les résultats obsolètes)'
+        )
+        parser.add_argument(
+            '--no-tags', action='store_true',
+            help='Ne pas recalculer les tags obsolètes'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=60.0,
+            help='Enregistrements relancés par minute au maximum (défaut: 60, 0 = illimité)'
+        )
+        parser.add_argument(
+            '--max-queue-depth', type=int, default=100,
+            help='Pause tant que les files de traitement dépassent cette profondeur (défaut: 100, 0 = pas de limite)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Enregistrements examinés par lot (défaut: 200)'
+        )
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Reprendre le parcours après cet ID d\'enregistrement'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=0,
+            help='Nombre maximum d\'enregistrements relancés (0 = pas de limite)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stages = select_stages(
+                [s.strip() for s in options['stages'].split(',') if s.strip()]
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        dry_run = options['dry_run']
+        throttle = EnqueueThrottle(
+            rate=options['rate'],
+            max_queue_depth=options['max_queue_depth'],
+            on_wait=lambda depth: self.stdout.write(f"  files pleines ({depth} tâches), pause..."),
+            on_capture_wait=lambda jobs: self.stdout.write(
+                f"  captures sous pression ({', '.join(f'job {j}: {r}' for j, r in jobs)}), pause..."
+            )
+        )
+
+        queryset = (
+            Recording.objects.exclude(status__in=['recording', 'processing'])
+            .filter(id__gt=options['after_id'])
+            .prefetch_related('stages')
+            .order_by('id')
+        )
+        total = queryset.count()
+
+        stage_counts = Counter()
+        reason_counts = Counter()
+        tag_counts = Counter()
+        tag_errors = []
+        scanned = 0
+        scheduled = 0
+        last_id = options['after_id']
+        started = time.monotonic()
+
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+
+            for recording, stale, tags_reason in plan_batch(
+                batch, stages, include_missing=not options['skip_missing']
+            ):
+                if options['limit'] and scheduled >= options['limit']:
+                    break
+
+                for name, reason in stale.items():
+                    stage_counts[name] += 1
+                    reason_counts[reason] += 1
+
+                # Les tags dépendent de la transcription : ils seront
+                # recalculés au prochain passage si elle est relancée
+                retag = (
+                    tags_reason and not options['no_tags']
+                    and 'transcription' not in stale
+                )
+                if retag:
+                    tag_counts[tags_reason] += 1
+
+                if dry_run:
+                    scheduled += 1
+                    continue
+
+                throttle.wait()
+
+                if stale:
+                    from apps.archive.tasks import enqueue_bulk
+                    enqueue_bulk(recording.id, stages=list(stale))
+                if retag:
+                    try:
+                        self._retag(recording)
+                    except Exception as e:
+                        tag_errors.append(recording.id)
+                        self.stderr.write(f"  tags de {recording.id} non recalculés: {str(e)}")
+                scheduled += 1
+
+            scanned += len(batch)
+            last_id = batch[-1].id
+            self._progress(scanned, total, scheduled, started, last_id, dry_run)
+
+            if options['limit'] and scheduled >= options['limit']:
+                break
+
+        self._report(stage_counts, reason_counts, tag_counts, tag_errors, scheduled, dry_run)
+
+    def _retag(self, recording):
+        """Recalcule les tags avec le moteur qui les avait produits"""
+        from apps.ai.keywords import tag_recordings, tags_producer
+        from apps.ai.mistral_service import extract_keywords
+
+        producer = (recording.ai_metadata or {}).get('tags_producer') or {}
+        engine = producer.get('engine') or getattr(settings, 'KEYWORD_ENGINE', 'mistral')
+        max_keywords = producer.get('max_keywords', 10)
+
+        if engine == 'local':
+            tag_recordings([recording], max_keywords)
+        else:
+            recording.tags = extract_keywords(recording.transcript, max_keywords)
+            recording.ai_metadata = {
+                **(recording.ai_metadata or {}),
+                'tags_producer': tags_producer(engine, max_keywords)
+            }
+        Recording.objects.filter(pk=recording.pk).update(
+            tags=recording.tags, ai_metadata=recording.ai_metadata
+        )
+
+    def _progress(self, scanned, total, scheduled, started, last_id, dry_run):
+        elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed else 0
+        eta = (total - scanned) / rate if rate else 0
+        verb = 'à relancer' if dry_run else 'relancé(s)'
+        self.stdout.write(
+            f"{scanned}/{total} examiné(s), {scheduled} {verb} "
+            f"(dernier ID {last_id}, ETA {eta:.0f}s)"
+        )
+
+    def _report(self, stage_counts, reason_counts, tag_counts, tag_errors, scheduled, dry_run):
+        produced = {stage: field for field, stage in FIELD_STAGES.items()}
+        self.stdout.write('')
+        for name, count in stage_counts.most_common():
+            field = f" ({produced[name]})" if name in produced else ''
+            self.stdout.write(f"  {name}{field}: {count}")
+        if reason_counts:
+            self.stdout.write('  Raisons: ' + ', '.join(
+                f"{reason}={reason_counts[reason]}" for reason in REASONS if reason_counts[reason]
+            ))
+        if tag_counts:
+            self.stdout.write('  Tags: ' + ', '.join(
+                f"{reason}={count}" for reason, count in tag_counts.items()
+            ))
+        if tag_errors:
+            self.stdout.write(self.style.WARNING(
+                f"  Tags en échec: {len(tag_errors)} "
+                f"(IDs {', '.join(str(i) for i in tag_errors[:20])}{'...' if len(tag_errors) > 20 else ''})"
+            ))
+
+        verb = 'à relancer' if dry_run else 'relancé(s)'
+        self.stdout.write(self.style.SUCCESS(f"{scheduled} enregistrement(s) {verb}"))
@@ -0,0 +1,174 @@
+"""
+Retraitement en masse de l'archive (backfill)
+
+Sélectionne les enregistrements par filtres puis les met en file par
+lots, dans la file de masse (bulk, servie par son propre pool : les
+traitements en direct ne passent jamais derrière), avec un débit limité
+et une contre-pression sur cette file. La position (dernier ID mis en file) est enregistrée après
+chaque lot : une commande interrompue reprend là où elle s'était
+arrêtée en la relançant avec les mêmes filtres.
+
+Usage:
+    python manage.py reprocess --since 2025-01-01 --until 2025-02-01 --dry-run
+    python manage.py reprocess --station occitania-toulouse --status error,completed
+    python manage.py reprocess --flagged --stages blank_analysis,blank_notification --force
+    python manage.py reprocess --since 2025-01-01 --restart
+"""
+from datetime import datetime, time as dt_time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pathlib import Path
+import hashlib
+import json
+import time
+
+from apps.archive.models import Recording
+from apps.archive.pipeline import select_stages
+from apps.archive.throttle import EnqueueThrottle
+
+
+def parse_date(value, end_of_day=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Date invalide: {value} (format AAAA-MM-JJ[THH:MM])")
+    if len(value) <= 10 and end_of_day:
+        parsed = datetime.combine(parsed.date(), dt_time.max)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def split_list(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+class Command(BaseCommand):
+    help = "Relance le traitement d'un ensemble d'enregistrements, avec limitation de débit et reprise"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Créés à partir de cette date (AAAA-MM-JJ)')
+        parser.add_argument('--until', help='Créés jusqu\'à cette date incluse (AAAA-MM-JJ)')
+        parser.add_argument('--status', default='', help='Statuts, séparés par des virgules')
+        parser.add_argument('--station', default='', help='Stations, séparées par des virgules')
+        flagged = parser.add_mutually_exclusive_group()
+        flagged.add_argument('--flagged', action='store_true', help='Seulement les enregistrements avec blanc suspect')
+        flagged.add_argument('--not-flagged', action='store_true', help='Seulement les enregistrements sans blanc suspect')
+        parser.add_argument('--stages', default='', help='Étapes à relancer (défaut: toutes)')
+        parser.add_argument('--force', action='store_true', help='Recalculer même les étapes à jour')
+        parser.add_argument(
+            '--rate', type=float, default=60.0,
+            help='Enregistrements mis en file par minute (défaut: 60, 0 = illimité)'
+        )
+        parser.add_argument(
+            '--max-queue-depth', type=int, default=100,
+            help='Pause tant que la file de masse dépasse cette profondeur (défaut: 100, 0 = pas de limite)'
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help='Taille des lots (défaut: 100)')
+        parser.add_argument('--limit', type=int, default=0, help='Nombre maximum d\'enregistrements (0 = tous)')
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans mettre en file')
+        parser.add_argument('--restart', action='store_true', help='Ignorer la position enregistrée')
+
+    def handle(self, *args, **options):
+        try:
+            stages = select_stages(split_list(options['stages']))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        queryset = self._queryset(options)
+        cursor_path = self._cursor_path(options, stages)
+        cursor = {} if options['restart'] else self._load_cursor(cursor_path)
+        last_id = cursor.get('last_id', 0)
+        enqueued = cursor.get('enqueued', 0)
+
+        total = queryset.count()
+        selected = queryset.filter(id__gt=last_id).count()
+        remaining = min(selected, options['limit']) if options['limit'] else selected
+
+        if last_id:
+            self.stdout.write(f"Reprise après l'ID {last_id} ({enqueued} déjà mis en file)")
+        self.stdout.write(f"{total} enregistrement(s) sélectionné(s), {remaining} à mettre en file")
+
+        if options['dry_run'] or not remaining:
+            return
+
+        from apps.archive.tasks import enqueue_bulk
+
+        throttle = EnqueueThrottle(
+            rate=options['rate'],
+            max_queue_depth=options['max_queue_depth'],
+            on_wait=lambda depth: self.stdout.write(f"  files pleines ({depth} tâches), pause..."),
+            on_capture_wait=lambda jobs: self.stdout.write(
+                f"  captures sous pression ({', '.join(f'job {j}: {r}' for j, r in jobs)}), pause..."
+            )
+        )
+
+        started = time.monotonic()
+        done = 0
+
+        while done < remaining:
+            size = min(options['batch_size'], remaining - done)
+            ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:size])
+            if not ids:
+                break
+
+            for recording_id in ids:
+                throttle.wait()
+                enqueue_bulk(recording_id, force=options['force'], stages=stages)
+
+            done += len(ids)
+            enqueued += len(ids)
+            last_id = ids[-1]
+            self._save_cursor(cursor_path, {'last_id': last_id, 'enqueued': enqueued})
+
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed else 0
+            eta = (remaining - done) / rate if rate else 0
+            self.stdout.write(
+                f"{done}/{remaining} mis en file ({rate * 60:.0f}/min, "
+                f"ETA {eta / 60:.0f} min, dernier ID {last_id})"
+            )
+
+        # Sélection entièrement traitée : la prochaine exécution repart du début
+        if done >= selected:
+            cursor_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f"{done} enregistrement(s) mis en file"))
+
+    def _queryset(self, options):
+        queryset = Recording.objects.exclude(status='recording')
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=parse_date(options['since']))
+        if options['until']:
+            queryset = queryset.filter(created_at__lte=parse_date(options['until'], end_of_day=True))
+        if split_list(options['status']):
+            queryset = queryset.filter(status__in=split_list(options['status']))
+        if split_list(options['station']):
+            queryset = queryset.filter(station__in=split_list(options['station']))
+        if options['flagged']:
+            queryset = queryset.filter(flagged_blank=True)
+        elif options['not_flagged']:
+            queryset = queryset.filter(flagged_blank=False)
+        return queryset.order_by('id')
+
+    def _cursor_path(self, options, stages):
+        """Fichier de position propre à la combinaison de filtres"""
+        selection = {
+            key: options[key]
+            for key in ('since', 'until', 'status', 'station', 'flagged', 'not_flagged', 'force')
+        }
+        selection['stages'] = stages
+        key = hashlib.sha256(json.dumps(selection, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return Path(settings.MEDIA_ROOT) / '.reprocess' / f"{key}.json"
+
+    def _load_cursor(self, path):
+        try:
+            return json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_cursor(self, path, cursor):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(cursor))
+        tmp.replace(path)
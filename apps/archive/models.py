@@ -20,6 +20,11 @@ class Recording(models.Model):
         ('completed', 'Terminé'),
         ('error', 'Erreur'),
     ]
+    STORAGE_TIER_CHOICES = [
+        ('hot', 'Chaud (original)'),
+        ('warm', 'Tiède (FLAC)'),
+        ('cold', 'Froid (Opus)'),
+    ]
     
     # Identification
     title = models.CharField(
@@ -35,6 +40,12 @@ class Recording(models.Model):
         max_length=2048,
         verbose_name='Chemin du fichier'
     )
+    station = models.CharField(
+        max_length=128,
+        blank=True,
+        db_index=True,
+        verbose_name='Station'
+    )
     
     # Métadonnées audio
     duration = models.FloatField(
@@ -67,6 +78,30 @@ class Recording(models.Model):
         verbose_name='Taille du fichier (octets)'
     )
     
+    # Stockage (cycle de vie : original -> FLAC -> Opus sur volume froid)
+    storage_tier = models.CharField(
+        max_length=16,
+        choices=STORAGE_TIER_CHOICES,
+        default='hot',
+        verbose_name='Niveau de stockage'
+    )
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Empreinte SHA-256 du fichier'
+    )
+    # Changement de niveau en file ou en cours (un seul à la fois)
+    tier_move_token = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Jeton du changement de niveau'
+    )
+    tier_move_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Changement de niveau réservé le'
+    )
+    
     # Statut
     status = models.CharField(
         max_length=20,
@@ -110,6 +145,12 @@ class Recording(models.Model):
         related_name='recordings',
         verbose_name='Propriétaire'
     )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Début de la capture',
+        help_text='Heure du premier échantillon (extraits en heure réelle)'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Date de création'
@@ -143,11 +184,18 @@ class Recording(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['flagged_blank']),
+            models.Index(fields=['storage_tier', 'created_at']),
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
         return f"{self.title or self.filename} ({self.get_status_display()})"
     
+    @property
+    def wall_clock_start(self):
+        """Heure réelle du début de l'audio (création si inconnue)"""
+        return self.started_at or self.created_at
+    
     def save(self, *args, **kwargs):
         # Définir la date d'expiration si non définie
         if not self.expires_at and self.created_at:
@@ -248,3 +296,284 @@ class BlankAlert(models.Model):
         """Retourne la durée formatée"""
         return f"{self.duration:.2f}s"
 
+
+
+class ProcessingStage(models.Model):
+    """
+    Étape du traitement d'un enregistrement (statut et durées)
+    """
+    STAGE_CHOICES = [
+        ('metadata', 'Métadonnées audio'),
+        ('silence', 'Détection de silence'),
+        ('blank_analysis', 'Analyse des blancs'),
+        ('blank_notification', 'Notification des blancs'),
+        ('transcription', 'Transcription'),
+        ('summary', 'Résumé'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échoué'),
+        ('skipped', 'Ignoré'),
+    ]
+    
+    recording = models.ForeignKey(
+        Recording,
+        on_delete=models.CASCADE,
+        related_name='stages',
+        verbose_name='Enregistrement'
+    )
+    name = models.CharField(
+        max_length=32,
+        choices=STAGE_CHOICES,
+        verbose_name='Étape'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Statut'
+    )
+    queued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Mis en file le'
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Démarré le'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Terminé le'
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Durée (secondes)'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Erreur'
+    )
+    
+    # Point de reprise : une étape terminée avec la même empreinte
+    # d'entrée et la même version d'analyseur n'est pas recalculée
+    input_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Empreinte des entrées'
+    )
+    analyzer_version = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Version de l\'analyseur'
+    )
+    params = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Paramètres de l\'analyseur'
+    )
+    output = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Résultat'
+    )
+    
+    # Mesures de la dernière exécution
+    queue_wait = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Attente en file (secondes)'
+    )
+    audio_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Audio traité (secondes)'
+    )
+    real_time_factor = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Facteur temps réel'
+    )
+    timings = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Temps par phase (secondes)'
+    )
+    
+    class Meta:
+        verbose_name = 'Étape de traitement'
+        verbose_name_plural = 'Étapes de traitement'
+        ordering = ['recording', 'queued_at', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recording', 'name'],
+                name='unique_stage_per_recording'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_name_display()} ({self.get_status_display()}) - {self.recording_id}"
+
+
+class ProcessingLease(models.Model):
+    """
+    Bail de traitement d'un enregistrement : un seul traitement à la fois
+    
+    Le bail est actif tant que `token` est renseigné et non expiré ; il est
+    prolongé par un battement de cœur pendant les étapes longues. Les
+    déclenchements reçus pendant un traitement sont fusionnés en une
+    seule relance, exécutée à la fin du traitement en cours.
+    """
+    recording = models.OneToOneField(
+        Recording,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='processing_lease',
+        verbose_name='Enregistrement'
+    )
+    token = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Jeton du traitement en cours'
+    )
+    acquired_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Acquis le'
+    )
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Dernier battement'
+    )
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Expire le'
+    )
+    
+    # Relance demandée pendant le traitement (paramètres fusionnés)
+    rerun_requested = models.BooleanField(
+        default=False,
+        verbose_name='Relance demandée'
+    )
+    rerun_force = models.BooleanField(
+        default=False,
+        verbose_name='Relance forcée'
+    )
+    rerun_stages = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Étapes à relancer'
+    )
+    
+    runs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Traitements lancés'
+    )
+    duplicates_avoided = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Doublons évités'
+    )
+    
+    class Meta:
+        verbose_name = 'Bail de traitement'
+        verbose_name_plural = 'Baux de traitement'
+    
+    def __str__(self):
+        return f"Bail {self.recording_id} ({'actif' if self.token else 'libre'})"
+
+
+class StorageUsage(models.Model):
+    """
+    Espace occupé par station ou par propriétaire (tenu à jour à chaque
+    modification de file_size, réconcilié chaque jour)
+    """
+    SCOPE_CHOICES = [
+        ('station', 'Station'),
+        ('owner', 'Propriétaire'),
+    ]
+    
+    scope = models.CharField(
+        max_length=16,
+        choices=SCOPE_CHOICES,
+        verbose_name='Portée'
+    )
+    key = models.CharField(
+        max_length=128,
+        blank=True,
+        verbose_name='Station ou ID du propriétaire'
+    )
+    recordings = models.IntegerField(
+        default=0,
+        verbose_name='Enregistrements'
+    )
+    bytes = models.BigIntegerField(
+        default=0,
+        verbose_name='Octets'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Mis à jour le'
+    )
+    
+    class Meta:
+        verbose_name = 'Occupation du stockage'
+        verbose_name_plural = 'Occupation du stockage'
+        ordering = ['scope', '-bytes']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'key'],
+                name='unique_storage_usage_scope_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_scope_display()} {self.key or '-'}: {self.bytes} octets"
+
+
+class TimelineSegment(models.Model):
+    """
+    Intervalle d'heure réelle couvert par un enregistrement d'une station
+
+    Un enregistrement est découpé en segments d'au plus
+    TIMELINE_SEGMENT_MAX_HOURS heures : la recherche des segments d'un
+    intervalle reste une lecture d'index bornée.
+    """
+    station = models.CharField(
+        max_length=128,
+        blank=True,
+        verbose_name='Station'
+    )
+    recording = models.ForeignKey(
+        Recording,
+        on_delete=models.CASCADE,
+        related_name='timeline_segments',
+        verbose_name='Enregistrement'
+    )
+    starts_at = models.DateTimeField(
+        verbose_name='Début'
+    )
+    ends_at = models.DateTimeField(
+        verbose_name='Fin'
+    )
+    offset = models.FloatField(
+        default=0,
+        verbose_name='Position dans le fichier (secondes)'
+    )
+    
+    class Meta:
+        verbose_name = 'Segment de la chronologie'
+        verbose_name_plural = 'Chronologie'
+        ordering = ['station', 'starts_at']
+        indexes = [
+            models.Index(fields=['station', 'starts_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.station or '-'} {self.starts_at:%Y-%m-%d %H:%M:%S} - {self.ends_at:%H:%M:%S}"
@@ -0,0 +1,651 @@
+"""
+Étapes du traitement d'un enregistrement
+
+Chaque étape relit l'enregistrement, n'écrit que ses propres champs
+(les étapes indépendantes tournent en parallèle sur des workers
+différents) et son statut / ses durées sont suivis dans ProcessingStage.
+
+Dépendances :
+    metadata
+    silence ───────▶ blank_analysis ─▶ blank_notification
+    transcription ─▶ summary
+
+Chaque étape terminée garde un point de reprise (résultat, empreinte
+des entrées, version de l'analyseur) : un nouveau traitement ne
+recalcule que les étapes manquantes, échouées ou obsolètes.
+
+Chaque exécution est mesurée (attente en file, durée, secondes d'audio,
+facteur temps réel, temps par phase : llm, asr, ffmpeg, decode, db),
+enregistrée sur l'étape et agrégée dans les métriques Prometheus.
+
+Les étapes lourdes (CAPTURE_THROTTLED_STAGES) s'interrompent, au
+démarrage ou entre deux passes (morceaux Whisper, FFmpeg), tant qu'une
+capture en direct est sous pression : la tâche est reprogrammée plus
+tard au lieu d'occuper un worker (phase capture_wait, hors durée de
+l'étape).
+"""
+from django.conf import settings
+from django.utils import timezone
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import time
+
+from apps.recorder.monitoring import collect_phases, timed
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['metadata', 'silence', 'blank_analysis', 'blank_notification', 'transcription', 'summary']
+
+STAGE_DEPENDENCIES = {
+    'metadata': [],
+    'silence': [],
+    'blank_analysis': ['silence'],
+    'blank_notification': ['blank_analysis'],
+    'transcription': [],
+    'summary': ['transcription'],
+}
+
+# Branches parallèles du DAG (étapes enchaînées dans chaque branche)
+STAGE_BRANCHES = [
+    ['metadata'],
+    ['silence', 'blank_analysis', 'blank_notification'],
+    ['transcription', 'summary'],
+]
+
+# Version du code de chaque étape : à incrémenter quand un changement
+# d'implémentation doit invalider les résultats existants
+STAGE_VERSIONS = {
+    'metadata': '1',
+    'silence': '1',
+    'blank_analysis': '1',
+    'blank_notification': '1',
+    'transcription': '1',
+    'summary': '1',
+}
+
+
+def stage_params(name, recording):
+    """
+    Paramètres dont dépend le résultat d'une étape
+    """
+    if name == 'silence':
+        return {
+            'threshold': getattr(settings, 'SILENCE_DETECTION_THRESHOLD', '-35dB'),
+            'min_duration': getattr(settings, 'SILENCE_DETECTION_DURATION', 2.0),
+            'suspicious_duration': getattr(settings, 'SUSPICIOUS_SILENCE_DURATION', 5.0),
+        }
+    if name == 'transcription':
+        from apps.ai.whisper_service import resolve_profile
+        profile, options = resolve_profile(station=recording.station)
+        return {
+            'language': 'fr',
+            'profile': profile,
+            'options': options,
+            'default_model': getattr(settings, 'WHISPER_MODEL', 'base'),
+        }
+    if name == 'blank_analysis':
+        return {
+            'model': getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest'),
+        }
+    if name == 'summary':
+        return {
+            'model': getattr(settings, 'MISTRAL_MODEL', 'mistral-small-latest'),
+            'chunk_tokens': getattr(settings, 'MISTRAL_CHUNK_TOKENS', 2000),
+            'reduce_tokens': getattr(settings, 'MISTRAL_REDUCE_TOKENS', 6000),
+        }
+    return {}
+
+
+def current_params(name, recording):
+    """
+    Paramètres actuels d'une étape, sous leur forme stockée (JSON)
+    """
+    return json.loads(json.dumps(stage_params(name, recording), sort_keys=True, default=str))
+
+
+def file_identity(filepath):
+    """Identité du fichier audio : chemin, taille, date de modification"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return [filepath, None, None]
+    return [filepath, stat.st_size, stat.st_mtime_ns]
+
+
+def compute_fingerprint(name, recording, upstream_fingerprints):
+    """
+    Empreinte des entrées d'une étape : fichier, paramètres, version,
+    et empreintes des étapes dont elle dépend
+    """
+    payload = {
+        'stage': name,
+        'version': STAGE_VERSIONS[name],
+        'file': file_identity(recording.filepath),
+        'params': stage_params(name, recording),
+        'upstream': upstream_fingerprints,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+def restamp_fingerprints(recording, old_filepath):
+    """
+    Reporte les points de reprise sur un nouveau fichier de même audio
+    (changement de niveau de stockage)
+
+    Les étapes à jour pour l'ancien fichier reçoivent l'empreinte
+    calculée avec le nouveau ; les autres restent obsolètes. Les deux
+    fichiers doivent exister.
+
+    Returns:
+        int: Nombre d'étapes reportées
+    """
+    from copy import copy
+    from .models import ProcessingStage
+
+    old_recording = copy(recording)
+    old_recording.filepath = old_filepath
+
+    rows = {row.name: row for row in ProcessingStage.objects.filter(recording=recording)}
+    old_stored = {name: row.input_fingerprint for name, row in rows.items()}
+    new_stored = dict(old_stored)
+    restamped = 0
+
+    for name in STAGES:
+        if not old_stored.get(name):
+            continue
+        required = STAGE_DEPENDENCIES[name]
+        try:
+            expected = compute_fingerprint(
+                name, old_recording, {dep: old_stored.get(dep, '') for dep in required}
+            )
+            if old_stored[name] != expected:
+                continue
+            new_stored[name] = compute_fingerprint(
+                name, recording, {dep: new_stored.get(dep, '') for dep in required}
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Point de reprise {name} non reporté pour {recording.id}: {str(e)}")
+            continue
+        ProcessingStage.objects.filter(pk=rows[name].pk).update(input_fingerprint=new_stored[name])
+        restamped += 1
+
+    return restamped
+
+
+def stage_metadata(recording):
+    """
+    Métadonnées audio (ffprobe), segments de la chronologie et index de
+    positionnement (MP3, FLAC)
+    """
+    from apps.recorder.seek_index import build_seek_index, is_indexable
+    from apps.recorder.services import get_audio_metadata
+    from .timeline import sync_recording
+
+    metadata = get_audio_metadata(recording.filepath)
+    recording.duration = metadata.get('duration')
+    recording.sample_rate = metadata.get('sample_rate')
+    recording.file_size = metadata.get('file_size')
+    with timed('db'):
+        recording.save(update_fields=['duration', 'sample_rate', 'file_size', 'updated_at'])
+        sync_recording(recording)
+
+    if is_indexable(recording.format):
+        try:
+            metadata['seek_index'] = build_seek_index(recording.filepath, recording.format)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Sans index, les lecteurs se positionnent par recherche FFmpeg
+            logger.warning(f"Index de positionnement impossible pour {recording.id}: {str(e)}")
+    return metadata
+
+
+def stage_silence(recording):
+    """
+    Détection de silence et création des alertes de blanc
+    
+    Idempotente : les alertes déjà présentes pour le même blanc sont
+    conservées (avec leur analyse et leur notification), celles qui
+    ne correspondent plus à un blanc sont supprimées.
+    """
+    from .models import BlankAlert
+    from apps.recorder.services import detect_silence_ffmpeg
+
+    silences = detect_silence_ffmpeg(recording.filepath)
+    recording.blank_analysis = {
+        'silences': [
+            {'start': s[0], 'end': s[1], 'duration': s[1] - s[0]}
+            for s in silences
+        ],
+        'count': len(silences)
+    }
+
+    suspicious_threshold = getattr(settings, 'SUSPICIOUS_SILENCE_DURATION', 5.0)
+
+    with timed('db'):
+        existing = {
+            (round(a.start_time, 2), round(a.end_time, 2)): a.id
+            for a in recording.blank_alerts.all()
+        }
+
+    kept_ids = []
+    new_alerts = []
+    for start, end in silences:
+        duration = end - start
+        if duration <= suspicious_threshold:
+            continue
+        key = (round(start, 2), round(end, 2))
+        if key in existing:
+            kept_ids.append(existing.pop(key))
+            continue
+        new_alerts.append(BlankAlert(
+            recording=recording,
+            start_time=start,
+            end_time=end,
+            duration=duration,
+            severity='warning' if duration < 10 else 'critical'
+        ))
+
+    recording.flagged_blank = bool(kept_ids or new_alerts)
+    with timed('db'):
+        if existing:
+            BlankAlert.objects.filter(pk__in=existing.values()).delete()
+        BlankAlert.objects.bulk_create(new_alerts)
+        recording.save(update_fields=['blank_analysis', 'flagged_blank', 'updated_at'])
+
+    return {
+        'silences': len(silences),
+        'alerts_kept': len(kept_ids),
+        'alerts_created': len(new_alerts),
+        'alerts_removed': len(existing),
+    }
+
+
+def stage_blank_analysis(recording):
+    """
+    Analyse IA des blancs : contexte transcrit par Whisper, puis un appel
+    Mistral par lot d'alertes (les notifications sont une étape à part,
+    servie par la file realtime)
+
+    Seules les nouvelles alertes sont analysées, sauf si l'analyseur a
+    changé depuis la dernière analyse (version ou paramètres) : toutes
+    les alertes sont alors réévaluées. Une alerte sans verdict (erreur
+    d'API, réponse illisible) n'est pas modifiée et l'étape échoue : elle
+    sera analysée au prochain traitement.
+    """
+    from .models import BlankAlert, ProcessingStage
+    from apps.ai.mistral_service import analyze_blank_contexts
+
+    previous = ProcessingStage.objects.filter(
+        recording=recording, name='blank_analysis'
+    ).exclude(analyzer_version='').first()
+    outdated = previous is not None and (
+        previous.analyzer_version != STAGE_VERSIONS['blank_analysis']
+        or (previous.params is not None
+            and previous.params != current_params('blank_analysis', recording))
+    )
+
+    alerts = recording.blank_alerts.all()
+    if not outdated:
+        alerts = alerts.filter(ai_confidence__isnull=True)
+    with timed('db'):
+        alerts = list(alerts)
+    if not alerts:
+        return {'analyzed': 0}
+
+    analyses = analyze_blank_contexts(recording, alerts)
+    analyzed = [alert for alert in alerts if alert.id in analyses]
+    for alert in analyzed:
+        analysis = analyses[alert.id]
+        alert.is_natural = analysis['is_natural']
+        alert.ai_confidence = analysis['confidence']
+        alert.ai_explanation = analysis['explanation']
+    with timed('db'):
+        BlankAlert.objects.bulk_update(
+            analyzed, ['is_natural', 'ai_confidence', 'ai_explanation']
+        )
+
+    # Alertes sans verdict : laissées à analyser (ai_confidence NULL) ;
+    # l'étape échoue pour être relancée au prochain traitement
+    if len(analyzed) < len(alerts):
+        raise RuntimeError(
+            f"{len(alerts) - len(analyzed)} blanc(s) sur {len(alerts)} sans verdict Mistral"
+        )
+
+    return {'analyzed': len(analyzed)}
+
+
+def stage_blank_notification(recording):
+    """
+    Notification des blancs jugés suspects (une seule fois par alerte)
+    """
+    from .models import BlankAlert
+    from .tasks import send_blank_notification
+
+    with timed('db'):
+        alerts = list(recording.blank_alerts.filter(
+            is_natural=False, notified=False, ai_confidence__isnull=False
+        ))
+
+    notified_ids = []
+    for alert in alerts:
+        send_blank_notification(recording, alert)
+        notified_ids.append(alert.id)
+    if notified_ids:
+        with timed('db'):
+            BlankAlert.objects.filter(pk__in=notified_ids).update(notified=True)
+
+    return {'notified': len(notified_ids)}
+
+
+def stage_transcription(recording):
+    """
+    Transcription Whisper (profil de la station)
+
+    Un échec (fichier introuvable, Whisper absent ou en erreur) fait
+    échouer l'étape : rien n'est enregistré et la transcription sera
+    retentée au prochain traitement.
+    """
+    from apps.ai.whisper_service import transcribe_file_detailed
+
+    logger.info(f"Transcription de {recording.filename}")
+    result = transcribe_file_detailed(recording.filepath, station=recording.station)
+    if result['error']:
+        raise RuntimeError(f"Transcription impossible: {result['error']}")
+    stats = {k: v for k, v in result.items() if k not in ('text', 'error')}
+    recording.transcript = result['text']
+    recording.ai_metadata = {**(recording.ai_metadata or {}), 'transcription': stats}
+    with timed('db'):
+        recording.save(update_fields=['transcript', 'ai_metadata', 'updated_at'])
+    return stats
+
+
+def stage_summary(recording):
+    """Résumé hiérarchique de la transcription"""
+    from apps.ai.mistral_service import summarize_long_text
+
+    if not recording.transcript:
+        return {'chunks': 0}
+
+    logger.info(f"Génération du résumé pour {recording.filename}")
+    metadata = recording.ai_metadata or {}
+    recording.summary, chunks = summarize_long_text(
+        recording.transcript,
+        previous_chunks=metadata.get('summary_chunks')
+    )
+    recording.ai_metadata = {**metadata, 'summary_chunks': chunks}
+    with timed('db'):
+        recording.save(update_fields=['summary', 'ai_metadata', 'updated_at'])
+    return {'chunks': len(chunks)}
+
+
+STAGE_FUNCTIONS = {
+    'metadata': stage_metadata,
+    'silence': stage_silence,
+    'blank_analysis': stage_blank_analysis,
+    'blank_notification': stage_blank_notification,
+    'transcription': stage_transcription,
+    'summary': stage_summary,
+}
+
+
+def select_stages(stages=None):
+    """
+    Valide une sélection d'étapes
+
+    Raises:
+        ValueError: Si une étape est inconnue
+    """
+    if not stages:
+        return list(STAGES)
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise ValueError(
+            f"Étape(s) inconnue(s): {', '.join(unknown)} "
+            f"(disponibles: {', '.join(STAGES)})"
+        )
+    return [s for s in STAGES if s in stages]
+
+
+def selected_branches(stages):
+    """
+    Branches du DAG restreintes aux étapes sélectionnées (branches vides retirées)
+    """
+    branches = [[s for s in branch if s in stages] for branch in STAGE_BRANCHES]
+    return [b for b in branches if b]
+
+
+def mark_stages_pending(recording_id, stages):
+    """
+    Marque les étapes sélectionnées comme en attente, sans effacer
+    leur point de reprise (empreinte, version, résultat)
+    """
+    from .models import ProcessingStage
+
+    now = timezone.now()
+    for name in stages:
+        ProcessingStage.objects.update_or_create(
+            recording_id=recording_id,
+            name=name,
+            defaults={'status': 'pending', 'queued_at': now, 'error': ''}
+        )
+
+
+def audio_seconds(recording, output):
+    """
+    Durée de l'audio traité par une étape (secondes, None si inconnue)
+    """
+    from apps.recorder.pcm_cache import PCM_BYTES_PER_SAMPLE, PCM_SAMPLE_RATE, cache_path
+
+    output = output if isinstance(output, dict) else {}
+    for value in (output.get('audio_duration'), output.get('duration'), recording.duration):
+        if value:
+            return float(value)
+    # Étapes parallèles à celle des métadonnées : taille du PCM décodé
+    try:
+        size = cache_path(recording.filepath).stat().st_size
+    except OSError:
+        return None
+    return size / (PCM_SAMPLE_RATE * PCM_BYTES_PER_SAMPLE) or None
+
+
+def record_stage_metrics(recording, name, status, duration=None, queue_wait=None, output=None, phases=None):
+    """
+    Enregistre les mesures d'une exécution sur l'étape et dans les métriques
+
+    Returns:
+        dict: Champs de mesure de ProcessingStage
+    """
+    from apps.recorder.monitoring import inc, observe
+
+    labels = {'stage': name}
+    inc('pige_stage_runs_total', {**labels, 'status': status})
+    if queue_wait is not None:
+        observe('pige_stage_queue_wait_seconds', labels, queue_wait)
+
+    fields = {'queue_wait': queue_wait}
+    if duration is None:
+        return fields
+
+    seconds = audio_seconds(recording, output) if recording is not None else None
+    rtf = duration / seconds if seconds else None
+    fields.update({
+        'audio_seconds': seconds,
+        'real_time_factor': rtf,
+        'timings': {phase: round(value, 3) for phase, value in (phases or {}).items()},
+    })
+
+    observe('pige_stage_duration_seconds', labels, duration)
+    if seconds:
+        inc('pige_stage_audio_seconds_total', labels, seconds)
+        observe('pige_stage_real_time_factor', labels, rtf)
+    for phase, value in (phases or {}).items():
+        inc('pige_stage_phase_seconds_total', {**labels, 'phase': phase}, value)
+    return fields
+
+
+def run_stage(recording_id, name, force=False, token=None, queue_wait=None,
+              capture_throttle=True, capture_wait=0.0):
+    """
+    Exécute une étape en suivant son statut et ses mesures
+
+    L'étape est sautée si son point de reprise est à jour (terminée avec
+    la même empreinte d'entrée et la même version), sauf si `force`.
+    Le bail de traitement (`token`) est prolongé pendant l'exécution ;
+    s'il a été repris par un autre traitement, l'étape s'arrête (au
+    démarrage ou au prochain point de contrôle) sans toucher à son statut,
+    désormais suivi par l'autre traitement.
+    `queue_wait` est l'attente en file de la tâche Celery (secondes).
+    Une étape lourde interrompue par une capture sous pression est
+    remise en attente ('deferred') pour être reprogrammée ;
+    `capture_throttle` désactive cette régulation et `capture_wait` est
+    le report déjà subi (secondes).
+    Une étape dont une dépendance n'est pas terminée est ignorée. Les
+    erreurs sont enregistrées sur l'étape (et non propagées) pour que
+    la finalisation du traitement ait toujours lieu.
+
+    Returns:
+        str: 'completed', 'reused', 'failed', 'skipped', 'aborted' ou 'deferred'
+    """
+    from apps.recorder.contention import CapturePressure, CapturePressureCheck
+    from apps.recorder.monitoring import checkpoint, checkpoint_hooks
+    from .lease import LeaseHeartbeat, LeaseLost, heartbeat
+    from .models import Recording, ProcessingStage
+
+    if token and not heartbeat(recording_id, token):
+        logger.warning(f"Étape {name} de {recording_id} abandonnée : bail repris par un autre traitement")
+        return 'aborted'
+
+    stages = ProcessingStage.objects.filter(recording_id=recording_id)
+    stage, _ = ProcessingStage.objects.get_or_create(recording_id=recording_id, name=name)
+
+    required = STAGE_DEPENDENCIES.get(name, [])
+    upstream = dict(
+        stages.filter(name__in=required, status='completed')
+        .values_list('name', 'input_fingerprint')
+    )
+    missing = [r for r in required if r not in upstream]
+    if missing:
+        stages.filter(name=name).update(
+            status='skipped',
+            finished_at=timezone.now(),
+            error=f"Dépendance(s) non terminée(s): {', '.join(missing)}",
+            input_fingerprint='',
+            **record_stage_metrics(None, name, 'skipped', queue_wait=queue_wait),
+        )
+        return 'skipped'
+
+    try:
+        recording = Recording.objects.get(pk=recording_id)
+        fingerprint = compute_fingerprint(name, recording, upstream)
+    except Exception as e:
+        logger.error(f"Étape {name} échouée pour {recording_id}: {str(e)}")
+        stages.filter(name=name).update(
+            status='failed', finished_at=timezone.now(), error=str(e), input_fingerprint='',
+            **record_stage_metrics(None, name, 'failed', queue_wait=queue_wait),
+        )
+        return 'failed'
+
+    if (
+        not force
+        and stage.finished_at is not None
+        and stage.error == ''
+        and stage.input_fingerprint == fingerprint
+        and stage.analyzer_version == STAGE_VERSIONS[name]
+    ):
+        stages.filter(name=name).update(
+            status='completed',
+            **record_stage_metrics(recording, name, 'reused', queue_wait=queue_wait),
+        )
+        logger.info(f"Étape {name} à jour pour {recording_id} (point de reprise réutilisé)")
+        return 'reused'
+
+    # Étapes lourdes : laisser passer les captures en direct en difficulté
+    hooks = ()
+    if capture_throttle and name in getattr(settings, 'CAPTURE_THROTTLED_STAGES', ['silence', 'transcription']):
+        hooks = (CapturePressureCheck(),)
+    phases = {}
+    if capture_wait >= 1:
+        phases['capture_wait'] = capture_wait
+
+    started_at = timezone.now()
+    stages.filter(name=name).update(status='running', started_at=started_at, error='')
+    t0 = time.monotonic()
+
+    try:
+        with LeaseHeartbeat(recording_id, token) as lease, collect_phases(phases), \
+                checkpoint_hooks(lease.check, *hooks):
+            checkpoint()
+            output = STAGE_FUNCTIONS[name](recording)
+            if token and not heartbeat(recording_id, token):
+                raise LeaseLost(f"Bail de traitement perdu pour {recording_id}")
+    except LeaseLost as e:
+        logger.warning(f"Étape {name} de {recording_id} interrompue: {str(e)}")
+        return 'aborted'
+    except CapturePressure as e:
+        logger.info(f"Étape {name} de {recording_id} reportée: {str(e)}")
+        stages.filter(name=name).update(
+            status='pending',
+            **record_stage_metrics(None, name, 'deferred', queue_wait=queue_wait),
+        )
+        return 'deferred'
+    except Exception as e:
+        logger.error(f"Étape {name} échouée pour {recording_id}: {str(e)}")
+        duration = time.monotonic() - t0
+        stages.filter(name=name).update(
+            status='failed',
+            finished_at=timezone.now(),
+            duration=duration,
+            error=str(e),
+            input_fingerprint='',
+            **record_stage_metrics(
+                recording, name, 'failed', duration, queue_wait, phases=phases
+            ),
+        )
+        return 'failed'
+
+    duration = time.monotonic() - t0
+    stages.filter(name=name).update(
+        status='completed',
+        finished_at=timezone.now(),
+        duration=duration,
+        input_fingerprint=fingerprint,
+        analyzer_version=STAGE_VERSIONS[name],
+        params=current_params(name, recording),
+        output=output,
+        **record_stage_metrics(
+            recording, name, 'completed', duration, queue_wait, output, phases
+        ),
+    )
+    logger.info(f"Étape {name} terminée pour {recording_id} ({duration:.1f}s)")
+    return 'completed'
+
+
+def finalize(recording_id):
+    """
+    Fixe le statut de l'enregistrement une fois toutes les étapes passées
+
+    Returns:
+        str: Statut de l'enregistrement
+    """
+    from .models import Recording, ProcessingStage
+
+    failed = ProcessingStage.objects.filter(
+        recording_id=recording_id,
+        status__in=['failed', 'skipped']
+    ).exists()
+    status = 'error' if failed else 'completed'
+
+    Recording.objects.filter(pk=recording_id).update(status=status, updated_at=timezone.now())
+    logger.info(f"Traitement terminé pour {recording_id} ({status})")
+
+    # L'audio décodé partagé par les étapes n'est plus utile
+    from apps.recorder.pcm_cache import release_pcm
+    filepath = Recording.objects.filter(pk=recording_id).values_list('filepath', flat=True).first()
+    if filepath:
+        release_pcm(filepath)
+
+    return status
@@ -0,0 +1,146 @@
+"""
+Planification des recalculs après un changement d'analyseur
+
+Chaque champ dérivé garde la trace de son producteur :
+- blank_analysis, transcript, summary : étape de traitement (version,
+  paramètres et empreinte des entrées dans ProcessingStage)
+- tags : ai_metadata['tags_producer'] (moteur, version, paramètres)
+
+Le planificateur compare cette provenance à la configuration actuelle
+et ne retient que les étapes obsolètes (et celles qui en dépendent).
+"""
+import logging
+import os
+
+from .pipeline import (
+    STAGES,
+    STAGE_DEPENDENCIES,
+    STAGE_VERSIONS,
+    compute_fingerprint,
+    current_params,
+)
+
+logger = logging.getLogger(__name__)
+
+# Champ dérivé -> étape qui le produit
+FIELD_STAGES = {
+    'blank_analysis': 'silence',
+    'transcript': 'transcription',
+    'summary': 'summary',
+}
+
+# Raisons d'obsolescence, de la plus à la moins explicite
+REASONS = ['missing', 'version', 'params', 'input', 'upstream']
+
+
+def stage_staleness(name, recording, row, upstream_fingerprints):
+    """
+    Raison d'obsolescence d'une étape, hors propagation
+
+    Args:
+        name: Nom de l'étape
+        recording: Recording
+        row: ProcessingStage existant (ou None)
+        upstream_fingerprints: {étape amont: empreinte attendue}
+
+    Returns:
+        tuple: (raison ou None si à jour, empreinte attendue)
+    """
+    fingerprint = compute_fingerprint(name, recording, upstream_fingerprints)
+
+    if row is None or row.status != 'completed' or not row.input_fingerprint:
+        return 'missing', fingerprint
+    if row.analyzer_version != STAGE_VERSIONS[name]:
+        return 'version', fingerprint
+    if row.params is not None and row.params != current_params(name, recording):
+        return 'params', fingerprint
+    if row.input_fingerprint != fingerprint:
+        return 'input', fingerprint
+    return None, fingerprint
+
+
+def plan_recording(recording, stage_rows, stages=None, include_missing=True):
+    """
+    Étapes obsolètes d'un enregistrement
+
+    Les empreintes attendues sont propagées dans l'ordre du DAG : une
+    étape dont une dépendance sera recalculée l'est aussi. Une étape
+    obsolète hors du périmètre n'est pas recalculée : ses dépendantes
+    sont comparées à son empreinte actuelle.
+
+    Args:
+        recording: Recording
+        stage_rows: {nom: ProcessingStage} des étapes existantes
+        stages: Étapes à considérer (toutes par défaut)
+        include_missing: Planifier aussi les étapes jamais terminées
+
+    Returns:
+        dict: {étape à recalculer: raison}
+    """
+    stages = stages or STAGES
+    expected = {}
+    stale = {}
+
+    for name in STAGES:
+        row = stage_rows.get(name)
+        upstream = {dep: expected[dep] for dep in STAGE_DEPENDENCIES[name]}
+        try:
+            reason, fingerprint = stage_staleness(name, recording, row, upstream)
+        except ValueError as e:
+            # Paramètres invalides (profil de station inconnu...)
+            logger.error(f"Planification impossible pour {recording.id} ({name}): {str(e)}")
+            reason, fingerprint = None, None
+
+        if any(dep in stale for dep in STAGE_DEPENDENCIES[name]):
+            if reason in (None, 'input'):
+                reason = 'upstream'
+
+        planned = (
+            reason is not None
+            and name in stages
+            and (include_missing or reason != 'missing')
+        )
+        if planned:
+            stale[name] = reason
+            expected[name] = fingerprint
+        else:
+            expected[name] = row.input_fingerprint if row else ''
+
+    return stale
+
+
+def tags_staleness(recording):
+    """
+    Raison d'obsolescence des tags (None si à jour ou sans tags)
+    """
+    from apps.ai.keywords import tags_producer
+
+    if not recording.tags:
+        return None
+    producer = (recording.ai_metadata or {}).get('tags_producer')
+    if not producer:
+        return 'missing'
+    current = tags_producer(producer.get('engine', 'local'), producer.get('max_keywords', 10))
+    if producer.get('version') != current['version']:
+        return 'version'
+    return None
+
+
+def plan_batch(recordings, stages=None, include_missing=True):
+    """
+    Plan de recalcul d'un lot d'enregistrements (stages préchargées)
+
+    Returns:
+        list: [(recording, {étape: raison}, raison des tags)] pour les
+              enregistrements qui ont au moins un champ obsolète
+    """
+    plans = []
+    for recording in recordings:
+        if not os.path.exists(recording.filepath):
+            continue
+        rows = {row.name: row for row in recording.stages.all()}
+        stale = plan_recording(recording, rows, stages, include_missing)
+        tags_reason = tags_staleness(recording)
+        if stale or tags_reason:
+            plans.append((recording, stale, tags_reason))
+    return plans
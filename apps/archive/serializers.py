@@ -2,7 +2,7 @@
 Serializers pour l'API d'archive
 """
 from rest_framework import serializers
-from .models import Recording, BlankAlert
+from .models import Recording, BlankAlert, ProcessingStage
 
 
 class BlankAlertSerializer(serializers.ModelSerializer):
@@ -19,26 +19,41 @@ class BlankAlertSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class ProcessingStageSerializer(serializers.ModelSerializer):
+    """Serializer pour les étapes de traitement"""
+    
+    class Meta:
+        model = ProcessingStage
+        fields = [
+            'name', 'status', 'queued_at', 'started_at', 'finished_at',
+            'duration', 'error', 'input_fingerprint', 'analyzer_version', 'params', 'output',
+            'queue_wait', 'audio_seconds', 'real_time_factor', 'timings'
+        ]
+        read_only_fields = fields
+
+
 class RecordingSerializer(serializers.ModelSerializer):
     """Serializer pour les enregistrements"""
     duration_formatted = serializers.ReadOnlyField()
     is_expired = serializers.ReadOnlyField()
     blank_alerts = BlankAlertSerializer(many=True, read_only=True)
+    stages = ProcessingStageSerializer(many=True, read_only=True)
     owner_username = serializers.CharField(source='owner.username', read_only=True)
     
     class Meta:
         model = Recording
         fields = [
-            'id', 'title', 'filename', 'filepath', 'duration',
+            'id', 'title', 'filename', 'filepath', 'station', 'duration',
             'duration_formatted', 'format', 'bitrate', 'sample_rate',
-            'channels', 'file_size', 'status', 'flagged_blank',
-            'blank_analysis', 'transcript', 'summary', 'ai_metadata',
-            'owner', 'owner_username', 'created_at', 'updated_at',
-            'expires_at', 'is_expired', 'tags', 'notes', 'blank_alerts'
+            'channels', 'file_size', 'storage_tier', 'checksum', 'status',
+            'flagged_blank', 'blank_analysis', 'transcript', 'summary', 'ai_metadata',
+            'owner', 'owner_username', 'started_at', 'created_at', 'updated_at',
+            'expires_at', 'is_expired', 'tags', 'notes', 'blank_alerts',
+            'stages'
         ]
         read_only_fields = [
             'id', 'created_at', 'updated_at', 'duration',
-            'file_size', 'is_expired'
+            'file_size', 'storage_tier', 'checksum', 'is_expired'
         ]
 
 
@@ -52,9 +67,9 @@ class RecordingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recording
         fields = [
-            'id', 'title', 'filename', 'duration', 'duration_formatted',
-            'format', 'status', 'flagged_blank', 'blank_alerts_count',
-            'owner_username', 'created_at', 'expires_at', 'is_expired'
+            'id', 'title', 'filename', 'station', 'duration', 'duration_formatted',
+            'format', 'storage_tier', 'status', 'flagged_blank', 'blank_alerts_count',
+            'owner_username', 'started_at', 'created_at', 'expires_at', 'is_expired'
         ]
     
     def get_blank_alerts_count(self, obj):
@@ -67,7 +82,7 @@ class RecordingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recording
         fields = [
-            'title', 'filename', 'filepath', 'format', 'bitrate',
-            'sample_rate', 'channels', 'owner', 'tags', 'notes'
+            'title', 'filename', 'filepath', 'station', 'format', 'bitrate',
+            'sample_rate', 'channels', 'owner', 'started_at', 'tags', 'notes'
         ]
 
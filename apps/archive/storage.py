@@ -0,0 +1,343 @@
+"""
+Comptabilité, prévision et régulation du stockage
+
+- Occupation par station et par propriétaire (StorageUsage), tenue à
+  jour par les signaux de Recording à chaque changement de file_size,
+  de station ou de propriétaire, et réconciliée chaque jour
+- Prévision : jours avant disque plein d'après le débit d'ingestion
+  récent, moins ce qui expire sur la même période
+- Régulation : si le disque sera plein avant STORAGE_FORECAST_ALERT_DAYS,
+  conversion anticipée en FLAC des plus anciens WAV (les conversions déjà
+  en file comptent dans l'espace à libérer), puis suppression
+  anticipée des enregistrements les moins prioritaires qui expiraient
+  bientôt ; quotas par station (STORAGE_QUOTAS)
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Count, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+import contextvars
+import logging
+import shutil
+
+from .models import Recording, StorageUsage
+
+logger = logging.getLogger(__name__)
+
+# Champs de Recording qui déterminent la comptabilité
+ACCOUNTED_FIELDS = {'station', 'owner', 'owner_id', 'file_size'}
+
+# Gain estimé d'une conversion WAV -> FLAC
+FLAC_SAVING_RATIO = 0.5
+
+_deferred = contextvars.ContextVar('storage_deferred', default=None)
+
+
+def _state(instance):
+    """(station, propriétaire, taille) d'un enregistrement, None si champs différés"""
+    values = instance.__dict__
+    if not {'station', 'owner_id', 'file_size'} <= values.keys():
+        return None
+    return (values['station'] or '', values['owner_id'], values['file_size'] or 0)
+
+
+def _deltas(state, sign):
+    station, owner_id, size = state
+    return {
+        ('station', station): (sign * size, sign),
+        ('owner', str(owner_id or '')): (sign * size, sign),
+    }
+
+
+def _apply(deltas):
+    """Applique des variations {(portée, clé): (octets, enregistrements)}"""
+    pending = _deferred.get()
+    for (scope, key), (size, count) in deltas.items():
+        if not size and not count:
+            continue
+        if pending is not None:
+            pending[(scope, key)][0] += size
+            pending[(scope, key)][1] += count
+            continue
+
+        update = dict(bytes=F('bytes') + size, recordings=F('recordings') + count, updated_at=timezone.now())
+        if StorageUsage.objects.filter(scope=scope, key=key).update(**update):
+            continue
+        try:
+            with transaction.atomic():
+                StorageUsage.objects.create(scope=scope, key=key, bytes=size, recordings=count)
+        except IntegrityError:
+            # Créée entre-temps par un autre processus
+            StorageUsage.objects.filter(scope=scope, key=key).update(**update)
+
+
+@contextmanager
+def deferred_accounting():
+    """
+    Regroupe les variations du bloc en une mise à jour par station /
+    propriétaire (suppressions par lots)
+    """
+    pending = defaultdict(lambda: [0, 0])
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        _apply({key: tuple(values) for key, values in pending.items()})
+
+
+@receiver(post_init, sender=Recording)
+def remember_storage_state(sender, instance, **kwargs):
+    instance._storage_state = _state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Recording)
+def account_recording_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not ACCOUNTED_FIELDS & set(update_fields):
+        return
+    new = _state(instance)
+    old = None if created else getattr(instance, '_storage_state', None)
+    if new is None or (old is None and not created):
+        # État initial inconnu (champs différés) : corrigé par la réconciliation
+        instance._storage_state = new
+        return
+    if new != old:
+        deltas = defaultdict(lambda: (0, 0))
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            for key, (size, count) in _deltas(state, sign).items():
+                deltas[key] = (deltas[key][0] + size, deltas[key][1] + count)
+        _apply(deltas)
+    instance._storage_state = new
+
+
+@receiver(post_delete, sender=Recording)
+def account_recording_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_storage_state', None) or _state(instance)
+    if state is not None:
+        _apply(_deltas(state, -1))
+
+
+def rebuild_usage():
+    """
+    Recalcule l'occupation depuis les enregistrements (corrige les écarts
+    dus aux mises à jour en masse qui ne passent pas par les signaux)
+
+    Returns:
+        int: Nombre de lignes StorageUsage
+    """
+    rows = []
+    for scope, field in (('station', 'station'), ('owner', 'owner_id')):
+        for row in Recording.objects.values(field).annotate(count=Count('id'), size=Sum('file_size')):
+            rows.append(StorageUsage(
+                scope=scope,
+                key=str(row[field] or ''),
+                recordings=row['count'],
+                bytes=row['size'] or 0
+            ))
+    with transaction.atomic():
+        StorageUsage.objects.all().delete()
+        StorageUsage.objects.bulk_create(rows)
+    return len(rows)
+
+
+def get_usage():
+    """
+    Returns:
+        dict: {'stations': {station: {...}}, 'owners': {id: {...}}}
+    """
+    usage = {'stations': {}, 'owners': {}}
+    for row in StorageUsage.objects.all():
+        target = usage['stations'] if row.scope == 'station' else usage['owners']
+        target[row.key] = {'recordings': row.recordings, 'bytes': row.bytes}
+    return usage
+
+
+def get_quotas():
+    """Quotas par station en octets (STORAGE_QUOTAS)"""
+    return getattr(settings, 'STORAGE_QUOTAS', {}) or {}
+
+
+def _hot_volume(queryset):
+    """Enregistrements stockés sur MEDIA_ROOT (hors volume froid séparé)"""
+    if getattr(settings, 'STORAGE_COLD_DIR', ''):
+        return queryset.exclude(storage_tier='cold')
+    return queryset
+
+
+def forecast(now=None):
+    """
+    Projection du remplissage du disque des enregistrements
+
+    Débit net = octets capturés par jour sur la fenêtre récente
+    (STORAGE_FORECAST_WINDOW_DAYS) - octets qui expireront par jour sur
+    la fenêtre à venir.
+
+    Returns:
+        dict: Disque (total, utilisé, libre), débits en octets par jour,
+              jours avant disque plein (None si le débit net est nul ou
+              négatif), et débit par station
+    """
+    now = now or timezone.now()
+    window = getattr(settings, 'STORAGE_FORECAST_WINDOW_DAYS', 7)
+    reserve = getattr(settings, 'STORAGE_MIN_FREE_BYTES', 20 * 1024**3)
+    disk = shutil.disk_usage(settings.MEDIA_ROOT)
+
+    recordings = _hot_volume(Recording.objects.all())
+    recent = recordings.filter(created_at__gte=now - timedelta(days=window))
+    ingested = recent.aggregate(total=Sum('file_size'))['total'] or 0
+    expiring = recordings.filter(
+        expires_at__gte=now, expires_at__lt=now + timedelta(days=window)
+    ).aggregate(total=Sum('file_size'))['total'] or 0
+
+    ingest_rate = ingested / window
+    expiry_rate = expiring / window
+    net_rate = ingest_rate - expiry_rate
+    usable = disk.free - reserve
+    days_until_full = max(0.0, usable / net_rate) if net_rate > 0 else None
+    if usable <= 0:
+        days_until_full = 0.0
+
+    return {
+        'disk': {'total': disk.total, 'used': disk.used, 'free': disk.free, 'reserve': reserve},
+        'window_days': window,
+        'ingest_bytes_per_day': int(ingest_rate),
+        'expiry_bytes_per_day': int(expiry_rate),
+        'net_bytes_per_day': int(net_rate),
+        'days_until_full': round(days_until_full, 1) if days_until_full is not None else None,
+        'stations': {
+            row['station'] or '': int((row['size'] or 0) / window)
+            for row in recent.values('station').annotate(size=Sum('file_size'))
+        },
+    }
+
+
+def _evictable(now, horizon=True):
+    """
+    Enregistrements supprimables par anticipation, les moins prioritaires
+    d'abord : jamais les blancs signalés, les plus proches de l'expiration
+    d'abord, et (si `horizon`) seulement ceux qui expirent dans
+    STORAGE_EVICT_HORIZON_DAYS
+    """
+    from .expiry import BUSY_STATUSES
+
+    queryset = (
+        Recording.objects.exclude(status__in=BUSY_STATUSES)
+        .filter(flagged_blank=False)
+        .order_by('expires_at', 'id')
+    )
+    if horizon:
+        days = getattr(settings, 'STORAGE_EVICT_HORIZON_DAYS', 7)
+        queryset = queryset.filter(expires_at__lt=now + timedelta(days=days))
+    return queryset
+
+
+def _take(queryset, needed, limit, ratio=1.0):
+    """IDs à traiter pour libérer `needed` octets (gain = taille x ratio)"""
+    selected, freed = [], 0
+    for recording_id, size in queryset.values_list('id', 'file_size')[:limit]:
+        if freed >= needed:
+            break
+        selected.append(recording_id)
+        freed += int((size or 0) * ratio)
+    return selected, freed
+
+
+def relieve_storage(now=None, dry_run=False):
+    """
+    Libère de l'espace avant que le disque ne soit plein
+
+    1. Quotas : les stations au-delà de leur quota perdent leurs
+       enregistrements supprimables les moins prioritaires
+    2. Si le disque sera plein avant STORAGE_FORECAST_ALERT_DAYS : viser
+       STORAGE_TARGET_DAYS jours de marge, d'abord en convertissant les
+       plus anciens WAV en FLAC (sans perte), puis, sous la réserve
+       STORAGE_MIN_FREE_BYTES ou à moins d'un jour, en supprimant par
+       anticipation
+
+    Les enregistrements dont la conversion est déjà en file ne sont pas
+    remis en file : leur gain attendu est déduit de l'espace à libérer.
+
+    Returns:
+        dict: Prévision, octets à libérer, enregistrements convertis et
+              supprimés (IDs)
+    """
+    from .expiry import BUSY_STATUSES
+    from .lifecycle import TIER_SOURCES, exclude_pending_moves, pending_moves, schedule_moves
+
+    now = now or timezone.now()
+    fc = forecast(now)
+    limit = getattr(settings, 'STORAGE_RELIEF_BATCH', 200)
+    alert_days = getattr(settings, 'STORAGE_FORECAST_ALERT_DAYS', 7)
+    target_days = getattr(settings, 'STORAGE_TARGET_DAYS', 14)
+
+    evict = []
+    quota_evictions = {}
+    usage = get_usage()['stations']
+    for station, quota in get_quotas().items():
+        excess = usage.get(station, {}).get('bytes', 0) - quota
+        if excess > 0:
+            ids, _ = _take(_evictable(now, horizon=False).filter(station=station), excess, limit)
+            quota_evictions[station] = len(ids)
+            evict += ids
+
+    free = fc['disk']['free'] - fc['disk']['reserve']
+    needed = max(0, fc['net_bytes_per_day'] * target_days - free)
+    if free < 0:
+        needed = max(needed, -free)
+    breach = fc['days_until_full'] is not None and fc['days_until_full'] < alert_days
+
+    transcode = []
+    hot_wav = Recording.objects.filter(storage_tier='hot', format__in=TIER_SOURCES['warm'])
+    in_flight = pending_moves(hot_wav, now).aggregate(
+        count=Count('id'), size=Sum('file_size')
+    )
+    if breach and needed:
+        needed = max(0, needed - int((in_flight['size'] or 0) * FLAC_SAVING_RATIO))
+        candidates = exclude_pending_moves(
+            hot_wav.exclude(status__in=BUSY_STATUSES)
+            .exclude(pk__in=evict)
+            .order_by('created_at'),
+            now
+        )
+        if needed and getattr(settings, 'STORAGE_FLAC_AFTER_DAYS', 7):
+            transcode, saved = _take(candidates, needed, limit, FLAC_SAVING_RATIO)
+            needed = max(0, needed - saved)
+
+        # La conversion prend du temps : suppression seulement si urgent
+        if needed and (free < 0 or fc['days_until_full'] < 1):
+            ids, _ = _take(_evictable(now).exclude(pk__in=evict), needed, limit)
+            evict += ids
+
+    result = {
+        'forecast': fc,
+        'breach': breach,
+        'bytes_needed': int(needed),
+        'quota_evictions': quota_evictions,
+        'transcode_in_flight': in_flight['count'],
+        'transcode': transcode,
+        'evict': evict,
+        'dry_run': dry_run,
+    }
+    if dry_run or not (transcode or evict):
+        return result
+
+    from .tasks import cleanup_expired_files
+
+    transcode = [recording_id for recording_id, _ in schedule_moves([(i, 'warm') for i in transcode])]
+    result['transcode'] = transcode
+    if evict:
+        Recording.objects.filter(pk__in=evict).update(expires_at=now)
+        cleanup_expired_files.delay()
+
+    logger.warning(
+        f"Stockage: disque plein dans {fc['days_until_full']} jour(s), "
+        f"{len(transcode)} conversion(s) FLAC et {len(evict)} suppression(s) anticipée(s)"
+    )
+    return result
@@ -2,144 +2,235 @@
 Tâches Celery pour l'archive
 """
 from celery import shared_task
-from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
-import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# File des traitements en masse (reprocess, recompute_stale) : tout le
+# DAG y passe, derrière les traitements en direct
+BULK_QUEUE = 'bulk'
+
 
 @shared_task
-def process_recording(recording_id):
+def process_recording(recording_id, force=False, stages=None, bulk=False):
     """
     Traite un enregistrement : détection de silence, transcription, résumé
+    
+    Les étapes sont lancées sous forme de DAG (chord Celery) : les étapes
+    indépendantes s'exécutent en parallèle sur des workers différents,
+    les étapes dépendantes démarrent dès que leurs entrées existent.
+    La latence totale est celle du chemin critique.
+    
+    Les étapes dont le point de reprise est à jour ne sont pas recalculées :
+    un traitement interrompu reprend à la première étape manquante.
+    
+    Un seul traitement par enregistrement (bail) : un déclenchement reçu
+    pendant un traitement est fusionné en une relance unique, lancée à
+    la fin de celui-ci.
+    
+    Args:
+        recording_id: ID de l'enregistrement
+        force: Recalculer même les étapes à jour
+        stages: Étapes à (re)lancer (toutes par défaut)
+        bulk: Traitement de masse : toutes les tâches du DAG passent par
+              la file BULK_QUEUE au lieu des files realtime / asr / llm
     """
-    from .models import Recording, BlankAlert
-    from apps.recorder.services import detect_silence_ffmpeg
-    from apps.ai.whisper_service import transcribe_file
-    from apps.ai.mistral_service import summarize_text, analyze_blank_context
+    from celery import chain, chord, group
+    from .models import Recording
+    from .lease import acquire_lease, get_queued_lease_ttl, heartbeat
+    from .pipeline import select_stages, selected_branches, mark_stages_pending
+    
+    stages = select_stages(stages)
+    
+    if not Recording.objects.filter(pk=recording_id).exists():
+        logger.error(f"Enregistrement {recording_id} introuvable")
+        return
+    
+    token = acquire_lease(recording_id, force=force, stages=stages)
+    if token is None:
+        return
     
+    Recording.objects.filter(pk=recording_id).update(status='processing')
+    
+    logger.info(f"Traitement de l'enregistrement {recording_id} (étapes: {', '.join(stages)})")
+    
+    mark_stages_pending(recording_id, stages)
+    
+    # Les étapes peuvent attendre longtemps en file (asr / llm chargées)
+    heartbeat(recording_id, token, ttl=get_queued_lease_ttl())
+    
+    def signature(task, *args):
+        sig = task.si(*args)
+        return sig.set(queue=BULK_QUEUE) if bulk else sig
+    
+    workflow = chord(
+        group(*[
+            chain(*[signature(STAGE_TASKS[name], recording_id, force, token) for name in branch])
+            for branch in selected_branches(stages)
+        ]),
+        signature(finalize_recording, recording_id, token)
+    )
+    workflow.apply_async()
+
+
+def enqueue_bulk(recording_id, force=False, stages=None):
+    """Met un traitement de masse en file (BULK_QUEUE, DAG compris)"""
+    process_recording.apply_async(
+        (recording_id,),
+        {'force': force, 'stages': stages, 'bulk': True},
+        queue=BULK_QUEUE
+    )
+
+
+def _run_stage(task, recording_id, name, force, token):
+    """
+    Exécute une étape du DAG puis prolonge le bail pour les étapes
+    suivantes, qui attendent peut-être encore en file
+    
+    Une étape reportée (captures sous pression) est reprogrammée dans
+    CAPTURE_PRESSURE_RETRY_DELAY secondes, sans occuper le worker ; après
+    CAPTURE_PRESSURE_MAX_WAIT secondes de report, elle s'exécute sans
+    régulation.
+    """
+    from .lease import get_queued_lease_ttl, heartbeat
+    from .pipeline import run_stage
+    from apps.recorder.monitoring import queue_wait
+    
+    delay = getattr(settings, 'CAPTURE_PRESSURE_RETRY_DELAY', 30)
+    deferred = task.request.retries * delay
     try:
-        recording = Recording.objects.get(pk=recording_id)
-        recording.status = 'processing'
-        recording.save()
-        
-        logger.info(f"Traitement de l'enregistrement {recording_id}")
-        
-        # 1. Détection de silence
-        silences = detect_silence_ffmpeg(recording.filepath)
-        recording.blank_analysis = {
-            'silences': [
-                {'start': s[0], 'end': s[1], 'duration': s[1] - s[0]}
-                for s in silences
-            ],
-            'count': len(silences)
-        }
-        
-        # 2. Analyser les blancs suspects
-        suspicious_threshold = getattr(
-            settings,
-            'SUSPICIOUS_SILENCE_DURATION',
-            5.0
+        result = run_stage(
+            recording_id, name, force, token, queue_wait(task.request),
+            capture_throttle=deferred < getattr(settings, 'CAPTURE_PRESSURE_MAX_WAIT', 900),
+            capture_wait=deferred
         )
-        
-        for start, end in silences:
-            duration = end - start
-            if duration > suspicious_threshold:
-                # Créer une alerte
-                alert = BlankAlert.objects.create(
-                    recording=recording,
-                    start_time=start,
-                    end_time=end,
-                    duration=duration,
-                    severity='warning' if duration < 10 else 'critical'
-                )
-                
-                recording.flagged_blank = True
-                
-                # Analyser avec IA si transcription disponible
-                # (on le fera après la transcription)
-        
-        recording.save()
-        
-        # 3. Transcription
-        logger.info(f"Transcription de {recording.filename}")
-        transcript = transcribe_file(recording.filepath)
-        recording.transcript = transcript
-        recording.save()
-        
-        # 4. Analyser les blancs avec contexte
-        if recording.blank_alerts.exists():
-            for alert in recording.blank_alerts.filter(ai_confidence__isnull=True):
-                analysis = analyze_blank_context(
-                    recording,
-                    alert.start_time,
-                    alert.end_time
-                )
-                alert.is_natural = analysis.get('is_natural', False)
-                alert.ai_confidence = analysis.get('confidence', 0.5)
-                alert.ai_explanation = analysis.get('explanation', '')
-                alert.save()
-                
-                # Envoyer notification si suspect
-                if not alert.is_natural and not alert.notified:
-                    send_blank_notification(recording, alert)
-                    alert.notified = True
-                    alert.save()
-        
-        # 5. Résumé
-        if transcript:
-            logger.info(f"Génération du résumé pour {recording.filename}")
-            summary = summarize_text(transcript)
-            recording.summary = summary
-        
-        # 6. Extraire métadonnées audio
-        from apps.recorder.services import get_audio_metadata
-        metadata = get_audio_metadata(recording.filepath)
-        recording.duration = metadata.get('duration')
-        recording.sample_rate = metadata.get('sample_rate')
-        recording.file_size = metadata.get('file_size')
-        
-        recording.status = 'completed'
-        recording.save()
-        
-        logger.info(f"Traitement terminé pour {recording_id}")
-        
-    except Exception as e:
-        logger.error(f"Erreur lors du traitement de {recording_id}: {str(e)}")
-        try:
-            recording = Recording.objects.get(pk=recording_id)
-            recording.status = 'error'
-            recording.save()
-        except:
-            pass
+    finally:
+        if token:
+            heartbeat(recording_id, token, ttl=get_queued_lease_ttl())
+    if result == 'deferred':
+        raise task.retry(countdown=delay, max_retries=None)
+    return result
+
+
+@shared_task(bind=True)
+def stage_metadata(self, recording_id, force=False, token=None):
+    """Étape : métadonnées audio (ffprobe)"""
+    return _run_stage(self, recording_id, 'metadata', force, token)
+
+
+@shared_task(bind=True)
+def stage_silence(self, recording_id, force=False, token=None):
+    """Étape : détection de silence"""
+    return _run_stage(self, recording_id, 'silence', force, token)
+
+
+@shared_task(bind=True)
+def stage_blank_analysis(self, recording_id, force=False, token=None):
+    """Étape : analyse IA des blancs"""
+    return _run_stage(self, recording_id, 'blank_analysis', force, token)
+
+
+@shared_task(bind=True)
+def stage_blank_notification(self, recording_id, force=False, token=None):
+    """Étape : notification des blancs suspects"""
+    return _run_stage(self, recording_id, 'blank_notification', force, token)
+
+
+@shared_task(bind=True)
+def stage_transcription(self, recording_id, force=False, token=None):
+    """Étape : transcription Whisper"""
+    return _run_stage(self, recording_id, 'transcription', force, token)
+
+
+@shared_task(bind=True)
+def stage_summary(self, recording_id, force=False, token=None):
+    """Étape : résumé"""
+    return _run_stage(self, recording_id, 'summary', force, token)
+
+
+STAGE_TASKS = {
+    'metadata': stage_metadata,
+    'silence': stage_silence,
+    'blank_analysis': stage_blank_analysis,
+    'blank_notification': stage_blank_notification,
+    'transcription': stage_transcription,
+    'summary': stage_summary,
+}
+
+
+@shared_task
+def finalize_recording(recording_id, token=None):
+    """Fin du DAG : statut final, libération du bail et relance éventuelle"""
+    from .lease import heartbeat, release_lease
+    from .pipeline import finalize
+    
+    if token and not heartbeat(recording_id, token):
+        # Un autre traitement a repris le bail : c'est lui qui finalise
+        # (et lance la relance éventuelle)
+        logger.warning(f"Traitement de {recording_id} supplanté, finalisation ignorée")
+        return 'superseded'
+    
+    status = finalize(recording_id)
+    
+    rerun = release_lease(recording_id, token) if token else None
+    if rerun:
+        logger.info(f"Relance du traitement de {recording_id} demandée pendant son exécution")
+        process_recording.delay(recording_id, **rerun)
+    
+    return status
 
 
 @shared_task
 def cleanup_expired_files():
     """
-    Nettoie les fichiers expirés
+    Nettoie les fichiers expirés (par lots, en temps borné)
+    
+    Si le temps imparti ne suffit pas (retard accumulé), un nouveau
+    passage est programmé pour continuer.
     """
-    from .models import Recording
+    from .expiry import purge_expired
+    
+    result = purge_expired()
+    if not result['complete']:
+        cleanup_expired_files.apply_async(
+            countdown=getattr(settings, 'EXPIRY_CONTINUE_DELAY', 60)
+        )
+    return result
+
+
+@shared_task
+def apply_storage_lifecycle():
+    """
+    Planifie les changements de niveau de stockage selon l'âge
+    (WAV -> FLAC -> Opus), une conversion par tâche
+    """
+    from .lifecycle import plan_transitions, schedule_moves
+    
+    plans = schedule_moves(plan_transitions(limit=getattr(settings, 'STORAGE_LIFECYCLE_BATCH', 200)))
+    
+    logger.info(f"{len(plans)} conversion(s) de stockage planifiée(s)")
+    return {'scheduled': len(plans)}
+
+
+@shared_task
+def move_recording_to_tier(recording_id, tier, token=None):
+    """
+    Convertit un enregistrement vers un niveau de stockage (vérifié)
+    """
+    from .lifecycle import move_to_tier
+    return move_to_tier(recording_id, tier, token)
+
+
+@shared_task
+def evict_hls_cache():
+    """
+    Purge le cache des segments HLS (entrées anciennes, taille)
+    """
+    from .hls import evict_hls_cache as evict
     
-    now = timezone.now()
-    expired = Recording.objects.filter(expires_at__lt=now)
-    
-    count = 0
-    for recording in expired:
-        try:
-            if os.path.exists(recording.filepath):
-                os.remove(recording.filepath)
-                logger.info(f"Fichier supprimé: {recording.filepath}")
-            recording.delete()
-            count += 1
-        except Exception as e:
-            logger.error(f"Erreur lors de la suppression de {recording.id}: {str(e)}")
-    
-    logger.info(f"{count} enregistrement(s) expiré(s) supprimé(s)")
-    return count
+    return evict()
 
 
 def send_blank_notification(recording, alert):
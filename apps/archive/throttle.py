@@ -0,0 +1,102 @@
+"""
+Limitation du débit de mise en file pour les traitements en masse
+
+- Débit maximum (enregistrements par minute)
+- Contre-pression : attente tant que la file de masse du broker
+  (BULK_QUEUE, servie par son propre pool) dépasse une profondeur donnée :
+  les workers de masse ne sont jamais submergés et les files realtime /
+  asr / llm restent aux traitements en direct
+- Captures en direct : attente tant qu'une capture est sous pression
+  (voir apps.recorder.contention)
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class EnqueueThrottle:
+    """
+    Usage:
+        throttle = EnqueueThrottle(rate=60, max_queue_depth=200)
+        for recording in recordings:
+            throttle.wait()
+            enqueue_bulk(recording.id)
+    """
+
+    def __init__(self, rate=0, max_queue_depth=0, queues=None, poll_interval=5.0, on_wait=None,
+                 on_capture_wait=None):
+        self.interval = 60.0 / rate if rate and rate > 0 else 0.0
+        self.max_queue_depth = max_queue_depth
+        if queues is None:
+            from .tasks import BULK_QUEUE
+            queues = [BULK_QUEUE]
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.on_wait = on_wait
+        self.on_capture_wait = on_capture_wait
+        self._next_slot = time.monotonic()
+        self._depth_checked_at = 0.0
+        self._captures_checked_at = 0.0
+        self._backpressure_available = True
+        self.waited = 0.0
+
+    def queue_depth(self):
+        """
+        Profondeur totale des files surveillées (None si indisponible)
+        """
+        from apps.recorder.monitoring import get_queue_metrics
+
+        metrics = get_queue_metrics(self.queues)
+        if 'error' in metrics:
+            return None
+        return sum(m['depth'] for m in metrics.values())
+
+    def _wait_for_queues(self):
+        if not self.max_queue_depth or not self._backpressure_available:
+            return
+
+        # Une lecture Redis par seconde au plus
+        now = time.monotonic()
+        if now - self._depth_checked_at < 1.0:
+            return
+        self._depth_checked_at = now
+
+        while True:
+            depth = self.queue_depth()
+            if depth is None:
+                logger.warning("Profondeur des files indisponible : limitation au seul débit")
+                self._backpressure_available = False
+                return
+            if depth <= self.max_queue_depth:
+                return
+            if self.on_wait:
+                self.on_wait(depth)
+            time.sleep(self.poll_interval)
+            self.waited += self.poll_interval
+            self._depth_checked_at = time.monotonic()
+
+    def _wait_for_captures(self):
+        from apps.recorder.contention import wait_for_capture_headroom
+
+        # Une lecture de la télémétrie par intervalle de scrutation au plus
+        now = time.monotonic()
+        if now - self._captures_checked_at < self.poll_interval:
+            return
+        self._captures_checked_at = now
+
+        self.waited += wait_for_capture_headroom(
+            max_wait=float('inf'),
+            poll_interval=self.poll_interval,
+            on_wait=self.on_capture_wait
+        )
+
+    def wait(self):
+        """Attend le prochain créneau de mise en file"""
+        now = time.monotonic()
+        if self._next_slot > now:
+            time.sleep(self._next_slot - now)
+            self.waited += self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+
+        self._wait_for_queues()
+        self._wait_for_captures()
@@ -0,0 +1,220 @@
+"""
+Chronologie des stations : heure réelle -> fichiers et positions
+
+"14:03-14:11 sur la station X le 3 mars" sans chercher l'enregistrement
+à la main :
+
+- chaque enregistrement terminé est décrit par des TimelineSegment
+  (station, début, fin, position dans le fichier) d'au plus
+  TIMELINE_SEGMENT_MAX_HOURS heures, créés par l'étape metadata
+- un intervalle se résout par une lecture d'index (station, starts_at)
+  bornée à [début - TIMELINE_SEGMENT_MAX_HOURS, fin[ : quelques
+  millisecondes quelle que soit la profondeur de l'archive
+- les extraits de chaque fichier (voir clips.py) sont assemblés par le
+  démultiplexeur concat de FFmpeg en copie de flux si tous les morceaux
+  ont le même format, sinon par le filtre concat (rééchantillonnés vers
+  une disposition commune) en FLAC
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from pathlib import Path
+import hashlib
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def get_segment_max():
+    return timedelta(hours=getattr(settings, 'TIMELINE_SEGMENT_MAX_HOURS', 6))
+
+
+def sync_recording(recording):
+    """
+    (Re)crée les segments d'un enregistrement
+
+    Sans durée, heure de début ou en erreur, l'enregistrement n'apparaît
+    pas dans la chronologie.
+
+    Returns:
+        int: Nombre de segments
+    """
+    from .models import TimelineSegment
+
+    step = get_segment_max().total_seconds()
+    start = recording.wall_clock_start
+    rows = []
+    if recording.duration and start and recording.status != 'error':
+        offset = 0.0
+        while offset < recording.duration:
+            length = min(step, recording.duration - offset)
+            rows.append(TimelineSegment(
+                station=recording.station or '',
+                recording=recording,
+                starts_at=start + timedelta(seconds=offset),
+                ends_at=start + timedelta(seconds=offset + length),
+                offset=offset
+            ))
+            offset += length
+
+    with transaction.atomic():
+        TimelineSegment.objects.filter(recording=recording).delete()
+        TimelineSegment.objects.bulk_create(rows)
+    return len(rows)
+
+
+def resolve(station, start, end):
+    """
+    Morceaux d'enregistrements couvrant un intervalle
+
+    Quand deux enregistrements se recouvrent, celui qui commence le
+    premier est utilisé jusqu'à sa fin.
+
+    Args:
+        station: Station
+        start: Début (datetime)
+        end: Fin (datetime)
+
+    Returns:
+        dict: {
+            'pieces': [{'recording', 'start', 'end' (secondes dans le
+                       fichier), 'starts_at', 'ends_at'}],
+            'gaps': [(début, fin)] (intervalles sans enregistrement)
+        }
+    """
+    from .models import TimelineSegment
+
+    segments = (
+        TimelineSegment.objects.filter(
+            station=station,
+            starts_at__gte=start - get_segment_max(),
+            starts_at__lt=end,
+            ends_at__gt=start
+        )
+        .select_related('recording')
+        .order_by('starts_at', 'recording_id')
+    )
+
+    pieces, gaps = [], []
+    cursor = start
+    for segment in segments:
+        if segment.ends_at <= cursor:
+            continue
+        piece_start = max(segment.starts_at, cursor)
+        piece_end = min(segment.ends_at, end)
+        if piece_start > cursor:
+            gaps.append((cursor, piece_start))
+
+        file_start = segment.offset + (piece_start - segment.starts_at).total_seconds()
+        file_end = segment.offset + (piece_end - segment.starts_at).total_seconds()
+        previous = pieces[-1] if pieces else None
+        if previous and previous['recording'].pk == segment.recording_id and previous['ends_at'] == piece_start:
+            # Segments consécutifs du même fichier : un seul morceau
+            previous['end'] = file_end
+            previous['ends_at'] = piece_end
+        else:
+            pieces.append({
+                'recording': segment.recording,
+                'start': file_start,
+                'end': file_end,
+                'starts_at': piece_start,
+                'ends_at': piece_end,
+            })
+        cursor = piece_end
+        if cursor >= end:
+            break
+
+    if cursor < end:
+        gaps.append((cursor, end))
+    return {'pieces': pieces, 'gaps': gaps}
+
+
+def _concat_entry(path):
+    """Ligne de liste du démultiplexeur concat (apostrophes échappées)"""
+    return "file '" + str(path).replace("'", "'\\''") + "'\n"
+
+
+def _concat_filter(count, sample_rate, channels):
+    """
+    Filtre concat de `count` entrées ramenées à la même disposition
+    (fréquence, canaux, format d'échantillon), seule façon d'assembler
+    des formats ou fréquences différents
+    """
+    layout = 'mono' if channels == 1 else 'stereo'
+    normalized = ''.join(
+        f"[{i}:a:0]aresample={sample_rate},"
+        f"aformat=sample_fmts=s16:sample_rates={sample_rate}:channel_layouts={layout}[a{i}];"
+        for i in range(count)
+    )
+    inputs = ''.join(f"[a{i}]" for i in range(count))
+    return f"{normalized}{inputs}concat=n={count}:v=0:a=1[out]"
+
+
+def stitch(pieces):
+    """
+    Fichier audio des morceaux mis bout à bout (mis en cache)
+
+    Returns:
+        Path: Fichier assemblé
+
+    Raises:
+        FileNotFoundError: Si un fichier source n'existe pas
+        subprocess.CalledProcessError: Si FFmpeg échoue
+    """
+    from apps.recorder.services import CLIP_MUXERS
+    from .clips import cached_file, get_clip, get_clip_cache_dir
+
+    clips = [get_clip(p['recording'], p['start'], p['end']) for p in pieces]
+    if len(clips) == 1:
+        return clips[0]
+
+    layouts = {
+        (p['recording'].format, p['recording'].sample_rate, p['recording'].channels)
+        for p in pieces
+    }
+    stream_copy = len(layouts) == 1
+    suffix = clips[0].suffix if stream_copy else '.flac'
+    fmt = suffix.lstrip('.') if stream_copy else 'flac'
+
+    method = 'copy' if stream_copy else 'filter'
+    key = hashlib.sha256(
+        '\0'.join([method] + [path.name for path in clips]).encode('utf-8')
+    ).hexdigest()[:32]
+    out_path = get_clip_cache_dir() / f"{key}{suffix}"
+
+    def produce(tmp_path):
+        list_path = Path(f"{tmp_path}.txt")
+        cmd = [settings.FFMPEG_PATH, '-nostdin', '-y', '-v', 'error']
+        if stream_copy:
+            list_path.write_text(''.join(_concat_entry(path) for path in clips), encoding='utf-8')
+            cmd += [
+                '-f', 'concat', '-safe', '0',
+                '-i', str(list_path),
+                '-map', '0:a:0',
+                '-c:a', 'copy',
+            ]
+        else:
+            # Le démultiplexeur concat exige des entrées de même codec et
+            # de mêmes paramètres : filtre concat, sortie FLAC
+            for path in clips:
+                cmd += ['-i', str(path)]
+            cmd += [
+                '-filter_complex', _concat_filter(
+                    len(clips),
+                    max(p['recording'].sample_rate or 0 for p in pieces) or 44100,
+                    max(p['recording'].channels or 0 for p in pieces) or 2
+                ),
+                '-map', '[out]',
+                '-c:a', 'flac',
+            ]
+        if CLIP_MUXERS.get(fmt):
+            cmd += ['-f', CLIP_MUXERS[fmt]]
+        cmd.append(str(tmp_path))
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        finally:
+            list_path.unlink(missing_ok=True)
+        logger.info(f"Chronologie: {len(clips)} morceau(x) assemblé(s) ({'copie' if stream_copy else 'FLAC'})")
+
+    return cached_file(out_path, produce)
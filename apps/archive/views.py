@@ -6,10 +6,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-import os
+from django.utils.cache import patch_cache_control
 
+from .delivery import serve_file
 from .models import Recording, BlankAlert
 from .serializers import (
     RecordingSerializer,
@@ -23,10 +25,10 @@ class RecordingViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour la gestion des enregistrements
     """
-    queryset = Recording.objects.all().select_related('owner').prefetch_related('blank_alerts')
+    queryset = Recording.objects.all().select_related('owner').prefetch_related('blank_alerts', 'stages')
     permission_classes = []  # Pas d'authentification requise
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'format', 'flagged_blank', 'owner']
+    filterset_fields = ['status', 'station', 'format', 'flagged_blank', 'owner']
     search_fields = ['title', 'filename', 'transcript', 'summary', 'notes']
     ordering_fields = ['created_at', 'duration', 'title']
     ordering = ['-created_at']
@@ -44,28 +46,251 @@ class RecordingViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
-        """Télécharge le fichier audio"""
+        """
+        Télécharge le fichier audio
+        
+        Prend en charge Range (206), If-None-Match / If-Modified-Since (304)
+        et la délégation de l'envoi au proxy (DOWNLOAD_OFFLOAD).
+        """
+        recording = self.get_object()
+        try:
+            return serve_file(request, recording.filepath, recording.filename, recording.checksum)
+        except FileNotFoundError:
+            return Response(
+                {'error': 'Fichier non trouvé'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    @action(detail=True, methods=['get'])
+    def clip(self, request, pk=None):
+        """
+        Extrait d'un enregistrement
+        
+        Query params:
+        - start, end: secondes depuis le début, ou date ISO 8601 (heure réelle)
+        - inline: 1 pour lecture dans le navigateur plutôt que téléchargement
+        """
+        from .clips import clip_filename, get_clip, resolve_clip_bounds
+        
         recording = self.get_object()
-        if not os.path.exists(recording.filepath):
+        try:
+            start, end = resolve_clip_bounds(
+                recording, request.query_params.get('start'), request.query_params.get('end')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            path = get_clip(recording, start, end)
+        except FileNotFoundError:
             return Response(
                 {'error': 'Fichier non trouvé'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        return FileResponse(
-            open(recording.filepath, 'rb'),
-            as_attachment=True,
-            filename=recording.filename
+        except Exception as e:
+            return Response(
+                {'error': f"Erreur lors de l'extraction: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        response = serve_file(
+            request, path, clip_filename(recording, start, end),
+            as_attachment=request.query_params.get('inline') != '1'
         )
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'CLIP_HTTP_MAX_AGE', 86400))
+        return response
+    
+    def _timeline_query(self, request, max_duration=None):
+        """
+        Station et intervalle d'heure réelle des paramètres de requête
+        
+        Args:
+            max_duration: Longueur maximale en secondes (CLIP_MAX_DURATION)
+        
+        Raises:
+            ValueError: Si un paramètre manque ou si l'intervalle est invalide
+        """
+        from django.utils import timezone
+        from django.utils.dateparse import parse_datetime
+        
+        station = request.query_params.get('station')
+        bounds = [parse_datetime(request.query_params.get(name) or '') for name in ('start', 'end')]
+        if not station or None in bounds:
+            raise ValueError('Les paramètres station, start et end (ISO 8601) sont requis')
+        start, end = [timezone.make_aware(b) if timezone.is_naive(b) else b for b in bounds]
+        max_duration = max_duration or getattr(settings, 'CLIP_MAX_DURATION', 4 * 3600)
+        if end <= start or (end - start).total_seconds() > max_duration:
+            raise ValueError(f'Intervalle invalide (maximum {max_duration}s)')
+        return station, start, end
+    
+    @action(detail=False, methods=['get'])
+    def timeline(self, request):
+        """
+        Audio d'une station sur un intervalle d'heure réelle, assemblé à
+        partir des enregistrements qui le couvrent
+        
+        Query params:
+        - station: Station
+        - start, end: dates ISO 8601 (heure locale si sans fuseau)
+        - resolve: 1 pour obtenir les morceaux et les trous en JSON
+        """
+        from django.utils import timezone
+        from .timeline import resolve, stitch
+        
+        try:
+            station, start, end = self._timeline_query(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resolution = resolve(station, start, end)
+        pieces, gaps = resolution['pieces'], resolution['gaps']
+        
+        if request.query_params.get('resolve') == '1':
+            return Response({
+                'station': station,
+                'start': start,
+                'end': end,
+                'pieces': [
+                    {
+                        'recording': p['recording'].pk,
+                        'starts_at': p['starts_at'],
+                        'ends_at': p['ends_at'],
+                        'start': p['start'],
+                        'end': p['end'],
+                        'storage_tier': p['recording'].storage_tier,
+                    }
+                    for p in pieces
+                ],
+                'gaps': [{'start': a, 'end': b} for a, b in gaps],
+            })
+        
+        if not pieces:
+            return Response(
+                {'error': 'Aucun enregistrement sur cet intervalle'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            path = stitch(pieces)
+        except FileNotFoundError:
+            return Response(
+                {'error': 'Fichier non trouvé'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {'error': f"Erreur lors de l'assemblage: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        local_start = timezone.localtime(start)
+        filename = f"{station}_{local_start:%Y%m%d_%H%M%S}-{timezone.localtime(end):%H%M%S}{path.suffix}"
+        response = serve_file(request, path, filename, as_attachment=request.query_params.get('inline') != '1')
+        response['X-Timeline-Gaps'] = str(len(gaps))
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'CLIP_HTTP_MAX_AGE', 86400))
+        return response
+    
+    def _hls_playlist(self, parts):
+        from django.urls import reverse
+        from .hls import HLS_CONTENT_TYPE, build_playlist
+        
+        # Un seul reverse() par enregistrement : 14 400 segments pour 24 h
+        templates = {}
+        
+        def segment_url(recording, first_ms, last_ms):
+            if recording.pk not in templates:
+                url = reverse('recording-hls-segment', kwargs={'pk': recording.pk, 'segment': '0-0'})
+                templates[recording.pk] = url.replace('/0-0.ts', '/{}-{}.ts')
+            return templates[recording.pk].format(first_ms, last_ms)
+        
+        response = HttpResponse(build_playlist(parts, segment_url), content_type=HLS_CONTENT_TYPE)
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'CLIP_HTTP_MAX_AGE', 86400))
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def hls(self, request, pk=None):
+        """Liste de lecture HLS d'un enregistrement (lecture dans le navigateur)"""
+        recording = self.get_object()
+        if not recording.duration:
+            return Response(
+                {'error': 'Durée inconnue (enregistrement en cours ou non traité)'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return self._hls_playlist([(recording, 0.0, recording.duration)])
+    
+    @action(detail=True, methods=['get'], url_path=r'hls/(?P<segment>\d+-\d+)\.ts', url_name='hls-segment')
+    def hls_segment(self, request, pk=None, segment=None):
+        """Segment HLS, produit à la première demande puis servi depuis le cache"""
+        from .hls import HLS_SEGMENT_CONTENT_TYPE, get_segment
+        
+        recording = self.get_object()
+        first_ms, last_ms = (int(value) for value in segment.split('-'))
+        try:
+            path = get_segment(recording, first_ms, last_ms)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError:
+            return Response(
+                {'error': 'Fichier non trouvé'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {'error': f"Erreur lors de l'encodage: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        response = serve_file(request, path, f'{segment}.ts', as_attachment=False, content_type=HLS_SEGMENT_CONTENT_TYPE)
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'CLIP_HTTP_MAX_AGE', 86400))
+        return response
+    
+    @action(detail=False, methods=['get'], url_path='timeline/hls', url_name='timeline-hls')
+    def timeline_hls(self, request):
+        """Liste de lecture HLS d'une station sur un intervalle d'heure réelle"""
+        from .hls import HLS_MAX_RANGE
+        from .timeline import resolve
+        
+        try:
+            station, start, end = self._timeline_query(request, HLS_MAX_RANGE)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        pieces = resolve(station, start, end)['pieces']
+        if not pieces:
+            return Response(
+                {'error': 'Aucun enregistrement sur cet intervalle'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return self._hls_playlist([(p['recording'], p['start'], p['end']) for p in pieces])
     
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
-        """Déclenche le traitement manuel d'un enregistrement"""
+        """
+        Déclenche le traitement manuel d'un enregistrement
+        
+        Paramètres optionnels :
+        - force : recalculer les étapes même si leur point de reprise est à jour
+        - stages : liste des étapes à relancer (toutes par défaut)
+        """
         from apps.archive.tasks import process_recording
+        from apps.archive.pipeline import select_stages
         recording = self.get_object()
-        recording.status = 'processing'
-        recording.save()
-        process_recording.delay(recording.id)
-        return Response({'status': 'Traitement lancé'})
+        
+        force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes', 'on')
+        stages = request.data.get('stages') or None
+        if isinstance(stages, str):
+            stages = [s.strip() for s in stages.split(',') if s.strip()]
+        try:
+            stages = select_stages(stages)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        Recording.objects.filter(pk=recording.pk).update(status='processing')
+        process_recording.delay(recording.id, force=force, stages=stages)
+        return Response({
+            'status': 'Traitement lancé',
+            'force': force,
+            'stages': stages
+        })
     
     @action(detail=True, methods=['post'])
     def extend_retention(self, request, pk=None):
@@ -85,6 +310,7 @@ class RecordingViewSet(viewsets.ModelViewSet):
     def statistics(self, request):
         """Retourne des statistiques sur les enregistrements"""
         from django.db.models import Count, Sum, Avg
+        from .lease import get_lease_stats
         
         stats = {
             'total_recordings': Recording.objects.count(),
@@ -102,9 +328,35 @@ class RecordingViewSet(viewsets.ModelViewSet):
             'total_size': Recording.objects.aggregate(
                 total=Sum('file_size')
             )['total'] or 0,
+            'by_storage_tier': {
+                row['storage_tier']: {'count': row['count'], 'size': row['size'] or 0}
+                for row in Recording.objects.values('storage_tier').annotate(
+                    count=Count('id'), size=Sum('file_size')
+                )
+            },
+            'processing': get_lease_stats(),
         }
         return Response(stats)
 
+    @action(detail=False, methods=['get'])
+    def storage(self, request):
+        """Occupation du stockage par station / propriétaire et prévision de remplissage"""
+        from .storage import forecast, get_quotas, get_usage
+        
+        usage = get_usage()
+        quotas = get_quotas()
+        return Response({
+            'usage': usage,
+            'quotas': {
+                station: {
+                    'quota': quota,
+                    'used': usage['stations'].get(station, {}).get('bytes', 0),
+                }
+                for station, quota in quotas.items()
+            },
+            'forecast': forecast(),
+        })
+
 
 class BlankAlertViewSet(viewsets.ReadOnlyModelViewSet):
     """
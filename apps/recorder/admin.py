@@ -8,22 +8,26 @@ from .models import RecordingJob
 @admin.register(RecordingJob)
 class RecordingJobAdmin(admin.ModelAdmin):
     list_display = [
-        'id', 'status', 'format', 'source_url',
+        'id', 'status', 'station', 'format', 'source_url',
         'created_at', 'started_at', 'process_id'
     ]
     list_filter = ['status', 'format', 'created_at']
     search_fields = ['source_url', 'output_path']
     readonly_fields = [
-        'created_at', 'started_at', 'completed_at', 'process_id'
+        'created_at', 'started_at', 'completed_at', 'process_id',
+        'capture_speed', 'underruns', 'last_underrun_at', 'telemetry_at'
     ]
     
     fieldsets = (
         ('Configuration', {
-            'fields': ('source_url', 'output_path', 'format', 'quality', 'duration')
+            'fields': ('source_url', 'station', 'output_path', 'format', 'quality', 'duration')
         }),
         ('Statut', {
             'fields': ('status', 'process_id', 'error_message')
         }),
+        ('Télémétrie', {
+            'fields': ('capture_speed', 'underruns', 'last_underrun_at', 'telemetry_at')
+        }),
         ('Dates', {
             'fields': ('created_at', 'started_at', 'completed_at')
         }),
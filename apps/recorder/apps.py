@@ -6,3 +6,7 @@ class RecorderConfig(AppConfig):
     name = 'apps.recorder'
     verbose_name = 'Enregistreur'
 
+    def ready(self):
+        # Signaux Celery de mesure des files et de priorité des workers
+        from . import contention, monitoring  # noqa: F401
+
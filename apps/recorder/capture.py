@@ -0,0 +1,235 @@
+"""
+Supervision des captures FFmpeg
+
+Chaque capture tourne sous un superviseur (commande run_capture) qui
+attend la fin de FFmpeg, fixe le statut du job et déclenche aussitôt
+le traitement de l'enregistrement : plus de traitement programmé
+"au jugé" ni de dépendance aux endpoints de vérification.
+
+Le PID enregistré sur le job est celui du superviseur : le SIGTERM
+envoyé par l'arrêt d'un job est transmis à FFmpeg, qui finalise le
+fichier avant de sortir.
+
+Le superviseur publie aussi la télémétrie de la capture (vitesse FFmpeg
+récente, sous-débits signalés), utilisée pour ralentir le traitement en
+arrière-plan quand la capture prend du retard (voir contention.py).
+"""
+from collections import deque
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .services import build_record_command
+
+logger = logging.getLogger(__name__)
+
+
+def spawn_capture(job):
+    """
+    Lance le superviseur de capture d'un job en arrière-plan
+
+    Args:
+        job: RecordingJob à enregistrer
+
+    Returns:
+        subprocess.Popen: Le processus superviseur
+    """
+    cmd = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'run_capture', str(job.id)]
+    logger.info(f"Démarrage du superviseur de capture du job {job.id}")
+
+    # Nouvelle session : le superviseur survit au redémarrage du worker web
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, start_new_session=True)
+
+    # Récupérer le code de sortie pour ne pas laisser de processus zombie
+    threading.Thread(target=proc.wait, daemon=True).start()
+    return proc
+
+
+# Ligne de statistiques FFmpeg : "size=  1024kB time=00:00:05.94 bitrate=... speed=1.01x"
+STATS_RE = re.compile(r'time=\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+# Pertes d'audio signalées par FFmpeg (entrée en retard, tampon plein ou vide)
+UNDERRUN_RE = re.compile(r'xrun|underrun|overrun|underflow|buffer (?:full|empty)|drop', re.IGNORECASE)
+
+
+class CaptureTelemetry:
+    """
+    Télémétrie d'une capture d'après la sortie d'erreur de FFmpeg
+
+    La vitesse est mesurée sur la dernière période (temps audio capturé /
+    temps écoulé) : une capture en direct tourne à 1.0x, une vitesse
+    inférieure signifie que FFmpeg n'arrive plus à suivre (CPU ou
+    écritures disque saturés).
+    """
+
+    def __init__(self, job_id, interval=None):
+        self.job_id = job_id
+        self.interval = interval or getattr(settings, 'CAPTURE_TELEMETRY_INTERVAL', 10)
+        self.sample = None  # (instant, temps audio) de la dernière publication
+        self.position = None
+        self.underruns = 0
+        self.last_underrun_at = None
+        self.pending = False
+
+    def feed(self, line):
+        """
+        Analyse une ligne de FFmpeg
+
+        Returns:
+            bool: True si la ligne est une ligne de statistiques
+        """
+        match = STATS_RE.search(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            self.position = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            self.pending = True
+            self.flush()
+            return True
+
+        if UNDERRUN_RE.search(line):
+            self.underruns += 1
+            self.last_underrun_at = timezone.now()
+            self.pending = True
+            logger.warning(f"Capture du job {self.job_id}: {line}")
+            self.flush(force=True)
+        return False
+
+    def flush(self, force=False):
+        """Publie la télémétrie sur le job (au plus une fois par intervalle)"""
+        from .models import RecordingJob
+
+        now = time.monotonic()
+        if self.position is None or not self.pending:
+            return
+        if self.sample is None:
+            self.sample = (now, self.position)
+            return
+        elapsed = now - self.sample[0]
+        if elapsed < self.interval and not force:
+            return
+
+        fields = {
+            'underruns': self.underruns,
+            'last_underrun_at': self.last_underrun_at,
+            'telemetry_at': timezone.now(),
+        }
+        if elapsed >= self.interval:
+            fields['capture_speed'] = round((self.position - self.sample[1]) / elapsed, 3)
+            self.sample = (now, self.position)
+        try:
+            RecordingJob.objects.filter(pk=self.job_id).update(**fields)
+        except Exception as e:
+            logger.warning(f"Télémétrie du job {self.job_id} non publiée: {str(e)}")
+        self.pending = False
+
+
+class CaptureSupervisor:
+    """
+    Exécute la capture FFmpeg d'un job et publie sa fin
+    """
+    STDERR_TAIL = 20
+
+    def __init__(self, job):
+        self.job = job
+        self.proc = None
+        self.stopped = False
+
+    def _forward_signal(self, signum, frame):
+        self.stopped = True
+        if self.proc is not None and self.proc.poll() is None:
+            logger.info(f"Signal {signum} transmis à FFmpeg (job {self.job.id})")
+            self.proc.send_signal(signum)
+
+    def run(self):
+        """
+        Exécute FFmpeg jusqu'à sa sortie
+
+        Returns:
+            str: Statut final du job
+        """
+        job = self.job
+        Path(job.output_path).parent.mkdir(parents=True, exist_ok=True)
+        cmd = build_record_command(
+            job.source_url, job.output_path, job.format, job.quality, job.duration
+        )
+
+        signal.signal(signal.SIGTERM, self._forward_signal)
+        signal.signal(signal.SIGINT, self._forward_signal)
+
+        logger.info(f"Capture du job {job.id}: {' '.join(cmd)}")
+        tail = deque(maxlen=self.STDERR_TAIL)
+        telemetry = CaptureTelemetry(job.id)
+        try:
+            self.proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors='replace'
+            )
+            # Arrêt demandé avant le démarrage de FFmpeg
+            if self.stopped:
+                self.proc.terminate()
+
+            # Lire stderr en continu (un tube plein bloquerait FFmpeg) ;
+            # les statistiques arrivent séparées par des \r
+            for line in self.proc.stderr:
+                line = line.rstrip()
+                if line and not telemetry.feed(line):
+                    tail.append(line)
+            returncode = self.proc.wait()
+        except Exception as e:
+            logger.error(f"Erreur lors de la capture du job {job.id}: {str(e)}")
+            tail.append(str(e))
+            returncode = -1
+
+        return self.finish(returncode, '\n'.join(tail))
+
+    def finish(self, returncode, stderr_tail=''):
+        """
+        Fin de capture : statut du job, puis traitement de l'enregistrement
+        si un fichier a été produit
+
+        Returns:
+            str: Statut final du job
+        """
+        from apps.archive.models import Recording
+        from apps.archive.tasks import process_recording
+        from .models import RecordingJob
+
+        job = self.job
+        if self.stopped:
+            job_status = 'stopped'
+        elif returncode == 0:
+            job_status = 'completed'
+        else:
+            job_status = 'failed'
+
+        RecordingJob.objects.filter(pk=job.pk).update(
+            status=job_status,
+            completed_at=timezone.now(),
+            error_message=stderr_tail if job_status == 'failed' else ''
+        )
+        logger.info(f"Capture du job {job.id} terminée ({job_status}, code {returncode})")
+
+        recording = Recording.objects.filter(filepath=job.output_path).first()
+        if recording is None:
+            return job_status
+
+        has_audio = os.path.exists(job.output_path) and os.path.getsize(job.output_path) > 0
+        if has_audio:
+            Recording.objects.filter(pk=recording.pk).update(status='processing')
+            process_recording.delay(recording.id)
+        else:
+            Recording.objects.filter(pk=recording.pk).update(status='error')
+            logger.error(f"Aucun audio capturé pour le job {job.id}")
+
+        return job_status
@@ -0,0 +1,187 @@
+"""
+Protection des captures en direct contre le traitement en arrière-plan
+
+Les workers de traitement partagent l'hôte (CPU, disque) avec les
+captures FFmpeg : un rattrapage ou un nettoyage nocturne ne doit jamais
+faire perdre d'audio à la pige.
+
+- Priorité : chaque worker Celery abaisse sa priorité CPU (nice) et
+  disque (ionice) au démarrage ; ses processus, les décodages FFmpeg et
+  l'inférence Whisper en héritent
+- Régulation adaptative : les étapes lourdes s'interrompent (au
+  démarrage ou à leurs points de contrôle) et sont reprogrammées, les
+  mises en file de masse attendent, tant qu'une capture est sous
+  pression, d'après la télémétrie publiée par son superviseur (vitesse
+  FFmpeg, sous-débits)
+"""
+from celery.signals import worker_init
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from .monitoring import StageInterrupted
+
+logger = logging.getLogger(__name__)
+
+IONICE_CLASSES = {'best-effort': '2', 'idle': '3'}
+
+
+def lower_process_priority():
+    """
+    Abaisse la priorité CPU et disque du processus courant
+
+    PROCESSING_NICE : incrément de nice (0 = inchangé)
+    PROCESSING_IONICE_CLASS : 'best-effort' (niveau 7), 'idle' ou '' (inchangé)
+    """
+    increment = getattr(settings, 'PROCESSING_NICE', 10)
+    if increment:
+        try:
+            logger.info(f"Priorité CPU du worker : nice {os.nice(increment)}")
+        except OSError as e:
+            logger.warning(f"nice impossible: {str(e)}")
+
+    io_class = IONICE_CLASSES.get(getattr(settings, 'PROCESSING_IONICE_CLASS', 'best-effort'))
+    if io_class is None:
+        return
+    ionice = shutil.which('ionice')
+    if ionice is None:
+        logger.warning("ionice introuvable : priorité disque inchangée")
+        return
+
+    cmd = [ionice, '-c', io_class]
+    if io_class == '2':
+        cmd += ['-n', '7']
+    cmd += ['-p', str(os.getpid())]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        logger.info(f"Priorité disque du worker : {' '.join(cmd[1:-2])}")
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"ionice impossible: {str(e)}")
+
+
+@worker_init.connect
+def lower_worker_priority(sender=None, **kwargs):
+    """Avant la création du pool : les processus enfants héritent de la priorité"""
+    lower_process_priority()
+
+
+def is_capture_throttle_enabled():
+    return getattr(settings, 'CAPTURE_THROTTLE_ENABLED', True)
+
+
+def capture_pressure():
+    """
+    Captures en cours qui prennent du retard
+
+    Une capture est sous pression si sa vitesse FFmpeg récente est sous
+    CAPTURE_MIN_SPEED ou si un sous-débit a été signalé dans les
+    CAPTURE_PRESSURE_WINDOW dernières secondes. La télémétrie trop
+    ancienne (superviseur arrêté) est ignorée.
+
+    Returns:
+        list: [(job_id, raison)], vide si aucune capture n'est gênée
+    """
+    from .models import RecordingJob
+
+    interval = getattr(settings, 'CAPTURE_TELEMETRY_INTERVAL', 10)
+    min_speed = getattr(settings, 'CAPTURE_MIN_SPEED', 0.98)
+    window = getattr(settings, 'CAPTURE_PRESSURE_WINDOW', 60)
+    now = timezone.now()
+
+    jobs = RecordingJob.objects.filter(
+        status='running',
+        telemetry_at__gte=now - timedelta(seconds=3 * interval)
+    ).values_list('id', 'capture_speed', 'last_underrun_at')
+
+    pressure = []
+    for job_id, speed, last_underrun_at in jobs:
+        if speed is not None and speed < min_speed:
+            pressure.append((job_id, f"vitesse {speed:.2f}x"))
+        elif last_underrun_at and last_underrun_at >= now - timedelta(seconds=window):
+            pressure.append((job_id, 'sous-débit'))
+    return pressure
+
+
+class CapturePressure(StageInterrupted):
+    """Étape interrompue : une capture en direct est sous pression"""
+
+    def __init__(self, pressure):
+        self.pressure = pressure
+        super().__init__(f"Captures sous pression: {pressure}")
+
+
+class CapturePressureCheck:
+    """
+    Vérification de la pression des captures aux points de contrôle d'une
+    étape (checkpoint_hooks), au plus une requête toutes les `interval`
+    secondes (CAPTURE_TELEMETRY_INTERVAL par défaut)
+
+    Raises:
+        CapturePressure: Si une capture est sous pression
+    """
+
+    def __init__(self, interval=None):
+        if interval is None:
+            interval = getattr(settings, 'CAPTURE_TELEMETRY_INTERVAL', 10)
+        self.interval = interval
+        self._checked_at = None
+
+    def __call__(self):
+        if not is_capture_throttle_enabled():
+            return
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.interval:
+            return
+        self._checked_at = now
+        try:
+            pressure = capture_pressure()
+        except Exception as e:
+            logger.warning(f"Télémétrie des captures indisponible: {str(e)}")
+            return
+        if pressure:
+            raise CapturePressure(pressure)
+
+
+def wait_for_capture_headroom(max_wait=None, poll_interval=5.0, on_wait=None):
+    """
+    Attend que plus aucune capture ne soit sous pression
+
+    Args:
+        max_wait: Attente maximale en secondes (CAPTURE_PRESSURE_MAX_WAIT
+                  par défaut) : au-delà, le traitement reprend
+        poll_interval: Intervalle entre deux vérifications
+        on_wait: Appelé avec la liste des captures gênées à chaque pause
+
+    Returns:
+        float: Secondes attendues
+    """
+    if not is_capture_throttle_enabled():
+        return 0.0
+    if max_wait is None:
+        max_wait = getattr(settings, 'CAPTURE_PRESSURE_MAX_WAIT', 900)
+
+    started = time.monotonic()
+    while True:
+        try:
+            pressure = capture_pressure()
+        except Exception as e:
+            logger.warning(f"Télémétrie des captures indisponible: {str(e)}")
+            break
+        if not pressure:
+            break
+        waited = time.monotonic() - started
+        if waited >= max_wait:
+            logger.warning(
+                f"Captures toujours sous pression après {waited:.0f}s, reprise du traitement"
+            )
+            break
+        if on_wait:
+            on_wait(pressure)
+        time.sleep(min(poll_interval, max_wait - waited))
+
+    return time.monotonic() - started
@@ -0,0 +1,26 @@
+"""
+Superviseur d'une capture FFmpeg (lancé par l'API au démarrage d'un job)
+
+Usage:
+    python manage.py run_capture <job_id>
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.recorder.capture import CaptureSupervisor
+from apps.recorder.models import RecordingJob
+
+
+class Command(BaseCommand):
+    help = "Exécute la capture FFmpeg d'un job puis déclenche le traitement de l'enregistrement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_id', type=int, help='ID du job d\'enregistrement')
+
+    def handle(self, *args, **options):
+        try:
+            job = RecordingJob.objects.get(pk=options['job_id'])
+        except RecordingJob.DoesNotExist:
+            raise CommandError(f"Job {options['job_id']} introuvable")
+
+        job_status = CaptureSupervisor(job).run()
+        self.stdout.write(f"Job {job.id}: {job_status}")
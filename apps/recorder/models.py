@@ -24,6 +24,11 @@ class RecordingJob(models.Model):
         max_length=2048,
         verbose_name='Chemin de sortie'
     )
+    station = models.CharField(
+        max_length=128,
+        blank=True,
+        verbose_name='Station'
+    )
     format = models.CharField(
         max_length=32,
         default='wav',
@@ -69,6 +74,27 @@ class RecordingJob(models.Model):
         verbose_name='Message d\'erreur'
     )
     
+    # Télémétrie de la capture (publiée par le superviseur)
+    capture_speed = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Vitesse de capture'
+    )
+    underruns = models.IntegerField(
+        default=0,
+        verbose_name='Sous-débits'
+    )
+    last_underrun_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Dernier sous-débit le'
+    )
+    telemetry_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Télémétrie le'
+    )
+    
     class Meta:
         verbose_name = 'Job d\'enregistrement'
         verbose_name_plural = 'Jobs d\'enregistrement'
@@ -0,0 +1,297 @@
+"""
+Supervision des files Celery
+
+- Profondeur de chaque file : longueur de la liste Redis du broker
+- Latence de prise en charge : délai entre la publication d'une tâche
+  (before_task_publish, horodatage ajouté aux en-têtes) et son démarrage
+  sur un worker (task_prerun), agrégé par file dans Redis
+- Métriques du traitement (histogrammes et compteurs cumulés dans Redis,
+  partagés par tous les workers) exposées au format texte Prometheus
+- Chronométrage des phases d'une étape (appels LLM, écritures DB,
+  FFmpeg...) via timed() / collect_phases()
+- Points de contrôle des étapes longues (checkpoint()) : entre deux
+  morceaux Whisper ou pendant une passe FFmpeg, les vérifications
+  enregistrées par checkpoint_hooks() peuvent interrompre l'étape
+
+La supervision ne doit jamais faire échouer une publication ou une
+tâche : les erreurs Redis sont journalisées et ignorées.
+"""
+from celery.signals import before_task_publish, task_prerun
+from contextlib import contextmanager
+from django.conf import settings
+import contextvars
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+QUEUES = ['realtime', 'asr', 'llm', 'maintenance', 'bulk']
+
+LATENCY_KEY = 'pige:queue_latency:{queue}'
+HISTOGRAMS_KEY = 'pige:metrics:histograms'
+HISTOGRAM_KEY = 'pige:metrics:hist:{series}'
+COUNTERS_KEY = 'pige:metrics:counters'
+
+# Bornes des histogrammes (secondes, ou ratio pour le facteur temps réel)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+WAIT_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+
+METRICS = {
+    'pige_stage_duration_seconds': ('histogram', DURATION_BUCKETS, "Durée d'exécution des étapes"),
+    'pige_stage_real_time_factor': ('histogram', RTF_BUCKETS, "Temps de traitement / durée audio"),
+    'pige_stage_queue_wait_seconds': ('histogram', WAIT_BUCKETS, "Attente en file avant l'exécution d'une étape"),
+    'pige_celery_queue_wait_seconds': ('histogram', WAIT_BUCKETS, "Attente en file des tâches Celery"),
+    'pige_stage_runs_total': ('counter', None, "Exécutions des étapes par statut"),
+    'pige_stage_audio_seconds_total': ('counter', None, "Secondes d'audio traitées"),
+    'pige_stage_phase_seconds_total': ('counter', None, "Temps passé par phase (llm, db, ffmpeg, asr...)"),
+}
+
+_phase_timings = contextvars.ContextVar('phase_timings', default=None)
+_checkpoint_hooks = contextvars.ContextVar('checkpoint_hooks', default=())
+
+_redis = None
+
+
+def get_redis():
+    """Client Redis du broker (un par processus)"""
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _redis
+
+
+@before_task_publish.connect
+def record_publish_time(sender=None, headers=None, **kwargs):
+    """Horodate la publication dans les en-têtes du message"""
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+def queue_wait(request):
+    """
+    Attente en file d'une tâche (secondes), d'après l'horodatage de publication
+
+    Returns:
+        float: Attente, ou None si inconnue (exécution directe)
+    """
+    if request is None or request.is_eager:
+        return None
+    published_at = getattr(request, 'published_at', None)
+    if published_at is None:
+        published_at = (request.headers or {}).get('published_at')
+    if published_at is None:
+        return None
+    return max(0.0, time.time() - float(published_at))
+
+
+@task_prerun.connect
+def record_queue_latency(sender=None, task=None, **kwargs):
+    """Mesure l'attente en file de la tâche qui démarre"""
+    request = getattr(task, 'request', None)
+    wait = queue_wait(request)
+    if wait is None:
+        return
+
+    queue = (request.delivery_info or {}).get('routing_key') or 'celery'
+    observe('pige_celery_queue_wait_seconds', {'queue': queue}, wait)
+
+    try:
+        key = LATENCY_KEY.format(queue=queue)
+        pipe = get_redis().pipeline()
+        pipe.hincrby(key, 'count', 1)
+        pipe.hincrbyfloat(key, 'total', wait)
+        pipe.hset(key, 'last', wait)
+        pipe.hset(key, 'last_at', time.time())
+        pipe.execute()
+        # Maximum : lecture puis écriture, une approximation suffit
+        current_max = float(get_redis().hget(key, 'max') or 0)
+        if wait > current_max:
+            get_redis().hset(key, 'max', wait)
+    except Exception as e:
+        logger.warning(f"Métriques de file indisponibles: {str(e)}")
+
+
+def get_queue_metrics(queues=None):
+    """
+    Profondeur et latence de prise en charge de chaque file
+
+    Returns:
+        dict: {file: {'depth', 'latency': {'count', 'avg', 'max', 'last'}}}
+    """
+    queues = queues or QUEUES
+    metrics = {}
+
+    try:
+        client = get_redis()
+        for queue in queues:
+            stats = {
+                k.decode(): float(v)
+                for k, v in client.hgetall(LATENCY_KEY.format(queue=queue)).items()
+            }
+            count = int(stats.get('count', 0))
+            metrics[queue] = {
+                'depth': client.llen(queue),
+                'latency': {
+                    'count': count,
+                    'avg': round(stats['total'] / count, 3) if count else None,
+                    'max': round(stats.get('max', 0), 3) if count else None,
+                    'last': round(stats['last'], 3) if 'last' in stats else None,
+                },
+            }
+    except Exception as e:
+        logger.error(f"Impossible de lire les métriques des files: {str(e)}")
+        return {'error': str(e)}
+
+    return metrics
+
+
+
+@contextmanager
+def collect_phases(phases=None):
+    """
+    Collecte les durées des phases chronométrées par timed() dans le bloc
+
+    Usage:
+        with collect_phases() as phases:
+            ...
+        phases  # {'llm': 12.3, 'db': 0.4}
+    """
+    phases = {} if phases is None else phases
+    token = _phase_timings.set(phases)
+    try:
+        yield phases
+    finally:
+        _phase_timings.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Chronomètre une phase (sans effet hors d'un bloc collect_phases)
+    """
+    phases = _phase_timings.get()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0.0) + time.monotonic() - started
+
+
+class StageInterrupted(Exception):
+    """Étape interrompue à un point de contrôle"""
+
+
+@contextmanager
+def checkpoint_hooks(*hooks):
+    """
+    Enregistre des vérifications appelées à chaque checkpoint() du bloc
+
+    Une vérification lève StageInterrupted (ou une sous-classe) pour
+    arrêter l'étape.
+    """
+    token = _checkpoint_hooks.set(_checkpoint_hooks.get() + hooks)
+    try:
+        yield
+    finally:
+        _checkpoint_hooks.reset(token)
+
+
+def checkpoint():
+    """
+    Point de contrôle d'une étape longue (sans effet hors d'un bloc
+    checkpoint_hooks)
+
+    Raises:
+        StageInterrupted: Si une vérification demande l'arrêt
+    """
+    for hook in _checkpoint_hooks.get():
+        hook()
+
+
+def _labels(labels):
+    return ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def observe(name, labels, value):
+    """
+    Ajoute une observation à un histogramme cumulé
+    """
+    _, buckets, _ = METRICS[name]
+    series = f"{name}{{{_labels(labels)}}}"
+    key = HISTOGRAM_KEY.format(series=series)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.sadd(HISTOGRAMS_KEY, series)
+        for bound in buckets:
+            if value <= bound:
+                pipe.hincrby(key, f"le:{bound}", 1)
+        pipe.hincrby(key, 'count', 1)
+        pipe.hincrbyfloat(key, 'sum', value)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Métrique {name} non enregistrée: {str(e)}")
+
+
+def inc(name, labels, value=1):
+    """
+    Incrémente un compteur cumulé
+    """
+    try:
+        get_redis().hincrbyfloat(COUNTERS_KEY, f"{name}{{{_labels(labels)}}}", value)
+    except Exception as e:
+        logger.warning(f"Métrique {name} non enregistrée: {str(e)}")
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_prometheus():
+    """
+    Métriques au format texte Prometheus (version 0.0.4)
+
+    Returns:
+        str: Exposition des métriques
+    """
+    client = get_redis()
+    series_by_name = {}
+
+    for series in sorted(s.decode() for s in client.smembers(HISTOGRAMS_KEY)):
+        name, labels = series.split('{', 1)
+        series_by_name.setdefault(name, []).append(('histogram', labels.rstrip('}'), series))
+
+    counters = {k.decode(): v for k, v in client.hgetall(COUNTERS_KEY).items()}
+    for series in sorted(counters):
+        name, labels = series.split('{', 1)
+        series_by_name.setdefault(name, []).append(('counter', labels.rstrip('}'), series))
+
+    lines = []
+    for name, (kind, buckets, help_text) in METRICS.items():
+        if name not in series_by_name:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for _, labels, series in series_by_name[name]:
+            if kind == 'counter':
+                lines.append(f"{name}{{{labels}}} {_format_value(counters[series])}")
+                continue
+            data = {k.decode(): v for k, v in client.hgetall(HISTOGRAM_KEY.format(series=series)).items()}
+            sep = ',' if labels else ''
+            for bound in buckets:
+                count = int(data.get(f"le:{bound}", 0))
+                lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {int(data.get("count", 0))}')
+            lines.append(f"{name}_sum{{{labels}}} {_format_value(data.get('sum', 0))}")
+            lines.append(f"{name}_count{{{labels}}} {int(data.get('count', 0))}")
+
+    # Profondeur instantanée des files
+    lines.append("# HELP pige_celery_queue_depth Tâches en attente dans chaque file")
+    lines.append("# TYPE pige_celery_queue_depth gauge")
+    for queue in QUEUES:
+        lines.append(f'pige_celery_queue_depth{{queue="{queue}"}} {client.llen(queue)}')
+
+    return '\n'.join(lines) + '\n'
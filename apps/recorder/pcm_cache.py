@@ -0,0 +1,218 @@
+"""
+Cache de l'audio décodé (PCM 16 kHz mono float32)
+
+Un traitement lisait le même fichier plusieurs fois (silencedetect,
+chargement Whisper, un décodage FFmpeg par segment transcrit). Le
+fichier est désormais décodé une seule fois dans un fichier brut f32le,
+partagé par toutes les étapes :
+- Whisper et les segments : tableau numpy mappé en mémoire (sans copie)
+- silencedetect : lecture directe du flux brut, sans redécodage
+
+L'entrée est indexée par l'identité du fichier source (chemin, taille,
+date de modification) : un fichier modifié est redécodé. Elle est
+supprimée à la fin du traitement, et les entrées les moins récemment
+utilisées sont évincées au-delà de PCM_CACHE_MAX_BYTES ou quand
+l'espace libre du disque passe sous PCM_CACHE_MIN_FREE_BYTES.
+"""
+from django.conf import settings
+from pathlib import Path
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from .monitoring import checkpoint, timed
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_RATE = 16000
+PCM_BYTES_PER_SAMPLE = 4  # float32
+
+# Arguments FFmpeg pour relire une entrée du cache
+PCM_INPUT_FORMAT = ['-f', 'f32le', '-ar', str(PCM_SAMPLE_RATE), '-ac', '1']
+
+
+def is_pcm_cache_enabled():
+    return getattr(settings, 'PCM_CACHE_ENABLED', True)
+
+
+def get_cache_dir():
+    cache_dir = Path(getattr(settings, 'PCM_CACHE_DIR', '') or Path(settings.MEDIA_ROOT) / '.pcm_cache')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def cache_path(filepath):
+    """
+    Chemin de l'entrée de cache d'un fichier source (selon son identité)
+    """
+    stat = os.stat(filepath)
+    key = hashlib.sha256(
+        f"{os.path.abspath(filepath)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode('utf-8')
+    ).hexdigest()[:32]
+    return get_cache_dir() / f"{key}.f32"
+
+
+def _decode(filepath, out_path):
+    tmp_path = out_path.with_suffix('.tmp')
+    cmd = [
+        settings.FFMPEG_PATH,
+        '-nostdin', '-y', '-v', 'error',
+        '-i', filepath,
+        '-vn',
+        '-ac', '1',
+        '-ar', str(PCM_SAMPLE_RATE),
+        '-f', 'f32le',
+        str(tmp_path)
+    ]
+    started = time.monotonic()
+    try:
+        with timed('decode'):
+            subprocess.run(cmd, check=True, capture_output=True)
+        # Renommage atomique : une entrée visible est toujours complète
+        os.replace(tmp_path, out_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    logger.info(
+        f"Audio décodé en cache: {filepath} "
+        f"({out_path.stat().st_size / (1024**2):.0f} MB, {time.monotonic() - started:.1f}s)"
+    )
+
+
+def ensure_pcm(filepath):
+    """
+    Retourne l'entrée de cache d'un fichier, en la décodant si nécessaire
+
+    Les étapes parallèles d'un même traitement attendent le décodage en
+    cours (verrou par entrée) au lieu de décoder chacune le fichier.
+
+    Returns:
+        Path: Fichier PCM brut (f32le, 16 kHz, mono)
+
+    Raises:
+        FileNotFoundError: Si le fichier source n'existe pas
+        subprocess.CalledProcessError: Si le décodage échoue
+    """
+    out_path = cache_path(filepath)
+    if out_path.exists():
+        os.utime(out_path)
+        return out_path
+
+    # Point de contrôle avant un décodage complet (bail, captures)
+    checkpoint()
+    lock_path = out_path.with_suffix('.lock')
+    with open(lock_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not out_path.exists():
+                evict_pcm_cache(reserve=_estimated_size(filepath))
+                _decode(filepath, out_path)
+            else:
+                os.utime(out_path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    try:
+        lock_path.unlink()
+    except FileNotFoundError:
+        pass
+    return out_path
+
+
+def _estimated_size(filepath):
+    """Taille estimée du PCM décodé (durée x 64 ko/s), 0 si inconnue"""
+    from .services import get_audio_metadata
+
+    duration = get_audio_metadata(filepath).get('duration') or 0
+    return int(duration * PCM_SAMPLE_RATE * PCM_BYTES_PER_SAMPLE)
+
+
+def load_pcm(filepath):
+    """
+    Audio décodé d'un fichier, mappé en mémoire (sans copie)
+
+    Mappage en copie sur écriture : le tableau est modifiable (attendu
+    par torch.from_numpy) sans jamais modifier l'entrée de cache.
+
+    Returns:
+        numpy.memmap: Échantillons float32 à 16 kHz
+    """
+    import numpy as np
+
+    path = ensure_pcm(filepath)
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode='c')
+
+
+def release_pcm(filepath):
+    """
+    Supprime l'entrée de cache d'un fichier (fin de traitement)
+    """
+    try:
+        path = cache_path(filepath)
+    except FileNotFoundError:
+        return False
+    try:
+        path.unlink()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def evict_pcm_cache(reserve=0):
+    """
+    Évince les entrées les moins récemment utilisées
+
+    - tant que la taille totale (+ `reserve`) dépasse PCM_CACHE_MAX_BYTES
+    - tant que l'espace libre (- `reserve`) est sous PCM_CACHE_MIN_FREE_BYTES
+    - entrées non utilisées depuis PCM_CACHE_MAX_AGE secondes
+
+    Args:
+        reserve: Octets à libérer pour une entrée sur le point d'être créée
+
+    Returns:
+        dict: {'evicted': int, 'freed': int, 'size': int}
+    """
+    cache_dir = get_cache_dir()
+    max_bytes = getattr(settings, 'PCM_CACHE_MAX_BYTES', 20 * 1024**3)
+    min_free = getattr(settings, 'PCM_CACHE_MIN_FREE_BYTES', 5 * 1024**3)
+    max_age = getattr(settings, 'PCM_CACHE_MAX_AGE', 24 * 3600)
+
+    entries = []
+    for path in cache_dir.glob('*.f32'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    free = shutil.disk_usage(cache_dir).free
+    now = time.time()
+
+    evicted = 0
+    freed = 0
+    for mtime, size, path in entries:
+        too_big = total + reserve > max_bytes
+        low_disk = free - reserve < min_free
+        too_old = now - mtime > max_age
+        if not (too_big or low_disk or too_old):
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        free += size
+        freed += size
+        evicted += 1
+
+    if evicted:
+        logger.info(f"Cache PCM: {evicted} entrée(s) évincée(s), {freed / (1024**2):.0f} MB libérés")
+
+    return {'evicted': evicted, 'freed': freed, 'size': total}
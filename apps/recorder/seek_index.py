@@ -0,0 +1,163 @@
+"""
+Index de positionnement des fichiers compressés (<fichier>.seekidx)
+
+Les MP3 n'ont pas de table de positionnement et FFmpeg estime la
+position d'après le débit (imprécis en débit variable) ; les FLAC
+produits par FFmpeg n'ont pas de SEEKTABLE. L'index associe, toutes les
+SEEK_INDEX_INTERVAL_MS millisecondes, l'horodatage et la position en
+octets du dernier paquet qui commence avant cet instant :
+
+- construit sans décodage (démultiplexage ffprobe) pendant l'étape
+  metadata et à chaque changement de niveau de stockage
+- entrées de taille fixe : la position d'un instant t est l'entrée
+  t // intervalle, lue directement dans le fichier (temps constant,
+  sans charger l'index)
+- invalidé si la taille ou la date de modification du fichier changent
+
+Format : en-tête HEADER puis `count` entrées ENTRY (microsecondes,
+octet). `header_size` : octets d'en-tête du flux à envoyer avant les
+paquets (fLaC et blocs de métadonnées pour FLAC, 0 pour MP3).
+"""
+from django.conf import settings
+import logging
+import os
+import struct
+import subprocess
+
+from .monitoring import timed
+
+logger = logging.getLogger(__name__)
+
+SEEK_INDEX_SUFFIX = '.seekidx'
+SEEK_INDEX_MAGIC = b'SKIX'
+SEEK_INDEX_VERSION = 1
+
+# magic, version, intervalle (ms), entrées, header_size, taille et mtime du fichier
+HEADER = struct.Struct('<4sHIIQQq')
+ENTRY = struct.Struct('<qQ')
+
+# Formats indexés : l'en-tête du flux doit-il précéder les paquets ?
+SEEK_INDEX_FORMATS = {
+    'mp3': False,
+    'flac': True,
+}
+
+
+def is_indexable(fmt):
+    return (fmt or '').lower() in SEEK_INDEX_FORMATS
+
+
+def index_path(filepath):
+    return f"{filepath}{SEEK_INDEX_SUFFIX}"
+
+
+def _packets(filepath):
+    """(horodatage en secondes, position en octets) des paquets audio, sans décodage"""
+    ffprobe_path = settings.FFMPEG_PATH.replace('ffmpeg', 'ffprobe')
+    cmd = [
+        ffprobe_path,
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'packet=pts_time,pos',
+        '-of', 'csv=p=0',
+        str(filepath)
+    ]
+    with timed('ffmpeg'):
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+    for line in result.stdout.splitlines():
+        pts, _, pos = line.partition(',')
+        try:
+            yield float(pts), int(pos)
+        except ValueError:
+            continue
+
+
+def build_seek_index(filepath, fmt=None, interval_ms=None):
+    """
+    Construit l'index d'un fichier compressé
+
+    Args:
+        filepath: Fichier audio
+        fmt: Format (déduit de l'extension par défaut)
+        interval_ms: Pas de l'index (SEEK_INDEX_INTERVAL_MS)
+
+    Returns:
+        int: Nombre d'entrées, 0 si le format n'est pas indexé ou si le
+             fichier n'a aucun paquet
+    """
+    fmt = (fmt or os.path.splitext(filepath)[1].lstrip('.')).lower()
+    if not is_indexable(fmt):
+        return 0
+    interval_ms = interval_ms or getattr(settings, 'SEEK_INDEX_INTERVAL_MS', 1000)
+    interval = interval_ms / 1000
+
+    stat = os.stat(filepath)
+    entries = []
+    first_pos = None
+    previous = None
+    next_time = 0.0
+    for pts, pos in _packets(filepath):
+        if previous is None:
+            previous = (pts, pos)
+            first_pos = pos
+        while pts > next_time:
+            entries.append(previous)
+            next_time += interval
+        previous = (pts, pos)
+    if previous is None:
+        return 0
+    while next_time <= previous[0]:
+        entries.append(previous)
+        next_time += interval
+
+    header_size = first_pos if SEEK_INDEX_FORMATS[fmt] else 0
+    out_path = index_path(filepath)
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            SEEK_INDEX_MAGIC, SEEK_INDEX_VERSION, interval_ms, len(entries),
+            header_size, stat.st_size, stat.st_mtime_ns
+        ))
+        f.write(b''.join(ENTRY.pack(round(pts * 1e6), pos) for pts, pos in entries))
+    os.replace(tmp_path, out_path)
+
+    logger.info(f"Index de positionnement: {filepath} ({len(entries)} entrées)")
+    return len(entries)
+
+
+def lookup(filepath, seconds):
+    """
+    Dernier paquet qui commence au plus tard à `seconds`
+
+    Returns:
+        tuple | None: (horodatage en secondes, position en octets,
+                      header_size), None si l'index est absent ou périmé
+    """
+    try:
+        stat = os.stat(filepath)
+        with open(index_path(filepath), 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, version, interval_ms, count, header_size, size, mtime_ns = HEADER.unpack(header)
+            if (
+                magic != SEEK_INDEX_MAGIC or version != SEEK_INDEX_VERSION or not count
+                or size != stat.st_size or mtime_ns != stat.st_mtime_ns
+            ):
+                return None
+            slot = min(count - 1, max(0, int(seconds * 1000 // interval_ms)))
+            f.seek(HEADER.size + slot * ENTRY.size)
+            pts_us, pos = ENTRY.unpack(f.read(ENTRY.size))
+    except (OSError, struct.error):
+        return None
+    return pts_us / 1e6, pos, header_size
+
+
+def remove_seek_index(filepath):
+    """Supprime l'index d'un fichier (fichier supprimé ou remplacé)"""
+    try:
+        os.remove(index_path(filepath))
+        return True
+    except FileNotFoundError:
+        return False
@@ -2,6 +2,7 @@
 Services pour l'enregistrement audio et la détection de silence
 """
 import subprocess
+import struct
 import os
 import re
 from datetime import datetime
@@ -9,6 +10,8 @@ from pathlib import Path
 from django.conf import settings
 import logging
 
+from .monitoring import StageInterrupted, checkpoint, timed
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,9 +50,9 @@ def build_filename(template, meta):
     return filename
 
 
-def start_record(stream_url, out_path, fmt='wav', quality='192k', duration=None):
+def build_record_command(stream_url, out_path, fmt='wav', quality='192k', duration=None):
     """
-    Démarre un enregistrement FFmpeg
+    Construit la commande FFmpeg d'enregistrement
     
     Args:
         stream_url: URL du stream ou device (ex: http://stream.radio.com/live)
@@ -59,14 +62,11 @@ def start_record(stream_url, out_path, fmt='wav', quality='192k', duration=None)
         duration: Durée en secondes (None = infini)
     
     Returns:
-        subprocess.Popen: Le processus FFmpeg
+        list: Arguments de la commande
     """
     ffmpeg_path = settings.FFMPEG_PATH
     
-    # Créer le répertoire de sortie si nécessaire
-    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-    
-    cmd = [ffmpeg_path, '-y', '-i', stream_url]
+    cmd = [ffmpeg_path, '-y', '-nostdin', '-i', stream_url]
     
     if duration:
         cmd += ['-t', str(duration)]
@@ -99,6 +99,28 @@ def start_record(stream_url, out_path, fmt='wav', quality='192k', duration=None)
             out_path
         ]
     
+    return cmd
+
+
+def start_record(stream_url, out_path, fmt='wav', quality='192k', duration=None):
+    """
+    Démarre un enregistrement FFmpeg
+    
+    Args:
+        stream_url: URL du stream ou device (ex: http://stream.radio.com/live)
+        out_path: Chemin du fichier de sortie
+        fmt: Format audio (wav, mp3, flac)
+        quality: Qualité (192k, 256k, 320k)
+        duration: Durée en secondes (None = infini)
+    
+    Returns:
+        subprocess.Popen: Le processus FFmpeg
+    """
+    # Créer le répertoire de sortie si nécessaire
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    
+    cmd = build_record_command(stream_url, out_path, fmt, quality, duration)
+    
     logger.info(f"Démarrage enregistrement: {' '.join(cmd)}")
     
     try:
@@ -182,9 +204,20 @@ def detect_silence_ffmpeg(filepath, silence_thresh='-35dB', silence_duration=2.0
     silence_thresh = getattr(settings, 'SILENCE_DETECTION_THRESHOLD', silence_thresh)
     silence_duration = getattr(settings, 'SILENCE_DETECTION_DURATION', silence_duration)
     
+    # Relire l'audio déjà décodé (cache PCM) plutôt que redécoder le fichier
+    input_args = ['-i', filepath]
+    from .pcm_cache import is_pcm_cache_enabled, ensure_pcm, PCM_INPUT_FORMAT
+    if is_pcm_cache_enabled():
+        try:
+            input_args = PCM_INPUT_FORMAT + ['-i', str(ensure_pcm(filepath))]
+        except StageInterrupted:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache PCM indisponible, décodage direct: {str(e)}")
+    
     cmd = [
         ffmpeg_path,
-        '-i', filepath,
+        *input_args,
         '-af', f'silencedetect=noise={silence_thresh}:d={silence_duration}',
         '-f', 'null',
         '-'
@@ -192,35 +225,49 @@ def detect_silence_ffmpeg(filepath, silence_thresh='-35dB', silence_duration=2.0
     
     logger.info(f"Détection de silence: {filepath}")
     
+    checkpoint()
+    
     try:
         proc = subprocess.Popen(
             cmd,
-            stdout=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             text=True
         )
-        _, stderr = proc.communicate()
         
-        # Parser la sortie pour extraire les silences
+        # Parser la sortie au fil de l'eau pour extraire les silences ;
+        # les lignes de progression de FFmpeg servent de points de contrôle
         silences = []
         current_start = None
         
-        for line in stderr.splitlines():
-            if 'silence_start' in line:
-                match = re.search(r'silence_start: ([\d.]+)', line)
-                if match:
-                    current_start = float(match.group(1))
-            
-            elif 'silence_end' in line and current_start is not None:
-                match = re.search(r'silence_end: ([\d.]+)', line)
-                if match:
-                    end = float(match.group(1))
-                    silences.append((current_start, end))
-                    current_start = None
+        with timed('ffmpeg'):
+            try:
+                for line in proc.stderr:
+                    checkpoint()
+                    if 'silence_start' in line:
+                        match = re.search(r'silence_start: ([\d.]+)', line)
+                        if match:
+                            current_start = float(match.group(1))
+                    
+                    elif 'silence_end' in line and current_start is not None:
+                        match = re.search(r'silence_end: ([\d.]+)', line)
+                        if match:
+                            end = float(match.group(1))
+                            silences.append((current_start, end))
+                            current_start = None
+                proc.wait()
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
+            finally:
+                proc.stderr.close()
         
         logger.info(f"{len(silences)} silence(s) détecté(s)")
         return silences
         
+    except StageInterrupted:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la détection de silence: {str(e)}")
         return []
@@ -253,13 +300,14 @@ def get_audio_metadata(filepath):
     ]
     
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
+        with timed('ffmpeg'):
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True
+            )
         
         import json
         data = json.loads(result.stdout)
@@ -326,3 +374,391 @@ def check_stream_health(stream_url, timeout=5):
     except Exception as e:
         return {'available': False, 'error': str(e)}
 
+
+
+# Muxers FFmpeg des extraits compressés (copie du flux sans réencodage)
+CLIP_MUXERS = {
+    'wav': 'wav',
+    'mp3': 'mp3',
+    'flac': 'flac',
+    'opus': 'ogg',
+    'ogg': 'ogg',
+    'aac': 'adts',
+    'm4a': 'ipod',
+}
+
+
+def read_wav_layout(filepath):
+    """
+    Structure d'un fichier WAV : bloc fmt et position des échantillons
+    
+    Les WAV de plus de 4 Go écrits par FFmpeg ont une taille de données
+    tronquée (32 bits) ; la taille réelle est alors déduite du fichier.
+    Les fichiers RF64 sont pris en charge.
+    
+    Args:
+        filepath: Chemin du fichier WAV
+    
+    Returns:
+        dict: fmt (contenu brut du bloc fmt), sample_rate, channels,
+              block_align, data_offset, data_size (octets)
+    
+    Raises:
+        ValueError: Si le fichier n'est pas un WAV lisible
+    """
+    file_size = os.path.getsize(filepath)
+    layout = {}
+    ds64_data_size = None
+    
+    with open(filepath, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RF64') or riff[8:12] != b'WAVE':
+            raise ValueError(f"Fichier WAV invalide: {filepath}")
+        
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"Bloc data introuvable: {filepath}")
+            chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+            
+            if chunk_id == b'data':
+                layout['data_offset'] = f.tell()
+                declared = ds64_data_size if ds64_data_size is not None else chunk_size
+                available = file_size - layout['data_offset']
+                if chunk_size in (0, 0xFFFFFFFF) or available > 0xFFFFFFFF:
+                    layout['data_size'] = available
+                else:
+                    layout['data_size'] = min(declared, available)
+                break
+            
+            body = f.read(chunk_size)
+            if chunk_id == b'fmt ':
+                if len(body) < 16:
+                    raise ValueError(f"Bloc fmt invalide: {filepath}")
+                _, channels, sample_rate, _, block_align = struct.unpack('<HHIIH', body[:14])
+                layout.update({
+                    'fmt': body,
+                    'channels': channels,
+                    'sample_rate': sample_rate,
+                    'block_align': block_align,
+                })
+            elif chunk_id == b'ds64' and len(body) >= 16:
+                ds64_data_size = struct.unpack('<Q', body[8:16])[0]
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+    
+    if not layout.get('fmt') or not layout['sample_rate'] or not layout['block_align']:
+        raise ValueError(f"Bloc fmt absent: {filepath}")
+    return layout
+
+
+def wav_header(layout, data_size):
+    """
+    En-tête WAV pour `data_size` octets d'échantillons au format de `layout`
+    """
+    fmt = layout['fmt']
+    fmt_chunk = b'fmt ' + struct.pack('<I', len(fmt)) + fmt + (b'\0' if len(fmt) % 2 else b'')
+    riff_size = 4 + len(fmt_chunk) + 8 + data_size + data_size % 2
+    if riff_size > 0xFFFFFFFF:
+        raise ValueError("Extrait trop long pour un fichier WAV (4 Go)")
+    return b'RIFF' + struct.pack('<I', riff_size) + b'WAVE' + fmt_chunk + b'data' + struct.pack('<I', data_size)
+
+
+def _copy_range(src, dst, offset, length):
+    """Copie d'une plage d'octets, dans le noyau si possible (copy_file_range)"""
+    src.seek(offset)
+    remaining = length
+    if hasattr(os, 'copy_file_range'):
+        dst.flush()
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining, offset + length - remaining)
+                if not copied:
+                    break
+                remaining -= copied
+            dst.seek(0, os.SEEK_END)
+            return
+        except OSError:
+            # Systèmes de fichiers différents ou non pris en charge : copie classique
+            dst.seek(0, os.SEEK_END)
+            src.seek(offset + length - remaining)
+    while remaining > 0:
+        block = src.read(min(1024 * 1024, remaining))
+        if not block:
+            return
+        dst.write(block)
+        remaining -= len(block)
+
+
+def extract_wav_clip(filepath, start, end, out_path):
+    """
+    Extrait d'un WAV à l'échantillon près, sans décodage
+    
+    Les positions sont calculées depuis l'en-tête (temps constant quelle
+    que soit la position dans le fichier) ; les échantillons sont copiés
+    tels quels derrière un en-tête synthétisé.
+    
+    Returns:
+        dict: {'start': float, 'end': float} (bornes réelles, en secondes)
+    """
+    layout = read_wav_layout(filepath)
+    rate, block_align = layout['sample_rate'], layout['block_align']
+    total_frames = layout['data_size'] // block_align
+    
+    first = min(total_frames, max(0, round(start * rate)))
+    last = min(total_frames, max(first, round(end * rate)))
+    data_size = (last - first) * block_align
+    
+    with open(filepath, 'rb') as src, open(out_path, 'wb') as dst:
+        dst.write(wav_header(layout, data_size))
+        _copy_range(src, dst, layout['data_offset'] + first * block_align, data_size)
+        if data_size % 2:
+            dst.write(b'\0')
+    
+    return {'start': first / rate, 'end': last / rate}
+
+
+def _iter_spliced(filepath, header_size, start_pos, stop_pos=None, chunk_size=1024 * 1024):
+    """En-tête du flux (header_size octets) puis octets de start_pos à stop_pos"""
+    with open(filepath, 'rb') as f:
+        if header_size:
+            yield f.read(header_size)
+        f.seek(start_pos)
+        remaining = None if stop_pos is None else stop_pos - start_pos
+        while remaining is None or remaining > 0:
+            block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
+
+
+def positioned_input(filepath, fmt, start, end=None):
+    """
+    Entrée FFmpeg positionnée au plus près de `start`
+    
+    Avec un index de positionnement (MP3, FLAC), FFmpeg lit sur son
+    entrée standard l'en-tête du flux puis les paquets à partir de
+    `start` (jusqu'à un peu après `end`) : ce qui précède n'est ni lu ni
+    décodé. Sinon, recherche côté entrée par FFmpeg (-ss avant -i).
+    
+    Returns:
+        tuple: (arguments d'entrée FFmpeg, blocs à écrire sur l'entrée
+               standard ou None, secondes à ignorer en début de flux)
+    """
+    from .seek_index import is_indexable, lookup
+    
+    entry = lookup(filepath, start) if is_indexable(fmt) else None
+    if entry is None:
+        return ['-ss', f"{start:.6f}", '-i', str(filepath)], None, 0.0
+    
+    pts, pos, header_size = entry
+    stop_pos = None
+    if end is not None:
+        after = lookup(filepath, end + 2.0)
+        if after and after[0] > end:
+            stop_pos = after[1]
+    feed = _iter_spliced(filepath, header_size, pos, stop_pos)
+    return ['-f', fmt, '-i', 'pipe:0'], feed, max(0.0, start - pts)
+
+
+def run_ffmpeg(cmd, feed=None):
+    """
+    Exécute FFmpeg, en écrivant `feed` sur son entrée standard
+    
+    Returns:
+        bytes: Sortie standard
+    
+    Raises:
+        subprocess.CalledProcessError: Si FFmpeg échoue
+    """
+    import tempfile
+    import threading
+    
+    if feed is None:
+        with timed('ffmpeg'):
+            return subprocess.run(cmd, check=True, capture_output=True).stdout
+    
+    with tempfile.TemporaryFile() as stderr, timed('ffmpeg'):
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr)
+        
+        def pump():
+            try:
+                for block in feed:
+                    proc.stdin.write(block)
+            except (BrokenPipeError, ValueError):
+                # FFmpeg a lu ce dont il avait besoin
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+        
+        writer = threading.Thread(target=pump, daemon=True)
+        writer.start()
+        output = proc.stdout.read()
+        proc.stdout.close()
+        returncode = proc.wait()
+        writer.join()
+        if returncode != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(returncode, cmd, output, stderr.read())
+    return output
+
+
+def _trim_filter(skip, duration):
+    """Découpe à l'échantillon près, indépendante des horodatages du flux"""
+    return (
+        f"asetpts=NB_CONSUMED_SAMPLES/SR/TB,"
+        f"atrim=start={skip:.6f}:duration={duration:.6f},asetpts=PTS-STARTPTS"
+    )
+
+
+def extract_audio_clip(filepath, start, end, out_path, fmt=None):
+    """
+    Extrait une portion d'un fichier audio sans décoder ce qui précède
+    
+    - WAV : copie des échantillons (à l'échantillon près)
+    - FLAC : positionnement (index ou recherche FFmpeg) puis réencodage
+      FLAC de l'extrait seul (sans perte, à l'échantillon près)
+    - autres formats : positionnement et copie du flux (à la trame près,
+      sans perte de génération)
+    
+    Args:
+        filepath: Fichier source
+        start: Début en secondes
+        end: Fin en secondes
+        out_path: Fichier de sortie (même format que la source)
+        fmt: Format de la source (déduit de l'extension par défaut)
+    
+    Returns:
+        dict: {'start': float, 'end': float, 'sample_accurate': bool}
+    """
+    fmt = (fmt or Path(filepath).suffix.lstrip('.')).lower()
+    
+    if fmt == 'wav':
+        try:
+            bounds = extract_wav_clip(filepath, start, end, out_path)
+            return {**bounds, 'sample_accurate': True}
+        except ValueError as e:
+            logger.warning(f"Extrait WAV direct impossible, passage par FFmpeg: {str(e)}")
+    
+    input_args, feed, skip = positioned_input(filepath, fmt, start, end)
+    duration = end - start
+    cmd = [settings.FFMPEG_PATH, '-nostdin', '-y', '-v', 'error'] + input_args + ['-map', '0:a:0']
+    if fmt == 'flac':
+        if feed is not None:
+            cmd += ['-af', _trim_filter(skip, duration)]
+        cmd += ['-c:a', 'flac']
+    else:
+        if skip:
+            cmd += ['-ss', f"{skip:.6f}"]
+        cmd += ['-c:a', 'copy']
+    cmd += ['-t', f"{duration:.6f}"]
+    muxer = CLIP_MUXERS.get(fmt)
+    if muxer:
+        cmd += ['-f', muxer]
+    cmd.append(str(out_path))
+    
+    run_ffmpeg(cmd, feed)
+    
+    return {'start': start, 'end': end, 'sample_accurate': fmt in ('flac', 'wav')}
+
+
+def decode_segment(filepath, start, end, sample_rate=16000, fmt=None):
+    """
+    Décode une portion d'un fichier audio (mono float32), sans décoder
+    ce qui précède
+    
+    Args:
+        filepath: Fichier audio
+        start: Début en secondes
+        end: Fin en secondes
+        sample_rate: Fréquence de sortie
+        fmt: Format de la source (déduit de l'extension par défaut)
+    
+    Returns:
+        bytes: Échantillons f32le
+    """
+    fmt = (fmt or Path(filepath).suffix.lstrip('.')).lower()
+    input_args, feed, skip = positioned_input(filepath, fmt, start, end)
+    
+    cmd = [settings.FFMPEG_PATH, '-nostdin', '-v', 'error'] + input_args + ['-map', '0:a:0']
+    if feed is not None:
+        cmd += ['-af', _trim_filter(skip, end - start)]
+    cmd += [
+        '-t', f"{end - start:.6f}",
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 'f32le',
+        '-'
+    ]
+    return run_ffmpeg(cmd, feed)
+
+
+# Segments HLS : fréquence fixe (grille de trames AAC identique pour
+# tous les segments) et trames d'amorce encodées avant le début
+HLS_SAMPLE_RATE = 48000
+AAC_FRAME_SAMPLES = 1024
+HLS_PREROLL_FRAMES = 4
+
+
+def encode_hls_segment(filepath, start, end, out_path, fmt=None, bitrate='128k'):
+    """
+    Segment HLS (AAC dans MPEG-TS) d'une portion de fichier audio, sans
+    décoder ce qui précède
+    
+    Un flux AAC autonome commence par une trame d'amorce (priming) et
+    sa première trame utile manque du recouvrement de la précédente :
+    mis bout à bout, des segments encodés séparément claquent à chaque
+    jointure. L'encodage commence donc HLS_PREROLL_FRAMES trames avant
+    `start`, puis les trames d'amorce sont retirées sans réencodage
+    (copie des paquets) : le segment commence par une trame encodée avec
+    l'audio qui la précède, exactement à `start`.
+    
+    Les horodatages du segment sont décalés de `start` : les segments
+    successifs d'un même fichier forment un flux continu.
+    
+    Args:
+        filepath: Fichier audio
+        start: Début en secondes
+        end: Fin en secondes
+        out_path: Fichier .ts de sortie
+        fmt: Format de la source (déduit de l'extension par défaut)
+        bitrate: Débit AAC
+    """
+    fmt = (fmt or Path(filepath).suffix.lstrip('.')).lower()
+    frame = AAC_FRAME_SAMPLES / HLS_SAMPLE_RATE
+    # Amorce entière en trames : la grille des trames tombe sur `start`
+    preroll = min(HLS_PREROLL_FRAMES, int(start / frame)) * frame
+    input_args, feed, skip = positioned_input(filepath, fmt, start - preroll, end)
+    
+    # 1. Encodage de [start - amorce, end] en AAC brut (ADTS)
+    cmd = [settings.FFMPEG_PATH, '-nostdin', '-y', '-v', 'error'] + input_args + ['-map', '0:a:0']
+    if feed is not None:
+        cmd += ['-af', _trim_filter(skip, end - start + preroll)]
+    cmd += [
+        '-t', f"{end - start + preroll:.6f}",
+        '-ar', str(HLS_SAMPLE_RATE),
+        '-c:a', 'aac',
+        '-b:a', bitrate,
+        '-f', 'adts',
+        'pipe:1'
+    ]
+    encoded = run_ffmpeg(cmd, feed)
+    
+    # 2. Retrait de la trame de priming et des trames d'amorce (copie),
+    #    mise en MPEG-TS à l'horodatage `start`
+    cmd = [
+        settings.FFMPEG_PATH, '-y', '-v', 'error',
+        '-f', 'aac', '-i', 'pipe:0',
+        '-ss', f"{preroll + frame:.6f}",
+        '-t', f"{end - start:.6f}",
+        '-c:a', 'copy',
+        '-output_ts_offset', f"{start:.6f}",
+        '-f', 'mpegts',
+        str(out_path)
+    ]
+    run_ffmpeg(cmd, [encoded])
@@ -13,8 +13,12 @@ logger = logging.getLogger(__name__)
 def check_storage_health():
     """
     Vérifie l'espace disque disponible et envoie une alerte si nécessaire
+    
+    La prévision de remplissage déclenche aussi la régulation du stockage
+    (conversions et suppressions anticipées, quotas par station).
     """
     import shutil
+    from apps.archive.storage import relieve_storage
     
     media_root = settings.MEDIA_ROOT
     
@@ -25,13 +29,17 @@ def check_storage_health():
         free = stat.free
         percent_used = (used / total) * 100
         
+        relief = relieve_storage()
+        days_until_full = relief['forecast']['days_until_full']
+        
         logger.info(
             f"Espace disque: {used / (1024**3):.2f}GB utilisé / "
-            f"{total / (1024**3):.2f}GB total ({percent_used:.1f}%)"
+            f"{total / (1024**3):.2f}GB total ({percent_used:.1f}%), "
+            f"plein dans {days_until_full if days_until_full is not None else '∞'} jour(s)"
         )
         
-        # Alerte si > 85% utilisé
-        if percent_used > 85:
+        # Alerte si > 85% utilisé ou si le disque sera bientôt plein
+        if percent_used > 85 or relief['breach']:
             from django.core.mail import send_mail
             
             send_mail(
@@ -42,6 +50,9 @@ L'espace disque est critique !
 Utilisé: {used / (1024**3):.2f}GB
 Total: {total / (1024**3):.2f}GB
 Pourcentage: {percent_used:.1f}%
+Disque plein dans : {days_until_full} jour(s) au rythme actuel
+Conversions FLAC lancées : {len(relief['transcode'])}
+Suppressions anticipées : {len(relief['evict'])}
 
 Veuillez libérer de l'espace ou augmenter la capacité.
 """,
@@ -55,7 +66,10 @@ Veuillez libérer de l'espace ou augmenter la capacité.
             'total_gb': total / (1024**3),
             'used_gb': used / (1024**3),
             'free_gb': free / (1024**3),
-            'percent_used': percent_used
+            'percent_used': percent_used,
+            'days_until_full': days_until_full,
+            'transcode': len(relief['transcode']),
+            'evict': len(relief['evict'])
         }
         
     except Exception as e:
@@ -89,3 +103,25 @@ def cleanup_failed_jobs():
     logger.info(f"{count} job(s) abandonné(s) nettoyé(s)")
     return count
 
+
+
+@shared_task
+def evict_pcm_cache():
+    """
+    Purge le cache d'audio décodé (entrées anciennes, taille, espace disque)
+    """
+    from .pcm_cache import evict_pcm_cache as evict
+    
+    return evict()
+
+
+@shared_task
+def rebuild_storage_usage():
+    """
+    Réconcilie l'occupation du stockage par station et propriétaire
+    """
+    from apps.archive.storage import rebuild_usage
+    
+    rows = rebuild_usage()
+    logger.info(f"Occupation du stockage recalculée ({rows} ligne(s))")
+    return rows
@@ -3,7 +3,7 @@ URLs pour l'API d'enregistrement
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RecordingJobViewSet, check_stream
+from .views import RecordingJobViewSet, check_stream, queue_metrics
 
 router = DefaultRouter()
 router.register(r'jobs', RecordingJobViewSet, basename='recordingjob')
@@ -11,5 +11,6 @@ router.register(r'jobs', RecordingJobViewSet, basename='recordingjob')
 urlpatterns = [
     path('', include(router.urls)),
     path('check-stream/', check_stream, name='check-stream'),
+    path('queues/', queue_metrics, name='queue-metrics'),
 ]
 
@@ -6,13 +6,15 @@ from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
 from datetime import datetime
 import os
 
 from .models import RecordingJob
+from .capture import spawn_capture
 from .services import (
     build_filename,
-    start_record,
     stop_record,
     check_stream_health,
     is_process_running
@@ -35,6 +37,7 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
         Body params:
         - source: URL du stream ou device
         - title: Titre de l'enregistrement (optionnel)
+        - station: Station enregistrée (optionnel)
         - format: Format audio (wav, mp3, flac)
         - quality: Qualité (192k, 256k, 320k)
         - duration: Durée en secondes (optionnel)
@@ -61,6 +64,7 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Paramètres
         title = data.get('title', '')
+        station = data.get('station', '')
         fmt = data.get('format', settings.RECORDING_DEFAULT_FORMAT)
         quality = data.get('quality', settings.RECORDING_DEFAULT_QUALITY)
         duration = data.get('duration')
@@ -84,15 +88,18 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
             title=title,
             filename=filename,
             filepath=out_path,
+            station=station,
             format=fmt,
             bitrate=quality,
             status='recording',
-            owner=owner
+            owner=owner,
+            started_at=timezone.now()
         )
         
         # Créer le job
         job = RecordingJob.objects.create(
             source_url=source,
+            station=station,
             output_path=out_path,
             format=fmt,
             quality=quality,
@@ -101,21 +108,18 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
         )
         
         try:
-            # Démarrer l'enregistrement
-            proc = start_record(source, out_path, fmt, quality, duration)
+            # Démarrer l'enregistrement sous son superviseur, qui lance le
+            # traitement dès que FFmpeg a terminé et finalisé le fichier
+            proc = spawn_capture(job)
             
-            job.process_id = proc.pid
-            job.status = 'running'
-            job.started_at = datetime.now()
-            job.save()
-            
-            # Programmer le traitement automatique si durée définie
-            if duration:
-                from apps.archive.tasks import process_recording
-                process_recording.apply_async(
-                    args=[recording.id],
-                    countdown=duration + 10  # Attendre la fin + 10s
-                )
+            # Statut et PID en une seule écriture : un job "running" a
+            # toujours son PID (sinon /active/ et /cleanup/ le croiraient
+            # disparu). Un superviseur déjà terminé a fixé le statut final.
+            RecordingJob.objects.filter(pk=job.pk, status='scheduled').update(
+                status='running',
+                process_id=proc.pid,
+                started_at=timezone.now()
+            )
             
             return Response({
                 'success': True,
@@ -174,20 +178,8 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
             success = stop_record(job.process_id)
             
             if success:
-                job.status = 'stopped'
-                job.save()
-                
-                # Marquer le recording comme terminé et lancer le traitement
-                try:
-                    recording = Recording.objects.get(filepath=job.output_path)
-                    recording.status = 'processing'
-                    recording.save()
-                    
-                    from apps.archive.tasks import process_recording
-                    process_recording.delay(recording.id)
-                except Recording.DoesNotExist:
-                    pass
-                
+                # Le superviseur transmet le signal à FFmpeg, puis marque le
+                # job arrêté et lance le traitement une fois le fichier finalisé
                 return Response({
                     'success': True,
                     'message': 'Enregistrement arrêté',
@@ -209,6 +201,9 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
     def active(self, request):
         """
         Liste les enregistrements actifs et met à jour leur statut
+        
+        La fin normale d'une capture est gérée par son superviseur ; ce
+        rattrapage ne concerne que les superviseurs disparus (tués).
         """
         # Récupérer tous les jobs marqués comme "running"
         running_jobs = RecordingJob.objects.filter(status='running')
@@ -224,7 +219,10 @@ class RecordingJobViewSet(viewsets.ReadOnlyModelViewSet):
                     'output': job.output_path,
                     'format': job.format,
                     'started_at': job.started_at,
-                    'process_id': job.process_id
+                    'process_id': job.process_id,
+                    'capture_speed': job.capture_speed,
+                    'underruns': job.underruns,
+                    'telemetry_at': job.telemetry_at
                 })
             else:
                 # Le processus n'est plus actif, mettre à jour le statut
@@ -310,3 +308,29 @@ def check_stream(request):
         'error': health['error'] if not health['available'] else None
     })
 
+
+
+@api_view(['GET'])
+def queue_metrics(request):
+    """
+    Profondeur et latence de prise en charge des files Celery
+    """
+    from .monitoring import get_queue_metrics
+    
+    metrics = get_queue_metrics()
+    if 'error' in metrics:
+        return Response(metrics, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(metrics)
+
+
+def prometheus_metrics(request):
+    """
+    Métriques du traitement au format texte Prometheus (GET /metrics)
+    """
+    from .monitoring import render_prometheus
+    
+    try:
+        body = render_prometheus()
+    except Exception as e:
+        return HttpResponse(f"# Métriques indisponibles: {str(e)}\n", status=503, content_type='text/plain')
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
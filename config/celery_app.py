@@ -22,6 +22,26 @@ app.conf.beat_schedule = {
         'task': 'apps.archive.tasks.cleanup_expired_files',
         'schedule': crontab(hour=3, minute=0),  # Tous les jours à 3h
     },
+    'apply-storage-lifecycle': {
+        'task': 'apps.archive.tasks.apply_storage_lifecycle',
+        'schedule': crontab(hour=4, minute=0),  # Tous les jours à 4h
+    },
+    'evict-llm-cache': {
+        'task': 'apps.ai.tasks.evict_llm_cache',
+        'schedule': crontab(minute=15),  # Toutes les heures
+    },
+    'evict-pcm-cache': {
+        'task': 'apps.recorder.tasks.evict_pcm_cache',
+        'schedule': crontab(minute='*/10'),  # Toutes les 10 minutes
+    },
+    'evict-hls-cache': {
+        'task': 'apps.archive.tasks.evict_hls_cache',
+        'schedule': crontab(minute='*/10'),  # Toutes les 10 minutes
+    },
+    'rebuild-storage-usage': {
+        'task': 'apps.recorder.tasks.rebuild_storage_usage',
+        'schedule': crontab(hour=2, minute=30),  # Tous les jours à 2h30
+    },
     'check-storage-health': {
         'task': 'apps.recorder.tasks.check_storage_health',
         'schedule': crontab(minute='*/30'),  # Toutes les 30 minutes
@@ -1,6 +1,7 @@
 """
 Django settings for Radio Occitania Pige System
 """
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -140,6 +141,39 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 
+# Files de priorité : chaque file a son pool de workers (docker-compose)
+# - realtime : détection de silence, alertes, orchestration du traitement
+# - asr : transcription Whisper, analyse des blancs (contexte Whisper + Mistral)
+# - llm : appels Mistral en masse (résumés, mots-clés)
+# - maintenance : nettoyage, stockage, cache
+# - bulk : retraitements en masse, DAG complet (apps.archive.tasks.enqueue_bulk)
+CELERY_TASK_DEFAULT_QUEUE = 'maintenance'
+CELERY_TASK_ROUTES = {
+    'apps.archive.tasks.process_recording': {'queue': 'realtime'},
+    'apps.archive.tasks.stage_metadata': {'queue': 'realtime'},
+    'apps.archive.tasks.stage_silence': {'queue': 'realtime'},
+    'apps.archive.tasks.stage_blank_notification': {'queue': 'realtime'},
+    'apps.archive.tasks.finalize_recording': {'queue': 'realtime'},
+    'apps.archive.tasks.stage_blank_analysis': {'queue': 'asr'},
+    'apps.archive.tasks.stage_transcription': {'queue': 'asr'},
+    'apps.archive.tasks.stage_summary': {'queue': 'llm'},
+    'apps.archive.tasks.cleanup_expired_files': {'queue': 'maintenance'},
+    'apps.archive.tasks.apply_storage_lifecycle': {'queue': 'maintenance'},
+    'apps.archive.tasks.move_recording_to_tier': {'queue': 'maintenance'},
+    'apps.archive.tasks.evict_hls_cache': {'queue': 'maintenance'},
+    'apps.ai.tasks.*': {'queue': 'maintenance'},
+    'apps.recorder.tasks.*': {'queue': 'maintenance'},
+}
+# Une seule tâche réservée par processus : une transcription de plusieurs
+# heures ne bloque pas des tâches déjà prélevées derrière elle
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Acquittement après exécution : une tâche d'un worker tué est redistribuée
+# (les étapes sont idempotentes et protégées par le bail de traitement)
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+# Délai de redistribution Redis supérieur à la plus longue tâche
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': CELERY_TASK_TIME_LIMIT + 15 * 60}
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -156,16 +190,117 @@ FFMPEG_PATH = os.getenv('FFMPEG_PATH', '/usr/bin/ffmpeg')
 # AI Models Configuration
 WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
 WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')
+# Profil de transcription par défaut : fast, balanced, accurate
+WHISPER_DEFAULT_PROFILE = os.getenv('WHISPER_PROFILE', 'balanced')
+# Surcharges des profils, ex: {"fast": {"model": "base"}}
+WHISPER_PROFILES = json.loads(os.getenv('WHISPER_PROFILES', '{}'))
+# Profil par station, ex: {"occitania-toulouse": "accurate"}
+WHISPER_STATION_PROFILES = json.loads(os.getenv('WHISPER_STATION_PROFILES', '{}'))
 MISTRAL_MODEL = os.getenv('MISTRAL_MODEL', 'mistral-small-latest')
 MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY', '')
+MISTRAL_API_URL = os.getenv('MISTRAL_API_URL', 'https://api.mistral.ai')
+# Backend : api (réel) ou fake (simulé, hors ligne et déterministe)
+MISTRAL_BACKEND = os.getenv('MISTRAL_BACKEND', 'api')
+MISTRAL_FAKE_LATENCY = float(os.getenv('MISTRAL_FAKE_LATENCY', '0.5'))  # secondes
+MISTRAL_FAKE_LATENCY_JITTER = float(os.getenv('MISTRAL_FAKE_LATENCY_JITTER', '0.2'))
+MISTRAL_FAKE_ERROR_RATE = float(os.getenv('MISTRAL_FAKE_ERROR_RATE', '0'))  # 0-1
+MISTRAL_FAKE_SEED = int(os.getenv('MISTRAL_FAKE_SEED', '0'))
+MISTRAL_TIMEOUT = float(os.getenv('MISTRAL_TIMEOUT', '60'))  # secondes
+MISTRAL_MAX_CONCURRENCY = int(os.getenv('MISTRAL_MAX_CONCURRENCY', '4'))
+MISTRAL_RATE_LIMIT = float(os.getenv('MISTRAL_RATE_LIMIT', '1'))  # requêtes/seconde
+MISTRAL_RATE_BURST = int(os.getenv('MISTRAL_RATE_BURST', '1'))
+MISTRAL_MAX_RETRIES = int(os.getenv('MISTRAL_MAX_RETRIES', '4'))
+# Cache persistant des réponses Mistral (empreinte modèle + prompt)
+MISTRAL_CACHE_ENABLED = os.getenv('MISTRAL_CACHE_ENABLED', '1') == '1'
+MISTRAL_CACHE_TTL = int(os.getenv('MISTRAL_CACHE_TTL_DAYS', '30')) * 24 * 3600  # secondes
+MISTRAL_CACHE_MAX_BYTES = int(os.getenv('MISTRAL_CACHE_MAX_MB', '256')) * 1024 * 1024
+# Résumé hiérarchique : budget de tokens par morceau et par étape de réduction
+MISTRAL_CHUNK_TOKENS = int(os.getenv('MISTRAL_CHUNK_TOKENS', '2000'))
+MISTRAL_REDUCE_TOKENS = int(os.getenv('MISTRAL_REDUCE_TOKENS', '6000'))
+# Moteur d'extraction des mots-clés par défaut : mistral (API) ou local (TF-IDF)
+KEYWORD_ENGINE = os.getenv('KEYWORD_ENGINE', 'mistral')
+# Analyse groupée des blancs : alertes et caractères max par prompt
+MISTRAL_BLANK_BATCH_SIZE = int(os.getenv('MISTRAL_BLANK_BATCH_SIZE', '20'))
+MISTRAL_BLANK_BATCH_CHARS = int(os.getenv('MISTRAL_BLANK_BATCH_CHARS', '8000'))
 
 # Recording Configuration
 RECORDING_DEFAULT_FORMAT = 'wav'
 RECORDING_DEFAULT_QUALITY = '192k'
 RECORDING_DEFAULT_RETENTION_DAYS = 30
+# Cycle de vie du stockage : WAV -> FLAC (sans perte) -> Opus (volume froid)
+STORAGE_FLAC_AFTER_DAYS = int(os.getenv('STORAGE_FLAC_AFTER_DAYS', '7'))  # 0 = désactivé
+STORAGE_OPUS_AFTER_DAYS = int(os.getenv('STORAGE_OPUS_AFTER_DAYS', '0'))  # 0 = désactivé
+STORAGE_OPUS_BITRATE = os.getenv('STORAGE_OPUS_BITRATE', '64k')
+STORAGE_COLD_DIR = os.getenv('STORAGE_COLD_DIR', '')  # défaut : à côté de l'original
+STORAGE_LIFECYCLE_BATCH = int(os.getenv('STORAGE_LIFECYCLE_BATCH', '200'))
+# Réservation d'un changement de niveau reprise après ce délai (worker disparu)
+STORAGE_MOVE_TIMEOUT = int(os.getenv('STORAGE_MOVE_TIMEOUT', str(6 * 3600)))
+# Suppression des enregistrements expirés : lots, parallélisme, temps borné
+EXPIRY_BATCH_SIZE = int(os.getenv('EXPIRY_BATCH_SIZE', '500'))
+EXPIRY_UNLINK_WORKERS = int(os.getenv('EXPIRY_UNLINK_WORKERS', '8'))
+EXPIRY_TIME_BUDGET = int(os.getenv('EXPIRY_TIME_BUDGET', '300'))  # secondes, 0 = illimité
+# Téléchargements : délégation de l'envoi des fichiers au proxy
+# '' (servi par Django), 'x-accel' (nginx) ou 'x-sendfile' (Apache)
+DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '')
+DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected/recordings/')
+DOWNLOAD_ACCEL_COLD_PREFIX = os.getenv('DOWNLOAD_ACCEL_COLD_PREFIX', '')
+
+# Index de positionnement des MP3 / FLAC (<fichier>.seekidx) : pas en ms
+SEEK_INDEX_INTERVAL_MS = int(os.getenv('SEEK_INDEX_INTERVAL_MS', '1000'))
+
+# Chronologie : durée maximale d'un segment (borne de la recherche par intervalle)
+TIMELINE_SEGMENT_MAX_HOURS = int(os.getenv('TIMELINE_SEGMENT_MAX_HOURS', '6'))
+
+# Extraits (clip) : cache disque des extraits déjà produits
+CLIP_CACHE_DIR = os.getenv('CLIP_CACHE_DIR', '')  # défaut : MEDIA_ROOT/.clip_cache
+CLIP_CACHE_MAX_BYTES = int(os.getenv('CLIP_CACHE_MAX_BYTES', str(5 * 1024**3)))
+CLIP_CACHE_MAX_AGE = int(os.getenv('CLIP_CACHE_MAX_AGE', str(7 * 24 * 3600)))
+CLIP_MAX_DURATION = int(os.getenv('CLIP_MAX_DURATION', str(4 * 3600)))
+CLIP_HTTP_MAX_AGE = int(os.getenv('CLIP_HTTP_MAX_AGE', '86400'))
+
+# Lecture HLS : segments AAC produits à la demande puis mis en cache
+HLS_SEGMENT_SECONDS = int(os.getenv('HLS_SEGMENT_SECONDS', '6'))
+HLS_AUDIO_BITRATE = os.getenv('HLS_AUDIO_BITRATE', '128k')
+HLS_CACHE_DIR = os.getenv('HLS_CACHE_DIR', '')  # défaut : MEDIA_ROOT/.hls_cache
+HLS_CACHE_MAX_BYTES = int(os.getenv('HLS_CACHE_MAX_BYTES', str(10 * 1024**3)))
+HLS_CACHE_MAX_AGE = int(os.getenv('HLS_CACHE_MAX_AGE', str(7 * 24 * 3600)))
+
+# Prévision de remplissage et régulation du stockage
+STORAGE_FORECAST_WINDOW_DAYS = int(os.getenv('STORAGE_FORECAST_WINDOW_DAYS', '7'))
+STORAGE_FORECAST_ALERT_DAYS = int(os.getenv('STORAGE_FORECAST_ALERT_DAYS', '7'))
+STORAGE_TARGET_DAYS = int(os.getenv('STORAGE_TARGET_DAYS', '14'))
+STORAGE_MIN_FREE_BYTES = int(os.getenv('STORAGE_MIN_FREE_BYTES', str(20 * 1024**3)))
+STORAGE_EVICT_HORIZON_DAYS = int(os.getenv('STORAGE_EVICT_HORIZON_DAYS', '7'))
+STORAGE_RELIEF_BATCH = int(os.getenv('STORAGE_RELIEF_BATCH', '200'))
+# Quotas par station en octets, ex. {"occitania-toulouse": 500000000000}
+STORAGE_QUOTAS = json.loads(os.getenv('STORAGE_QUOTAS', '{}') or '{}')
+EXPIRY_CONTINUE_DELAY = int(os.getenv('EXPIRY_CONTINUE_DELAY', '60'))  # secondes avant le passage suivant
 SILENCE_DETECTION_THRESHOLD = '-35dB'
 SILENCE_DETECTION_DURATION = 2.0
 SUSPICIOUS_SILENCE_DURATION = 5.0  # secondes
+# Cache de l'audio décodé (PCM 16 kHz mono float32) partagé par les étapes
+PCM_CACHE_ENABLED = os.getenv('PCM_CACHE_ENABLED', '1') == '1'
+PCM_CACHE_DIR = os.getenv('PCM_CACHE_DIR', '')  # défaut : MEDIA_ROOT/.pcm_cache
+PCM_CACHE_MAX_BYTES = int(os.getenv('PCM_CACHE_MAX_BYTES', str(20 * 1024**3)))
+PCM_CACHE_MIN_FREE_BYTES = int(os.getenv('PCM_CACHE_MIN_FREE_BYTES', str(5 * 1024**3)))
+PCM_CACHE_MAX_AGE = int(os.getenv('PCM_CACHE_MAX_AGE', str(24 * 3600)))
+# Bail de traitement par enregistrement (secondes, prolongé pendant les étapes)
+PROCESSING_LEASE_TTL = int(os.getenv('PROCESSING_LEASE_TTL', '300'))
+# Durée du bail tant que des étapes attendent en file (secondes)
+PROCESSING_LEASE_QUEUE_TTL = int(os.getenv('PROCESSING_LEASE_QUEUE_TTL', str(6 * 3600)))
+# Priorité des workers de traitement (héritée par FFmpeg et Whisper)
+PROCESSING_NICE = int(os.getenv('PROCESSING_NICE', '10'))
+PROCESSING_IONICE_CLASS = os.getenv('PROCESSING_IONICE_CLASS', 'best-effort')  # best-effort, idle ou vide
+# Régulation du traitement selon la télémétrie des captures en direct
+CAPTURE_THROTTLE_ENABLED = os.getenv('CAPTURE_THROTTLE_ENABLED', '1') == '1'
+CAPTURE_THROTTLED_STAGES = [
+    s.strip() for s in os.getenv('CAPTURE_THROTTLED_STAGES', 'silence,transcription').split(',') if s.strip()
+]
+CAPTURE_TELEMETRY_INTERVAL = int(os.getenv('CAPTURE_TELEMETRY_INTERVAL', '10'))  # secondes
+CAPTURE_MIN_SPEED = float(os.getenv('CAPTURE_MIN_SPEED', '0.98'))
+CAPTURE_PRESSURE_WINDOW = int(os.getenv('CAPTURE_PRESSURE_WINDOW', '60'))  # secondes
+CAPTURE_PRESSURE_MAX_WAIT = int(os.getenv('CAPTURE_PRESSURE_MAX_WAIT', '900'))  # secondes
+CAPTURE_PRESSURE_RETRY_DELAY = int(os.getenv('CAPTURE_PRESSURE_RETRY_DELAY', '30'))  # secondes
 
 # Logging
 LOGGING = {
@@ -6,12 +6,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from apps.recorder.views import prometheus_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.accounts.urls')),
     path('api/recordings/', include('apps.recorder.urls')),
     path('api/archive/', include('apps.archive.urls')),
     path('api/ai/', include('apps.ai.urls')),
+    path('metrics', prometheus_metrics, name='prometheus-metrics'),
 ]
 
 # Serve media files in development
@@ -57,5 +57,5 @@ echo "   source venv/bin/activate"
 echo "   python manage.py runserver"
 echo ""
 echo "📝 Pour lancer Celery (terminal séparé):"
-echo "   celery -A config.celery_app worker --loglevel=info"
+echo "   celery -A config.celery_app worker --loglevel=info -Q realtime,asr,llm,maintenance,bulk"
 